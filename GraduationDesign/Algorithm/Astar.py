@@ -29,14 +29,26 @@
 
 import heapq
 import math
+import time
 import geopandas as gpd
 import pandas as pd
 from shapely.geometry import Point, LineString
-from typing import List, Dict, Tuple, Optional, Set
-from dataclasses import dataclass, field
+from typing import List, Dict, Tuple, Optional, Set, Mapping
+from dataclasses import dataclass, field, replace
 from pathlib import Path
 import numpy as np
 
+try:
+    from .Metrics import ASTAR_EXPANDED_NODES, ASTAR_SEARCH_SECONDS
+except ImportError:  # 作为脚本直接运行（python Astar.py）时没有包上下文
+    from Metrics import ASTAR_EXPANDED_NODES, ASTAR_SEARCH_SECONDS
+
+# 预先取得子指标，每次搜索结束只做一次记录
+_SEARCH_SECONDS_FOUND = ASTAR_SEARCH_SECONDS.labels('found')
+_SEARCH_SECONDS_NOT_FOUND = ASTAR_SEARCH_SECONDS.labels('not_found')
+_EXPANDED_NODES_FOUND = ASTAR_EXPANDED_NODES.labels('found')
+_EXPANDED_NODES_NOT_FOUND = ASTAR_EXPANDED_NODES.labels('not_found')
+
 
 @dataclass
 class Node:
@@ -77,15 +89,95 @@ class Edge:
 
 @dataclass(order=True)
 class PathNode:
-    """A*算法中的路径节点，用于优先队列排序"""
+    """
+    A*算法中的路径节点，用于优先队列排序
+
+    只按 (f, g) 比较；AStarOptimizer 与 GraphArrays 的搜索共用，保证两者出队顺序一致
+    （GraphArrays 中 node 为节点数组下标）。
+    """
     f_score: float  # f(n) = g(n) + h(n)
     g_score: float  # 从起点到当前节点的实际代价
     node: Node = field(compare=False)
     parent: Optional['PathNode'] = field(default=None, compare=False)
 
 
+@dataclass(frozen=True)
+class RoutingConfig:
+    """
+    单次路径查询的配置（不可变）
+
+    每个请求构造自己的配置并传入 find_path，不再修改共享的 AStarOptimizer，
+    多线程/多进程同时查询时互不影响。
+    """
+    weight_distance: float = 1.0
+    weight_time: float = 1.0
+    weight_fuel: float = 0.5
+    aircraft_speed: float = 15.0   # 航空器平均滑行速度（米/秒）
+    weather_factor: float = 1.0    # 天气速度折扣系数（0.0~1.0）
+
+    @property
+    def weights(self) -> Dict[str, float]:
+        """权重字典 {'distance', 'time', 'fuel'}"""
+        return {'distance': self.weight_distance, 'time': self.weight_time, 'fuel': self.weight_fuel}
+
+    @property
+    def cost_weights(self) -> Tuple[float, float, float]:
+        """(距离, 时间, 燃料) 权重，按 weighted_cost 的参数顺序"""
+        return self.weight_distance, self.weight_time, self.weight_fuel
+
+    @property
+    def effective_speed(self) -> float:
+        """考虑天气后的滑行速度（米/秒）"""
+        return self.aircraft_speed * max(self.weather_factor, 0.1)  # 防止除零
+
+    def with_overrides(self, weights: Optional[Dict[str, float]] = None,
+                       weather_factor: Optional[float] = None,
+                       aircraft_speed: Optional[float] = None) -> 'RoutingConfig':
+        """
+        返回覆盖部分参数后的新配置
+
+        参数:
+            weights: 权重字典，缺少的键保持本配置的值
+            weather_factor: 天气折扣系数
+            aircraft_speed: 滑行速度
+        """
+        changes = {}
+        if weights:
+            changes['weight_distance'] = weights.get('distance', self.weight_distance)
+            changes['weight_time'] = weights.get('time', self.weight_time)
+            changes['weight_fuel'] = weights.get('fuel', self.weight_fuel)
+        if weather_factor is not None:
+            changes['weather_factor'] = weather_factor
+        if aircraft_speed is not None:
+            changes['aircraft_speed'] = aircraft_speed
+        return replace(self, **changes) if changes else self
+
+
+def estimate_fuel(distance: float, travel_time: float) -> float:
+    """燃料消耗估算（简化模型：与距离和时间成正比）"""
+    return distance * 0.1 + travel_time * 0.05
+
+
+def weighted_cost(distance: float, travel_time: float,
+                  w_distance: float, w_time: float, w_fuel: float) -> float:
+    """
+    多目标综合代价（A*的边代价与启发式共用）
+
+    参考文献中的目标函数：最小化滑行距离、滑行时间和燃料消耗的加权和。
+    AStarOptimizer 与 GraphArrays 的搜索都通过本函数计算代价，保证两者结果一致。
+    """
+    return (w_distance * distance +
+            w_time * travel_time +
+            w_fuel * estimate_fuel(distance, travel_time))
+
+
 class AirportGraph:
-    """机场路网图类，从SHP文件加载和管理路网数据"""
+    """
+    机场路网图类，从SHP文件加载和管理路网数据
+
+    load_data 完成后图只被读取（节点、邻接表均不再修改），可被多个线程同时查询；
+    预先构建的衍生结构（交叉表、空间索引等）挂在图对象上，重新加载时随新图对象重建。
+    """
 
     def __init__(self, base_path: str):
         """
@@ -474,6 +566,9 @@ class AStarOptimizer:
     """
     A*算法优化器，用于机场场面滑行路径规划
 
+    实例上的权重、速度、天气因子只作为默认配置；并发查询应通过 config 参数
+    传入各自的 RoutingConfig，搜索过程只读取图和配置，不修改任何共享状态。
+
     参考文献：
     1. 基于蚁群算法的航空器滑行路径优化研究 - 目标函数和约束条件设计
     2. Weiszer et al. (2015) - 多目标优化方法
@@ -504,9 +599,21 @@ class AStarOptimizer:
         self.aircraft_speed = aircraft_speed
         self.weather_factor = weather_factor
 
+    @property
+    def config(self) -> RoutingConfig:
+        """实例默认参数对应的查询配置"""
+        return RoutingConfig(
+            weight_distance=self.weight_distance,
+            weight_time=self.weight_time,
+            weight_fuel=self.weight_fuel,
+            aircraft_speed=self.aircraft_speed,
+            weather_factor=self.weather_factor
+        )
+
     def heuristic(self, node: Node, goal: Node, 
                   weights: Dict[str, float] = None,
-                  weather_factor: float = None) -> float:
+                  weather_factor: float = None,
+                  aircraft_speed: float = None) -> float:
         """
         启发式函数（h函数）：估算从当前节点到目标节点的代价
 
@@ -518,6 +625,7 @@ class AStarOptimizer:
             goal: 目标节点
             weights: 可选的权重字典，如果为None则使用实例权重
             weather_factor: 可选的天气折扣系数，如果为None则使用实例值
+            aircraft_speed: 可选的滑行速度，如果为None则使用实例值
 
         返回:
             估算代价
@@ -527,7 +635,8 @@ class AStarOptimizer:
         
         # 考虑天气因子的实际速度
         wf = weather_factor if weather_factor is not None else self.weather_factor
-        effective_speed = self.aircraft_speed * max(wf, 0.1)  # 防止除零
+        speed = aircraft_speed if aircraft_speed is not None else self.aircraft_speed
+        effective_speed = speed * max(wf, 0.1)  # 防止除零
         
         # 转换为综合代价（天气差时时间更长）
         return self._calculate_cost(distance, distance / effective_speed, weights)
@@ -535,12 +644,7 @@ class AStarOptimizer:
     def _calculate_cost(self, distance: float, time: float,
                        weights: Dict[str, float] = None) -> float:
         """
-        计算边的代价（多目标优化）
-
-        参考文献中的目标函数：
-        - 最小化滑行距离
-        - 最小化滑行时间
-        - 最小化燃料消耗
+        计算边的代价（多目标优化，见 weighted_cost）
 
         参数:
             distance: 距离（米）
@@ -550,10 +654,6 @@ class AStarOptimizer:
         返回:
             综合代价
         """
-        # 燃料消耗估算：基于距离和时间
-        # 简化模型：燃料消耗与距离和时间成正比
-        fuel_consumption = distance * 0.1 + time * 0.05
-
         # 使用传入的权重或实例权重
         if weights is not None:
             w_distance = weights.get('distance', self.weight_distance)
@@ -564,16 +664,14 @@ class AStarOptimizer:
             w_time = self.weight_time
             w_fuel = self.weight_fuel
 
-        # 加权综合代价
-        total_cost = (w_distance * distance +
-                     w_time * time +
-                     w_fuel * fuel_consumption)
-
-        return total_cost
+        return weighted_cost(distance, time, w_distance, w_time, w_fuel)
 
     def find_path(self, start: Node, goal: Node,
                   weights: Dict[str, float] = None,
-                  weather_factor: float = None) -> Tuple[Optional[List[Node]], Dict]:
+                  weather_factor: float = None,
+                  config: Optional[RoutingConfig] = None,
+                  edge_penalties: Optional[Mapping[Tuple[int, int], float]] = None
+                  ) -> Tuple[Optional[List[Node]], Dict]:
         """
         使用A*算法查找最优路径
 
@@ -584,13 +682,21 @@ class AStarOptimizer:
                    如果提供，将临时覆盖当前的权重设置
             weather_factor: 可选的天气速度折扣系数（0.0~1.0），
                            如果提供，将临时覆盖当前的天气设置
+            config: 本次查询的配置；为None时使用实例默认参数。weights/weather_factor
+                    在其基础上覆盖
+            edge_penalties: 边长度惩罚系数 {(起点ID, 终点ID): 系数}，用于备选路径搜索
 
         返回:
             (路径, 统计信息字典)
         """
-        # 确定本次搜索使用的天气因子
-        wf = weather_factor if weather_factor is not None else self.weather_factor
-        effective_speed = self.aircraft_speed * max(wf, 0.1)
+        search_start = time.perf_counter()
+        # 确定本次搜索的配置（只读，不修改实例）
+        config = (config or self.config).with_overrides(weights=weights, weather_factor=weather_factor)
+        weights = config.weights
+        wf = config.weather_factor
+        speed = config.aircraft_speed
+        effective_speed = config.effective_speed
+        cost_weights = config.cost_weights
         
         # 初始化
         open_set = []  # 优先队列（开放集合）
@@ -599,7 +705,7 @@ class AStarOptimizer:
 
         # 创建起始节点
         start_path_node = PathNode(
-            f_score=self.heuristic(start, goal, weights, wf),
+            f_score=self.heuristic(start, goal, weights, wf, speed),
             g_score=0.0,
             node=start,
             parent=None
@@ -621,7 +727,9 @@ class AStarOptimizer:
             if current.node.id == goal.id:
                 # 重建路径
                 path = self._reconstruct_path(current)
-                stats = self._calculate_path_stats(path, weights, wf)
+                stats = self._calculate_path_stats(path, weights, wf, speed)
+                _SEARCH_SECONDS_FOUND.observe(time.perf_counter() - search_start)
+                _EXPANDED_NODES_FOUND.observe(iterations)
 
                 print(f"\n✓ 找到最优路径！")
                 print(f"  - 迭代次数: {iterations}")
@@ -648,18 +756,21 @@ class AStarOptimizer:
 
                 # 计算从起点到邻居的实际代价（考虑天气因子）
                 # 恶劣天气下：实际滑行速度 = min(限速, 航空器速度 * 天气因子)
+                length = edge.length
+                if edge_penalties:
+                    length *= edge_penalties.get((current.node.id, neighbor.id), 1.0)
                 actual_speed = min(edge.speed_limit, effective_speed)
-                travel_time = edge.length / actual_speed
+                travel_time = length / actual_speed
                 
-                tentative_g_score = current.g_score + self._calculate_cost(
-                    edge.length, travel_time, weights
+                tentative_g_score = current.g_score + weighted_cost(
+                    length, travel_time, *cost_weights
                 )
 
                 # 检查是否需要更新邻居节点
                 if neighbor.id not in path_nodes or tentative_g_score < path_nodes[neighbor.id].g_score:
                     # 创建新的路径节点
                     neighbor_path_node = PathNode(
-                        f_score=tentative_g_score + self.heuristic(neighbor, goal, weights, wf),
+                        f_score=tentative_g_score + self.heuristic(neighbor, goal, weights, wf, speed),
                         g_score=tentative_g_score,
                         node=neighbor,
                         parent=current
@@ -669,6 +780,8 @@ class AStarOptimizer:
                     heapq.heappush(open_set, neighbor_path_node)
 
         # 未找到路径
+        _SEARCH_SECONDS_NOT_FOUND.observe(time.perf_counter() - search_start)
+        _EXPANDED_NODES_NOT_FOUND.observe(iterations)
         print(f"\n✗ 未找到路径（迭代次数: {iterations}）")
         return None, {
             'iterations': iterations,
@@ -689,19 +802,22 @@ class AStarOptimizer:
 
     def _calculate_path_stats(self, path: List[Node], 
                               weights: Dict[str, float] = None,
-                              weather_factor: float = None) -> Dict:
+                              weather_factor: float = None,
+                              aircraft_speed: float = None) -> Dict:
         """计算路径统计信息
 
         参数:
             path: 路径节点列表
             weights: 可选的权重字典
             weather_factor: 可选的天气折扣系数
+            aircraft_speed: 可选的滑行速度
 
         返回:
             统计信息字典
         """
         wf = weather_factor if weather_factor is not None else self.weather_factor
-        effective_speed = self.aircraft_speed * max(wf, 0.1)
+        speed = aircraft_speed if aircraft_speed is not None else self.aircraft_speed
+        effective_speed = speed * max(wf, 0.1)
         
         total_distance = 0.0
         total_time = 0.0
@@ -722,7 +838,7 @@ class AStarOptimizer:
 
             # 计算燃料消耗（恶劣天气燃料消耗增加）
             # 基础燃料 + 时间相关燃料（天气差时需要更多推力/制动）
-            fuel_consumption += distance * 0.1 + time * 0.05
+            fuel_consumption += estimate_fuel(distance, time)
 
         total_cost = self._calculate_cost(total_distance, total_time, weights)
 
@@ -736,80 +852,44 @@ class AStarOptimizer:
             'effective_speed': effective_speed
         }
 
-    def find_k_shortest_paths(self, start: Node, goal: Node, k: int = 3) -> List[Tuple[List[Node], Dict]]:
+    def find_k_shortest_paths(self, start: Node, goal: Node, k: int = 3,
+                              config: Optional[RoutingConfig] = None) -> List[Tuple[List[Node], Dict]]:
         """
         使用简化的方法查找K条最短路径
         
         这个实现使用边惩罚策略（edge penalty strategy）：
-        每次找到一条路径后，惩罚该路径中的边，使得下次搜索会寻找不同的路径
+        每次找到一条路径后，惩罚该路径中的边，使得下次搜索会寻找不同的路径。
+        惩罚以参数形式传入 find_path，不修改路网图，可与其他查询并发执行。
         
         参数:
             start: 起始节点
             goal: 目标节点
             k: 需要的路径数量（默认3）
+            config: 本次查询的配置；为None时使用实例默认参数
             
         返回:
             [(路径, 统计信息), ...]  # K条路径的列表
         """
-        from dataclasses import replace
-        
         paths = []
         
-        # 用于惩罚边的字典：{(from_node, to_node): penalty_count}
-        penalized_edges = {}
+        # 边惩罚系数：{(from_node, to_node): 1 + 0.5 * 被选中次数}
+        edge_penalties: Dict[Tuple[int, int], float] = {}
         
         for i in range(k):
-            # 临时保存原始的get_neighbors方法
-            original_get_neighbors = self.graph.get_neighbors
+            # 运行A*搜索
+            path, stats = self.find_path(start, goal, config=config, edge_penalties=edge_penalties)
             
-            def get_penalized_neighbors(node):
-                """获取邻居节点，应用边惩罚"""
-                original_neighbors = original_get_neighbors(node)
-                if not original_neighbors:
-                    return []
-                
-                filtered_neighbors = []
-                for edge in original_neighbors:
-                    edge_key = (node.id, edge.to_node.id)
-                    # 如果这条边被惩罚，增加其代价
-                    if edge_key in penalized_edges and penalized_edges[edge_key] > 0:
-                        # 通过修改edge的length来增加代价
-                        penalty_factor = 1.0 + penalized_edges[edge_key] * 0.5
-                        # 创建一个新的edge对象，增加length
-                        penalized_edge = replace(edge, length=edge.length * penalty_factor)
-                        filtered_neighbors.append(penalized_edge)
-                    else:
-                        filtered_neighbors.append(edge)
-                
-                return filtered_neighbors
+            if path is None:
+                # 没有找到更多路径
+                break
             
-            # 临时替换get_neighbors方法
-            self.graph.get_neighbors = get_penalized_neighbors
+            # 添加到结果列表
+            paths.append((path, stats))
             
-            try:
-                # 运行A*搜索
-                path, stats = self.find_path(start, goal)
-                
-                if path is None:
-                    # 没有找到更多路径
-                    break
-                
-                # 添加到结果列表
-                paths.append((path, stats))
-                
-                # 惩罚这条路径中的边，使得下次搜索会找不同路径
-                for j in range(len(path) - 1):
-                    from_node = path[j]
-                    to_node = path[j + 1]
-                    edge_key = (from_node.id, to_node.id)
-                    
-                    if edge_key not in penalized_edges:
-                        penalized_edges[edge_key] = 0
-                    penalized_edges[edge_key] += 1
-                    
-            finally:
-                # 恢复原始的get_neighbors方法
-                self.graph.get_neighbors = original_get_neighbors
+            # 惩罚这条路径中的边，使得下次搜索会找不同路径
+            for j in range(len(path) - 1):
+                edge_key = (path[j].id, path[j + 1].id)
+                edge_penalties[edge_key] = edge_penalties.get(edge_key, 1.0) + 0.5
         
         if paths:
             print(f"\\n✓ 找到 {len(paths)} 条备选路径:")
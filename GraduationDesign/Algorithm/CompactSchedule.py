@@ -0,0 +1,128 @@
+"""
+紧凑航班时刻表
+以NumPy数组保存航班途经节点序列及到达时刻，替代 List[Tuple[Node, datetime]]
+
+存储内容：
+- node_ids:       int32 节点ID数组
+- base_times:     float64 未延误时的到达时刻（epoch秒）
+- cum_distance:   float64 起点到各节点的累计滑行距离（米）
+- offset:         整体平移量（秒），延误只修改该值，O(1)
+
+对外仍表现为 (节点, 到达时间) 的只读序列，datetime 仅在迭代/下标访问时按需生成，
+因此现有的 `for node, time in schedule.waypoints` 写法无需修改；
+内部算法（冲突检测、占用索引等）直接使用 node_ids / times 数组。
+"""
+
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .Astar import Node
+from .TimeUtils import from_epoch_seconds, to_epoch_seconds
+
+
+class CompactWaypoints(Sequence):
+    """数组形式的航班途经点序列"""
+
+    __slots__ = ('nodes', 'node_ids', 'base_times', 'cum_distance', 'offset')
+
+    def __init__(self, nodes: Sequence[Node], node_ids: np.ndarray,
+                 base_times: np.ndarray, cum_distance: np.ndarray, offset: float = 0.0):
+        """
+        参数:
+            nodes: 路径节点（与数组一一对应，通常直接复用 AircraftSchedule.path）
+            node_ids: 节点ID数组（int32）
+            base_times: 未平移的到达时刻（epoch秒）
+            cum_distance: 累计距离（米）
+            offset: 时间平移量（秒）
+        """
+        self.nodes = nodes
+        self.node_ids = node_ids
+        self.base_times = base_times
+        self.cum_distance = cum_distance
+        self.offset = offset
+
+    @classmethod
+    def from_path(cls, path: List[Node], start_time: datetime, speed: float) -> 'CompactWaypoints':
+        """
+        按匀速滑行计算路径上各节点的到达时刻
+
+        参数:
+            path: 路径节点列表
+            start_time: 起点时刻
+            speed: 滑行速度（米/秒）
+        """
+        node_ids = np.fromiter((node.id for node in path), dtype=np.int32, count=len(path))
+        xs = np.fromiter((node.x for node in path), dtype=np.float64, count=len(path))
+        ys = np.fromiter((node.y for node in path), dtype=np.float64, count=len(path))
+
+        cum_distance = np.zeros(len(path), dtype=np.float64)
+        if len(path) > 1:
+            np.cumsum(np.hypot(np.diff(xs), np.diff(ys)), out=cum_distance[1:])
+
+        base_times = to_epoch_seconds(start_time) + cum_distance / speed
+        return cls(path, node_ids, base_times, cum_distance)
+
+    @classmethod
+    def empty(cls) -> 'CompactWaypoints':
+        """空序列（路径规划失败的航班）"""
+        return cls([], np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float64),
+                   np.empty(0, dtype=np.float64))
+
+    # ==================== 数组访问 ====================
+
+    @property
+    def times(self) -> np.ndarray:
+        """平移后的到达时刻（epoch秒）"""
+        if self.offset == 0.0:
+            return self.base_times
+        return self.base_times + self.offset
+
+    @property
+    def total_distance(self) -> float:
+        """几何累计距离（米）"""
+        return float(self.cum_distance[-1]) if len(self.cum_distance) else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """数组占用的字节数"""
+        return self.node_ids.nbytes + self.base_times.nbytes + self.cum_distance.nbytes
+
+    def shift(self, seconds: float) -> None:
+        """整体平移到达时刻（延误）"""
+        self.offset += seconds
+
+    def epoch_at(self, index: int) -> float:
+        """第index个途经点的到达时刻（epoch秒）"""
+        return float(self.base_times[index]) + self.offset
+
+    def time_at(self, index: int) -> datetime:
+        """第index个途经点的到达时刻"""
+        return from_epoch_seconds(self.epoch_at(index))
+
+    def start_time(self) -> Optional[datetime]:
+        """首个途经点时刻"""
+        return self.time_at(0) if len(self) else None
+
+    def end_time(self) -> Optional[datetime]:
+        """末个途经点时刻"""
+        return self.time_at(-1) if len(self) else None
+
+    # ==================== 序列协议 ====================
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.nodes[index], self.time_at(index)
+
+    def __iter__(self) -> Iterator[Tuple[Node, datetime]]:
+        offset = self.offset
+        for node, t in zip(self.nodes, self.base_times.tolist()):
+            yield node, from_epoch_seconds(t + offset)
+
+    def __repr__(self) -> str:
+        return f"CompactWaypoints(len={len(self)}, offset={self.offset:.3f}s)"
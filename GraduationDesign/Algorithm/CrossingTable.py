@@ -0,0 +1,119 @@
+"""
+路段几何交叉表
+=====================================
+
+冲突检测需要知道哪些路段在几何上真正相交（交叉口）或重叠（共用一段道路），
+逐对做几何运算代价为O(E²)。本模块在路网加载后一次性预计算：
+
+1. 把双向边合并为无向路段，按节点ID对编号
+2. 对路段几何建立STRtree，只对包围盒相交的候选对做精确判断
+3. 记录两类关系：
+   - crossing: 路段在非端点处相交（平面交叉）
+   - shared:   路段重叠长度超过容差（共用道路）
+   共享端点的路段只在端点处接触，由节点冲突负责，不计入本表
+
+调度时冲突检测与消解只需查询本表中的候选路段对。
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from shapely.geometry import LineString
+from shapely.strtree import STRtree
+
+from .Astar import AirportGraph
+
+# 重叠长度超过该值（米）视为共用路段
+SHARED_LENGTH_TOLERANCE = 1.0
+
+
+class CrossingTable:
+    """无向路段编号及路段间的几何关系表"""
+
+    CROSSING = 'crossing'
+    SHARED = 'shared'
+
+    def __init__(self, segment_nodes: List[Tuple[int, int]],
+                 relations: Dict[int, Dict[int, str]]):
+        """
+        参数:
+            segment_nodes: 路段编号 -> (较小节点ID, 较大节点ID)
+            relations: 路段编号 -> {相关路段编号: 关系类型}
+        """
+        self.segment_nodes = segment_nodes
+        self.segment_index = {nodes: i for i, nodes in enumerate(segment_nodes)}
+        self.relations = relations
+
+    @classmethod
+    def from_graph(cls, graph: AirportGraph) -> 'CrossingTable':
+        """从路网图构建交叉表"""
+        segment_nodes: List[Tuple[int, int]] = []
+        geometries = []
+        seen = set()
+
+        for edges in graph.edges.values():
+            for edge in edges:
+                key = tuple(sorted((edge.from_node.id, edge.to_node.id)))
+                if key in seen or key[0] == key[1]:
+                    continue
+                seen.add(key)
+                geometry = edge.geometry
+                if geometry is None or geometry.is_empty:
+                    geometry = LineString([(edge.from_node.x, edge.from_node.y),
+                                           (edge.to_node.x, edge.to_node.y)])
+                segment_nodes.append(key)
+                geometries.append(geometry)
+
+        relations: Dict[int, Dict[int, str]] = {}
+        if geometries:
+            tree = STRtree(geometries)
+            left, right = tree.query(geometries, predicate='intersects')
+            for i, j in zip(left.tolist(), right.tolist()):
+                if i >= j:
+                    continue
+                relation = cls._classify(segment_nodes[i], segment_nodes[j],
+                                         geometries[i], geometries[j])
+                if relation is not None:
+                    relations.setdefault(i, {})[j] = relation
+                    relations.setdefault(j, {})[i] = relation
+
+        return cls(segment_nodes, relations)
+
+    @classmethod
+    def _classify(cls, nodes_a: Tuple[int, int], nodes_b: Tuple[int, int],
+                  geometry_a, geometry_b) -> Optional[str]:
+        """判断两条相交路段的关系"""
+        overlap = geometry_a.intersection(geometry_b)
+        if overlap.length > SHARED_LENGTH_TOLERANCE:
+            return cls.SHARED
+        if set(nodes_a) & set(nodes_b):
+            # 仅在共享端点处接触
+            return None
+        return cls.CROSSING
+
+    @property
+    def segment_count(self) -> int:
+        return len(self.segment_nodes)
+
+    @property
+    def pair_count(self) -> int:
+        """有关系的路段对数量"""
+        return sum(len(related) for related in self.relations.values()) // 2
+
+    def segment_of(self, from_id: int, to_id: int) -> Optional[int]:
+        """节点对所在的路段编号（不存在时返回None）"""
+        if from_id < to_id:
+            return self.segment_index.get((from_id, to_id))
+        return self.segment_index.get((to_id, from_id))
+
+    def related(self, segment: int) -> Dict[int, str]:
+        """与路段存在交叉/重叠关系的路段"""
+        return self.relations.get(segment, {})
+
+
+def get_crossing_table(graph: AirportGraph) -> CrossingTable:
+    """获取图的交叉表（每个图只构建一次）"""
+    table = getattr(graph, '_crossing_table', None)
+    if table is None:
+        table = CrossingTable.from_graph(graph)
+        graph._crossing_table = table
+    return table
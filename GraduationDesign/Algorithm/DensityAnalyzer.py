@@ -4,14 +4,304 @@
 并提供多目标A*算法权重的动态调整建议
 """
 
-from typing import List, Dict, TYPE_CHECKING
+from typing import List, Dict, ClassVar, Tuple, Sequence, Optional, Callable, TYPE_CHECKING
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-import statistics
+from collections import deque
+from functools import reduce
+import bisect
+import math
+import numbers
+import threading
+
+import numpy as np
+
+from .TimeUtils import to_epoch_seconds, from_epoch_seconds
 
 if TYPE_CHECKING:
     from .MultiAircraftScheduler import Flight
 
 
+# 基于机场运营标准的绝对判断阈值（航班/小时）
+# 参考依据：
+# - ICAO Doc 9974: 机场容量评估标准
+# - 中国民航局《机场航班时刻容量评估办法》
+# - 西安咸阳国际机场为大型枢纽机场，设计容量约60-70架次/小时
+AIRPORT_CAPACITY = 60    # 西安机场设计容量（航班/小时）
+PEAK_THRESHOLD = 40      # 高峰阈值：40 航班/小时
+OFF_PEAK_THRESHOLD = 15  # 低峰阈值：15 航班/小时
+
+# 多分辨率密度分析的默认窗口尺寸（分钟）
+DEFAULT_WINDOW_SIZES = (5, 15, 30, 60)
+# 单次分析最多的窗口尺寸数
+MAX_WINDOW_SIZES = 8
+# 公约数细粒度网格的最大格点数（1分钟粒度约可覆盖两年）
+MAX_FINE_WINDOWS = 1_000_000
+
+
+def validate_window_sizes(window_sizes: Sequence) -> None:
+    """
+    检查窗口尺寸（来自请求时使用）：最多MAX_WINDOW_SIZES个、不小于1的整数分钟
+
+    整数分钟保证各尺寸的公约数不小于60秒，细粒度网格规模受航班时间跨度约束。
+
+    异常:
+        ValueError: 窗口尺寸不合法
+    """
+    if len(window_sizes) > MAX_WINDOW_SIZES:
+        raise ValueError(f'窗口尺寸最多 {MAX_WINDOW_SIZES} 个')
+    for size in window_sizes:
+        if (isinstance(size, bool) or not isinstance(size, numbers.Real) or not math.isfinite(size)
+                or size < 1 or not float(size).is_integer()):
+            raise ValueError(f'窗口尺寸必须为不小于1的整数分钟: {size!r}')
+
+
+def classify_density(density: float) -> str:
+    """根据绝对阈值判断单个窗口密度所属的时间段类型"""
+    if density >= PEAK_THRESHOLD:
+        return 'peak'
+    elif density <= OFF_PEAK_THRESHOLD:
+        return 'off_peak'
+    return 'normal'
+
+
+def classify_densities(densities: np.ndarray) -> np.ndarray:
+    """classify_density的向量化版本，返回DensityTimeline.PERIOD_LABELS中的编码"""
+    densities = np.asarray(densities, dtype=np.float64)
+    return np.where(densities >= PEAK_THRESHOLD, 2,
+                    np.where(densities <= OFF_PEAK_THRESHOLD, 0, 1)).astype(np.int8)
+
+
+def infer_period_outside_windows(avg_density: float, query_time: datetime) -> str:
+    """
+    查询时间不在任何窗口内时，根据平均密度和机场运营规律推断时间段类型
+
+    参考机场运营数据和中国民航航班时刻分布
+    """
+    if avg_density <= 0:
+        return 'unknown'
+
+    # 首先根据实际密度判断
+    if avg_density >= PEAK_THRESHOLD:
+        return 'peak'
+    elif avg_density <= OFF_PEAK_THRESHOLD:
+        return 'off_peak'
+
+    hour = query_time.hour
+    weekday = query_time.weekday()  # 0=周一, 6=周日
+
+    # 如果密度处于临界值，再根据时间段推断
+    if weekday < 5:
+        # 工作日典型高峰时段
+        if (7 <= hour <= 10) or (17 <= hour <= 21):
+            return 'peak' if avg_density >= 35 else 'normal'
+        elif (0 <= hour <= 5):
+            return 'off_peak'
+        else:
+            return 'normal'
+    else:
+        # 周末时段
+        if (9 <= hour <= 12) or (15 <= hour <= 20):
+            return 'peak' if avg_density >= 35 else 'normal'
+        elif (0 <= hour <= 7):
+            return 'off_peak'
+        else:
+            return 'normal'
+
+
+@dataclass
+class DensityTimeline:
+    """
+    预计算的密度时间轴
+
+    每批航班只构建一次，窗口边界、航班数、密度和时间段标签都存放在数组中，
+    查询某一时刻的时间段类型时对窗口边界做二分查找，复杂度O(log W)，
+    不再对整个航班列表重复做密度分析。
+    """
+    window_edges: np.ndarray   # 窗口边界（epoch秒），长度W+1
+    counts: np.ndarray         # 每个窗口的航班数，长度W
+    densities: np.ndarray      # 每个窗口的密度（航班/小时），长度W
+    period_codes: np.ndarray   # 每个窗口的时间段编码，索引PERIOD_LABELS
+    average_density: float = 0.0
+
+    PERIOD_LABELS: ClassVar[Tuple[str, ...]] = ('off_peak', 'normal', 'peak')
+
+    @property
+    def window_count(self) -> int:
+        return len(self.counts)
+
+    def period_at(self, query_time: datetime) -> str:
+        """
+        获取指定时间点所属的时间段类型
+
+        返回:
+            'peak' / 'off_peak' / 'normal' / 'unknown'
+        """
+        if self.window_count == 0:
+            return 'unknown'
+
+        t = to_epoch_seconds(query_time)
+        idx = int(np.searchsorted(self.window_edges, t, side='right')) - 1
+        if 0 <= idx < self.window_count:
+            return self.PERIOD_LABELS[self.period_codes[idx]]
+
+        return infer_period_outside_windows(self.average_density, query_time)
+
+    @classmethod
+    def empty(cls) -> 'DensityTimeline':
+        """无航班数据时的空时间轴"""
+        return cls(
+            window_edges=np.zeros(0, dtype=np.float64),
+            counts=np.zeros(0, dtype=np.int64),
+            densities=np.zeros(0, dtype=np.float64),
+            period_codes=np.zeros(0, dtype=np.int8),
+            average_density=0.0
+        )
+
+
+@dataclass
+class PeriodTransition:
+    """时间段类型切换事件（由StreamingDensityTracker发出）"""
+    time: datetime
+    previous_period: str
+    current_period: str
+    density: float  # 切换时主窗口的密度（航班/小时）
+
+
+class StreamingDensityTracker:
+    """
+    实时航班密度跟踪器（滑动窗口）
+
+    面向实时航班动态：每到达一条起降事件调用add_movement()，
+    跟踪器在若干滚动窗口内维护事件队列，新增与过期均为均摊O(1)，
+    并始终给出主窗口对应的时间段类型（peak/normal/off_peak）。
+    时间段类型发生变化时生成PeriodTransition并通知监听者，
+    调度器据此切换权重模板，无需重新执行整批密度分析。
+    """
+
+    def __init__(self, window_minutes: float = 30,
+                 extra_window_minutes: Sequence[float] = (),
+                 on_transition: Optional[Callable[[PeriodTransition], None]] = None):
+        """
+        初始化跟踪器
+
+        参数:
+            window_minutes: 主窗口大小（分钟），用于判定时间段类型
+            extra_window_minutes: 额外跟踪的窗口大小（分钟），仅用于查询密度
+            on_transition: 时间段切换回调（可选）
+        """
+        self.window_minutes = window_minutes
+        self._windows: Dict[float, deque] = {window_minutes: deque()}
+        for size in extra_window_minutes:
+            self._windows.setdefault(size, deque())
+
+        self._latest_time: Optional[float] = None  # 已观测到的最新时间（epoch秒）
+        self._period = 'unknown'
+        self._listeners: List[Callable[[PeriodTransition], None]] = []
+        if on_transition is not None:
+            self._listeners.append(on_transition)
+        self._lock = threading.Lock()
+
+    @property
+    def current_period(self) -> str:
+        """当前时间段类型"""
+        return self._period
+
+    @property
+    def latest_time(self) -> Optional[datetime]:
+        """已观测到的最新时间"""
+        return from_epoch_seconds(self._latest_time) if self._latest_time is not None else None
+
+    def add_listener(self, callback: Callable[[PeriodTransition], None]) -> None:
+        """注册时间段切换监听者"""
+        self._listeners.append(callback)
+
+    def add_movement(self, event_time: datetime) -> Optional[PeriodTransition]:
+        """
+        记录一条起降事件
+
+        事件通常按时间顺序到达；迟到的事件会按时间插入队列（少见情况，O(W)）。
+
+        返回:
+            若时间段类型发生变化，返回PeriodTransition，否则返回None
+        """
+        t = to_epoch_seconds(event_time)
+        with self._lock:
+            in_order = self._latest_time is None or t >= self._latest_time
+            for size, events in self._windows.items():
+                if in_order:
+                    events.append(t)
+                elif t > self._latest_time - size * 60:
+                    # 迟到但仍在窗口内的事件
+                    bisect.insort(events, t)
+            if in_order:
+                self._latest_time = t
+            transition = self._advance_locked(self._latest_time)
+
+        self._notify(transition)
+        return transition
+
+    def advance(self, now: datetime) -> Optional[PeriodTransition]:
+        """
+        推进时钟并过期窗口外的事件（没有新事件时也应周期性调用）
+
+        返回:
+            若时间段类型发生变化，返回PeriodTransition，否则返回None
+        """
+        t = to_epoch_seconds(now)
+        with self._lock:
+            if self._latest_time is None or t > self._latest_time:
+                self._latest_time = t
+            transition = self._advance_locked(self._latest_time)
+
+        self._notify(transition)
+        return transition
+
+    def _advance_locked(self, now: float) -> Optional[PeriodTransition]:
+        """过期事件并重新判定时间段类型（调用方持有锁）"""
+        # 滚动窗口为(now - w, now]
+        for size, events in self._windows.items():
+            cutoff = now - size * 60
+            while events and events[0] <= cutoff:
+                events.popleft()
+
+        density = self._density_locked(self.window_minutes)
+        period = classify_density(density)
+        if period == self._period:
+            return None
+
+        transition = PeriodTransition(
+            time=from_epoch_seconds(now),
+            previous_period=self._period,
+            current_period=period,
+            density=density
+        )
+        self._period = period
+        return transition
+
+    def _density_locked(self, window_minutes: float) -> float:
+        return len(self._windows[window_minutes]) / (window_minutes / 60)
+
+    def _notify(self, transition: Optional[PeriodTransition]) -> None:
+        if transition is None:
+            return
+        for callback in list(self._listeners):
+            try:
+                callback(transition)
+            except Exception as e:
+                print(f"[StreamingDensityTracker] 监听者处理切换事件失败: {e}")
+
+    def density(self, window_minutes: Optional[float] = None) -> float:
+        """获取指定滚动窗口（默认主窗口）的当前密度（航班/小时）"""
+        with self._lock:
+            return self._density_locked(window_minutes or self.window_minutes)
+
+    def counts(self) -> Dict[float, int]:
+        """获取各滚动窗口内的航班数"""
+        with self._lock:
+            return {size: len(events) for size, events in self._windows.items()}
+
+
 class DensityAnalyzer:
     """
     航班密度分析器
@@ -64,6 +354,7 @@ class DensityAnalyzer:
             {
                 'time_windows': list,  # 时间窗口列表
                 'densities': list,     # 每个窗口的航班密度
+                'window_counts': list, # 每个窗口的航班数
                 'average_density': float,  # 平均密度
                 'peak_windows': list,  # 高峰期时间窗口
                 'off_peak_windows': list,  # 低峰期时间窗口
@@ -74,81 +365,49 @@ class DensityAnalyzer:
             return {
                 'time_windows': [],
                 'densities': [],
+                'window_counts': [],
                 'average_density': 0,
                 'peak_windows': [],
                 'off_peak_windows': [],
                 'normal_windows': []
             }
 
-        # 1. 提取航班时间并排序
-        flight_times = [flight.scheduled_time for flight in flights]
-        flight_times.sort()
+        # 1. 提取航班时间（一次性转换为epoch秒并排序）
+        epoch_times = self._flight_epoch_times(flights)
+        start_time = min(flight.scheduled_time for flight in flights)
+        end_time = max(flight.scheduled_time for flight in flights)
 
-        # 2. 确定时间范围
-        start_time = flight_times[0]
-        end_time = flight_times[-1]
+        # 2~5. 向量化计算时间窗口、每个窗口的航班数量和密度（航班/小时）
+        histogram = self.compute_histograms(epoch_times, [self.time_window_minutes])[self.time_window_minutes]
+        window_counts = histogram['counts'].tolist()
+        densities = histogram['densities'].tolist()
 
-        # 3. 创建时间窗口
-        time_windows = []
-        current_time = start_time
         window_duration = timedelta(minutes=self.time_window_minutes)
-
-        while current_time < end_time + window_duration:
-            window_end = current_time + window_duration
-            time_windows.append((current_time, window_end))
-            current_time = window_end
-
-        # 4. 计算每个时间窗口的航班数量
-        window_counts = []
-        for window_start, window_end in time_windows:
-            count = sum(1 for ft in flight_times if window_start <= ft < window_end)
-            window_counts.append(count)
-
-        # 5. 计算密度（航班数量/时间窗口长度，转换为每小时的航班数）
-        densities = [count / (self.time_window_minutes / 60) for count in window_counts]
+        time_windows = [(start_time + i * window_duration, start_time + (i + 1) * window_duration)
+                        for i in range(len(window_counts))]
 
         # 6. 识别高峰期和低峰期
-        # 基于机场运营标准的绝对判断方法
-        # 
-        # 参考依据：
-        # - ICAO Doc 9974: 机场容量评估标准
-        # - 中国民航局《机场航班时刻容量评估办法》
-        # - 西安咸阳国际机场为大型枢纽机场，设计容量约60-70架次/小时
-        #
-        # 高峰/低峰判断标准（基于机场容量百分比）：
-        # - 高峰时段: > 40 航班/小时 (约60-70%容量)
-        # - 正常时段: 15-40 航班/小时
-        # - 低峰时段: < 15 航班/小时
-        
-        AIRPORT_CAPACITY = 60  # 西安机场设计容量（航班/小时）
-        PEAK_THRESHOLD = 40    # 高峰阈值：40 航班/小时
-        OFF_PEAK_THRESHOLD = 15  # 低峰阈值：15 航班/小时
-        
-        if len(densities) > 0:
-            peak_windows = []
-            off_peak_windows = []
-            normal_windows = []
-
-            for i, density in enumerate(densities):
-                # 使用绝对阈值判断，而非相对平均值
-                if density >= PEAK_THRESHOLD:
-                    peak_windows.append(time_windows[i])
-                elif density <= OFF_PEAK_THRESHOLD:
-                    off_peak_windows.append(time_windows[i])
-                else:
-                    normal_windows.append(time_windows[i])
+        # 使用绝对阈值判断（见模块顶部的PEAK_THRESHOLD/OFF_PEAK_THRESHOLD），而非相对平均值
+        peak_windows = []
+        off_peak_windows = []
+        normal_windows = []
+
+        for window, code in zip(time_windows, histogram['period_codes']):
+            period = DensityTimeline.PERIOD_LABELS[code]
+            if period == 'peak':
+                peak_windows.append(window)
+            elif period == 'off_peak':
+                off_peak_windows.append(window)
+            else:
+                normal_windows.append(window)
 
-        else:
-            peak_windows = []
-            off_peak_windows = []
-            normal_windows = []
-            
         # 计算平均密度用于显示
-        avg_density = statistics.mean(densities) if densities else 0
+        avg_density = histogram['average_density']
 
         return {
             'time_windows': time_windows,
             'densities': densities,
+            'window_counts': window_counts,
             'average_density': avg_density,
             'peak_windows': peak_windows,
             'off_peak_windows': off_peak_windows,
@@ -161,10 +420,157 @@ class DensityAnalyzer:
             }
         }
 
+    @staticmethod
+    def _flight_epoch_times(flights: List) -> np.ndarray:
+        """将航班计划时间转换为排序后的epoch秒数组"""
+        times = np.fromiter((to_epoch_seconds(flight.scheduled_time) for flight in flights),
+                            dtype=np.float64, count=len(flights))
+        times.sort()
+        return times
+
+    def compute_histograms(self, epoch_times: np.ndarray,
+                           window_sizes: Sequence[float] = DEFAULT_WINDOW_SIZES) -> Dict[float, Dict]:
+        """
+        一次遍历计算多个窗口尺寸的航班直方图
+
+        所有尺寸的窗口都从最早航班时间开始对齐。先在各尺寸的公约数粒度上
+        用searchsorted求出每个细粒度边界之前的累计航班数，再按倍数抽取边界
+        相减得到各尺寸的窗口计数，总复杂度O(F log F + W)。
+
+        参数:
+            epoch_times: 航班时间（epoch秒），可以未排序
+            window_sizes: 窗口尺寸列表（分钟）
+
+        返回:
+            {窗口尺寸: {
+                'window_minutes': float,
+                'window_edges': np.ndarray,  # 窗口边界（epoch秒），长度W+1
+                'counts': np.ndarray,        # 每个窗口的航班数
+                'densities': np.ndarray,     # 每个窗口的密度（航班/小时）
+                'period_codes': np.ndarray,  # 时间段编码（DensityTimeline.PERIOD_LABELS）
+                'average_density': float
+            }}
+
+        异常:
+            ValueError: 细粒度网格超过MAX_FINE_WINDOWS个格点
+        """
+        times = np.sort(np.asarray(epoch_times, dtype=np.float64))
+        sizes_seconds = {size: max(int(round(size * 60)), 1) for size in window_sizes}
+
+        if times.size == 0:
+            return {size: {
+                'window_minutes': size,
+                'window_edges': np.zeros(0, dtype=np.float64),
+                'counts': np.zeros(0, dtype=np.int64),
+                'densities': np.zeros(0, dtype=np.float64),
+                'period_codes': np.zeros(0, dtype=np.int8),
+                'average_density': 0.0
+            } for size in window_sizes}
+
+        start = times[0]
+        span = times[-1] - start
+
+        # 与逐窗口构造方式一致：窗口不断向后延伸，直到覆盖最晚航班
+        window_counts_needed = {size: int(math.ceil(span / seconds)) + 1
+                                for size, seconds in sizes_seconds.items()}
+
+        # 细粒度网格：所有窗口尺寸的最大公约数
+        base = reduce(math.gcd, sizes_seconds.values())
+        fine_count = max(window_counts_needed[size] * (seconds // base)
+                         for size, seconds in sizes_seconds.items())
+        if fine_count > MAX_FINE_WINDOWS:
+            raise ValueError(f'时间跨度 {span / 3600:.1f} 小时在 {base} 秒粒度上需要 {fine_count} 个窗口，'
+                             f'超过上限 {MAX_FINE_WINDOWS}，请使用更大或公约数更大的窗口尺寸')
+        fine_edges = start + np.arange(fine_count + 1, dtype=np.float64) * base
+        # cumulative[j] = 第j个细粒度边界之前的航班数
+        cumulative = np.searchsorted(times, fine_edges, side='left')
+
+        histograms = {}
+        for size, seconds in sizes_seconds.items():
+            step = seconds // base
+            num_windows = window_counts_needed[size]
+            counts = np.diff(cumulative[:(num_windows + 1) * step:step]).astype(np.int64)
+            densities = counts / (seconds / 3600)
+            histograms[size] = {
+                'window_minutes': size,
+                'window_edges': start + np.arange(num_windows + 1, dtype=np.float64) * seconds,
+                'counts': counts,
+                'densities': densities,
+                'period_codes': classify_densities(densities),
+                'average_density': float(densities.mean())
+            }
+
+        return histograms
+
+    def analyze_density_multi(self, flights: List,
+                              window_sizes: Optional[Sequence[float]] = None) -> Dict:
+        """
+        多分辨率密度分析（例如5/15/30/60分钟窗口一次得出）
+
+        返回结果以数组形式保存，适合对全年历史航班做分析。
+
+        参数:
+            flights: 航班列表
+            window_sizes: 窗口尺寸列表（分钟），默认DEFAULT_WINDOW_SIZES
+
+        返回:
+            {
+                'flight_count': int,
+                'start': datetime or None,  # 所有窗口共同的起点
+                'end': datetime or None,    # 最晚航班时间
+                'resolutions': {窗口尺寸: compute_histograms()的单项结果}
+            }
+        """
+        return self.analyze_epoch_times(self._flight_epoch_times(flights), window_sizes)
+
+    def analyze_epoch_times(self, epoch_times: np.ndarray,
+                            window_sizes: Optional[Sequence[float]] = None) -> Dict:
+        """
+        直接对epoch秒数组做多分辨率密度分析（API批量分析时无需构造Flight对象）
+
+        返回格式同analyze_density_multi()
+        """
+        window_sizes = list(window_sizes or DEFAULT_WINDOW_SIZES)
+        times = np.sort(np.asarray(epoch_times, dtype=np.float64))
+        return {
+            'flight_count': int(times.size),
+            'start': from_epoch_seconds(times[0]) if times.size else None,
+            'end': from_epoch_seconds(times[-1]) if times.size else None,
+            'resolutions': self.compute_histograms(times, window_sizes)
+        }
+
+    def build_timeline(self, flights: List) -> DensityTimeline:
+        """
+        构建密度时间轴（每批航班调用一次）
+
+        参数:
+            flights: 航班列表
+
+        返回:
+            DensityTimeline对象，之后的时间段查询均通过二分查找完成
+        """
+        if not flights:
+            return DensityTimeline.empty()
+
+        histogram = self.compute_histograms(
+            self._flight_epoch_times(flights), [self.time_window_minutes]
+        )[self.time_window_minutes]
+
+        return DensityTimeline(
+            window_edges=histogram['window_edges'],
+            counts=histogram['counts'],
+            densities=histogram['densities'],
+            period_codes=histogram['period_codes'],
+            average_density=histogram['average_density']
+        )
+
     def get_period_for_time(self, flights: List, query_time: datetime) -> str:
         """
         获取指定时间点所属的时间段类型
 
+        需要对同一批航班多次查询时，应先调用build_timeline()构建时间轴，
+        再使用DensityTimeline.period_at()，避免每次查询都重新分析整个航班列表。
+
         参数:
             flights: 航班列表（用于密度分析）
             query_time: 查询的时间点
@@ -175,62 +581,7 @@ class DensityAnalyzer:
             'normal' - 正常期
             'unknown' - 未知（无航班数据）
         """
-        if not flights:
-            return 'unknown'
-
-        analysis = self.analyze_density(flights)
-
-        # 检查查询时间属于哪个时间窗口
-        for i, (window_start, window_end) in enumerate(analysis['time_windows']):
-            if window_start <= query_time < window_end:
-                # 检查该窗口属于哪种类型
-                if (window_start, window_end) in analysis['peak_windows']:
-                    return 'peak'
-                elif (window_start, window_end) in analysis['off_peak_windows']:
-                    return 'off_peak'
-                else:
-                    return 'normal'
-
-        # 如果查询时间不在任何窗口内，根据机场运营规律推断
-        # 参考机场运营数据和中国民航航班时刻分布
-        avg_density = analysis['average_density']
-        
-        # 绝对判断标准
-        PEAK_THRESHOLD = 40    # 高峰阈值：40 航班/小时
-        OFF_PEAK_THRESHOLD = 15  # 低峰阈值：15 航班/小时
-        
-        if avg_density > 0:
-            hour = query_time.hour
-            weekday = query_time.weekday()  # 0=周一, 6=周日
-
-            # 判断是否为工作日
-            is_weekday = weekday < 5
-
-            # 首先根据实际密度判断
-            if avg_density >= PEAK_THRESHOLD:
-                return 'peak'
-            elif avg_density <= OFF_PEAK_THRESHOLD:
-                return 'off_peak'
-            
-            # 如果密度处于临界值，再根据时间段推断
-            if is_weekday:
-                # 工作日典型高峰时段
-                if (7 <= hour <= 10) or (17 <= hour <= 21):
-                    return 'peak' if avg_density >= 35 else 'normal'
-                elif (0 <= hour <= 5):
-                    return 'off_peak'
-                else:
-                    return 'normal'
-            else:
-                # 周末时段
-                if (9 <= hour <= 12) or (15 <= hour <= 20):
-                    return 'peak' if avg_density >= 35 else 'normal'
-                elif (0 <= hour <= 7):
-                    return 'off_peak'
-                else:
-                    return 'normal'
-
-        return 'unknown'
+        return self.build_timeline(flights).period_at(query_time)
 
     def get_weights_for_period(self, period_type: str) -> Dict[str, float]:
         """
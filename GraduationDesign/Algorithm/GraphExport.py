@@ -0,0 +1,119 @@
+"""
+路网列式二进制导出
+=====================================
+
+/api/nodes 的JSON为每个节点、每条边重复键名，浏览器端还要逐个解析成对象。
+本模块把路网导出为列式二进制，前端可直接用 TypedArray 视图读取，无需逐对象解析：
+
+    偏移 0   : 魔数 b'AGB1'（4字节）
+    偏移 4   : 头部长度 H（uint32，小端）
+    偏移 8   : 头部JSON（UTF-8，以空格补齐到8字节对齐）
+    偏移 8+H : 各列数据，依次排列，每列起点8字节对齐
+
+头部JSON示例：
+    {"version": 1, "node_count": N, "edge_count": E,
+     "node_type_names": [...], "edge_type_names": [...],
+     "columns": [{"name": "xs", "dtype": "float64", "offset": 0, "length": N}, ...]}
+
+列的 offset 相对于数据区起点（8+H）。所有数值均为小端：
+
+    node_ids      int32    节点ID
+    xs, ys        float64  投影坐标（米）
+    node_type     uint16   节点类型编码，索引 node_type_names
+    edge_from     uint32   边起点（节点下标，非ID）
+    edge_to       uint32   边终点（节点下标）
+    edge_length   float32  边长度（米）
+    edge_type     uint16   边类型编码，索引 edge_type_names
+
+边与 /api/nodes 相同为有向边（双向道路出现两次）。
+"""
+
+import json
+import struct
+from typing import Dict, Tuple, Union
+
+import numpy as np
+
+from .Astar import AirportGraph
+from .SharedGraph import GraphArrays
+
+FORMAT_MAGIC = b'AGB1'
+FORMAT_VERSION = 1
+_ALIGNMENT = 8
+
+
+def _align(size: int) -> int:
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def export_columnar(source: Union[AirportGraph, GraphArrays]) -> bytes:
+    """
+    导出列式二进制
+
+    参数:
+        source: 路网图或其数值数组表示
+    """
+    arrays = source if isinstance(source, GraphArrays) else GraphArrays.from_graph(source)
+
+    degree = np.diff(arrays.indptr)
+    columns = [
+        ('node_ids', arrays.node_ids.astype('<i4')),
+        ('xs', arrays.xs.astype('<f8')),
+        ('ys', arrays.ys.astype('<f8')),
+        ('node_type', arrays.node_type_codes.astype('<u2')),
+        ('edge_from', np.repeat(np.arange(arrays.node_count, dtype='<u4'), degree)),
+        ('edge_to', arrays.indices.astype('<u4')),
+        ('edge_length', arrays.edge_length.astype('<f4')),
+        ('edge_type', arrays.edge_type_codes.astype('<u2'))
+    ]
+
+    layout = []
+    offset = 0
+    for name, values in columns:
+        layout.append({
+            'name': name,
+            'dtype': values.dtype.name,
+            'offset': offset,
+            'length': len(values)
+        })
+        offset = _align(offset + values.nbytes)
+
+    header = json.dumps({
+        'version': FORMAT_VERSION,
+        'node_count': arrays.node_count,
+        'edge_count': arrays.edge_count,
+        'node_type_names': list(arrays.node_type_names),
+        'edge_type_names': list(arrays.edge_type_names),
+        'columns': layout
+    }, ensure_ascii=False).encode('utf-8')
+    header += b' ' * (_align(len(header)) - len(header))
+
+    buffer = bytearray(8 + len(header) + offset)
+    buffer[0:4] = FORMAT_MAGIC
+    struct.pack_into('<I', buffer, 4, len(header))
+    buffer[8:8 + len(header)] = header
+    data_start = 8 + len(header)
+    for column, (_, values) in zip(layout, columns):
+        start = data_start + column['offset']
+        buffer[start:start + values.nbytes] = values.tobytes()
+    return bytes(buffer)
+
+
+def read_columnar(data: bytes) -> Tuple[Dict, Dict[str, np.ndarray]]:
+    """
+    读取列式二进制（参考实现，前端按相同布局用TypedArray读取）
+
+    返回:
+        (头部字典, {列名: 只读数组视图})
+    """
+    if data[0:4] != FORMAT_MAGIC:
+        raise ValueError("不是路网列式二进制数据")
+    header_length, = struct.unpack_from('<I', data, 4)
+    header = json.loads(data[8:8 + header_length].decode('utf-8'))
+    data_start = 8 + header_length
+    columns = {
+        column['name']: np.frombuffer(data, dtype=np.dtype(column['dtype']).newbyteorder('<'),
+                                      count=column['length'], offset=data_start + column['offset'])
+        for column in header['columns']
+    }
+    return header, columns
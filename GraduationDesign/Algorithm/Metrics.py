@@ -0,0 +1,336 @@
+"""
+进程内指标注册表
+=====================================
+
+此前服务只有标准输出打印，没有可采集的运行指标。本模块提供轻量的计数器、仪表与直方图，
+并按 Prometheus 文本格式（0.0.4）导出，由 API 的 /metrics 接口提供给采集端：
+
+- 记录只做一次加锁的加法（直方图额外做一次二分查找），热路径上每次搜索/请求只记录一次，
+  例如A*的扩展节点数使用搜索结束时的迭代计数，而不是在循环内逐个累加
+- 带标签的指标按标签值缓存子指标，调用方可预先取得子指标避免重复查找
+- 回调指标（缓存年龄、命中率等）在导出时才计算，平时没有任何开销
+
+指标保存在进程内存中，多进程部署时每个工作进程各自计数。导出的每个样本都带有进程号标签
+（默认 pid），同一实例不同工作进程的序列互不混淆，采集端按需以 sum without (pid) 汇总。
+"""
+
+import bisect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+# 默认耗时分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+# 导出样本：(名称后缀, 附加标签, 值)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if math.isnan(value):
+        return 'NaN'
+    return repr(float(value))
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape_label(value)}"' for name, value in labels.items()) + '}'
+
+
+# ==================== 子指标（单组标签值） ====================
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def samples(self) -> List[Sample]:
+        return [('_total', {}, self.value)]
+
+
+class _GaugeChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self.value = float(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def samples(self) -> List[Sample]:
+        return [('', {}, self.value)]
+
+
+class _HistogramChild:
+    __slots__ = ('upper_bounds', 'counts', 'sum', 'count', '_lock')
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)  # 最后一格为 +Inf
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.upper_bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """记录with块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            counts = list(self.counts)
+            total, count = self.sum, self.count
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.upper_bounds + (math.inf,), counts):
+            cumulative += bucket_count
+            samples.append(('_bucket', {'le': _format_value(bound)}, cumulative))
+        samples.append(('_sum', {}, total))
+        samples.append(('_count', {}, count))
+        return samples
+
+
+# ==================== 指标 ====================
+
+class Metric:
+    """指标基类：按标签值管理子指标"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        """
+        参数:
+            name: 指标名称
+            documentation: 说明（导出为 # HELP）
+            labelnames: 标签名
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, object] = {}
+        self._lock = threading.Lock()
+        # 无标签指标直接持有唯一的子指标
+        self._default = None if self.labelnames else self.labels()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **named):
+        """取得标签值对应的子指标（首次使用时创建）"""
+        if named:
+            values = tuple(named[name] for name in self.labelnames)
+        key = tuple(map(str, values))
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} 需要标签 {self.labelnames}，实际为 {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def collect(self) -> Iterable[Tuple[Dict[str, str], Sample]]:
+        """导出样本：(标签, 样本)"""
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            labels = dict(zip(self.labelnames, key))
+            for sample in child.samples():
+                yield labels, sample
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    """可增可减的仪表"""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self._default.set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._default.inc(amount)
+
+
+class Histogram(Metric):
+    """分桶直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        参数:
+            buckets: 分桶上界（升序，+Inf自动追加）
+        """
+        self.upper_bounds = tuple(sorted(float(bound) for bound in buckets if not math.isinf(bound)))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        self._default.observe(value)
+
+    def time(self):
+        return self._default.time()
+
+
+class CallbackMetric(Metric):
+    """导出时由回调函数计算取值的指标"""
+
+    def __init__(self, name: str, documentation: str,
+                 callback: Callable[[], Union[float, Iterable[Tuple[LabelValues, float]], None]],
+                 labelnames: Sequence[str] = (), kind: str = 'gauge'):
+        """
+        参数:
+            callback: 无标签时返回数值；有标签时返回 [(标签值元组, 数值), ...]；返回None表示暂无数据
+            kind: 导出类型（'gauge' 或 'counter'）
+        """
+        # 不持有子指标，无需调用基类初始化
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.callback = callback
+        self.kind = kind
+
+    def labels(self, *values, **named):
+        raise TypeError(f"{self.name} 为回调指标，不能直接记录")
+
+    def collect(self) -> Iterable[Tuple[Dict[str, str], Sample]]:
+        try:
+            result = self.callback()
+        except Exception as e:
+            print(f"[Metrics] 回调指标 {self.name} 计算失败: {e}")
+            return
+        if result is None:
+            return
+        suffix = '_total' if self.kind == 'counter' else ''
+        if not self.labelnames:
+            yield {}, (suffix, {}, float(result))
+            return
+        for key, value in result:
+            if value is not None:
+                yield dict(zip(self.labelnames, (str(v) for v in key))), (suffix, {}, float(value))
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self, process_label: Optional[str] = 'pid'):
+        """
+        参数:
+            process_label: 导出时附加到每个样本的进程号标签名；为None时不附加
+        """
+        self.process_label = process_label
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """注册指标（名称不能重复）"""
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"指标已注册: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name: str, documentation: str, callback: Callable,
+                 labelnames: Sequence[str] = (), kind: str = 'gauge') -> CallbackMetric:
+        return self.register(CallbackMetric(name, documentation, callback, labelnames, kind))
+
+    def get(self, name: str) -> Optional[Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """导出为 Prometheus 文本格式"""
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        # 导出时取进程号，fork出的工作进程各自带上自己的pid
+        process = {self.process_label: str(os.getpid())} if self.process_label else {}
+        lines = []
+        for metric in metrics:
+            help_text = metric.documentation.replace('\\', '\\\\').replace('\n', '\\n')
+            lines.append(f'# HELP {metric.name} {help_text}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for labels, (suffix, extra, value) in metric.collect():
+                name = metric.name + ('' if metric.kind == 'counter' and suffix == '_total'
+                                      and metric.name.endswith('_total') else suffix)
+                lines.append(f'{name}{_format_labels({**process, **labels, **extra})} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+# 进程级默认注册表
+REGISTRY = MetricsRegistry()
+
+# ==================== 算法指标 ====================
+
+ASTAR_SEARCH_SECONDS = REGISTRY.histogram(
+    'astar_search_duration_seconds', 'A*单次搜索耗时（秒）', ['result'])
+ASTAR_EXPANDED_NODES = REGISTRY.histogram(
+    'astar_expanded_nodes', 'A*单次搜索扩展的节点数', ['result'],
+    buckets=(10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000))
+ROUTE_LOOKUPS = REGISTRY.counter(
+    'scheduler_route_lookups_total',
+    '调度器路径查询次数，outcome为 batch_hit（批内缓存）/ shared_hit（进程级缓存）/ search（执行A*）',
+    ['outcome'])
+CONFLICT_DETECTION_SECONDS = REGISTRY.histogram(
+    'conflict_detection_duration_seconds', '每轮冲突检测耗时（秒）', ['strategy', 'round'])
@@ -14,17 +14,33 @@
 - 冲突消解（等待、重规划、速度调整）
 """
 
+import atexit
+import bisect
 import heapq
 import math
-from typing import List, Dict, Tuple, Optional, Set
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from time import perf_counter
+from typing import Any, Callable, List, Dict, Tuple, Optional, Set
 from dataclasses import dataclass, field
 from datetime import datetime, timedelta
 from enum import Enum
 import copy
 
+import numpy as np
+
 from .Astar import AirportGraph, Node, AStarOptimizer
-from .DensityAnalyzer import DensityAnalyzer
-from .WeatherService import get_weather_service, WeatherService
+from .CompactSchedule import CompactWaypoints
+from .CrossingTable import CrossingTable, get_crossing_table
+from .RouteCache import RouteCache, RouteKey, get_shared_route_cache, make_route_key
+from .SharedGraph import GraphArrays, SharedGraphHandle, attach_shared_graph, publish_graph
+from .TimeUtils import from_epoch_seconds, to_epoch_seconds
+from .DensityAnalyzer import DensityAnalyzer, DensityTimeline, StreamingDensityTracker
+from .Metrics import CONFLICT_DETECTION_SECONDS, ROUTE_LOOKUPS
+from .WeatherService import get_weather_service, WeatherService, WeatherSnapshot
 
 
 class OperationType(Enum):
@@ -75,7 +91,7 @@ class SpatioTemporalSlot:
 class Conflict:
     """冲突信息"""
     conflict_id: str
-    conflict_type: str  # 'node', 'edge', 'crossing'
+    conflict_type: str  # 'node', 'edge', 'head_on', 'crossing'
     flight_ids: List[str]
     node_id: int
     time: datetime
@@ -92,7 +108,7 @@ class AircraftSchedule:
     path: List[Node]
     start_time: datetime
     end_time: datetime
-    waypoints: List[Tuple[Node, datetime]]  # (节点, 到达时间)
+    waypoints: CompactWaypoints  # (节点, 到达时间) 序列，内部为数组存储
     conflicts: List[Conflict] = field(default_factory=list)
     total_distance: float = 0.0
     total_time: float = 0.0
@@ -100,17 +116,45 @@ class AircraftSchedule:
     weights: Dict[str, float] = field(default_factory=dict)  # 动态权重配置
 
 
+# 路段通行记录：(路段编号, 是否沿节点ID升序方向, 进入时刻, 离开时刻, 起始途经点下标)
+SegmentTraversal = Tuple[int, bool, float, float, int]
+
+
+def _segment_traversals(waypoints: CompactWaypoints,
+                        crossing_table: CrossingTable) -> Dict[int, List[SegmentTraversal]]:
+    """
+    将航班途经点序列转换为按路段分组的通行记录（时刻为epoch秒）
+
+    不在路网中的节点对（理论上不会出现）被忽略。
+    """
+    by_segment: Dict[int, List[SegmentTraversal]] = {}
+    node_ids = waypoints.node_ids.tolist()
+    times = waypoints.times.tolist()
+    for i in range(len(node_ids) - 1):
+        from_id, to_id = node_ids[i], node_ids[i + 1]
+        segment = crossing_table.segment_of(from_id, to_id)
+        if segment is None:
+            continue
+        by_segment.setdefault(segment, []).append(
+            (segment, from_id < to_id, times[i], times[i + 1], i)
+        )
+    return by_segment
+
+
 class ConflictDetector:
     """冲突检测器"""
 
-    def __init__(self, safety_margin: int = 60):
+    def __init__(self, safety_margin: int = 60,
+                 crossing_table: Optional[CrossingTable] = None):
         """
         初始化冲突检测器
 
         参数:
             safety_margin: 安全时间间隔（秒）
+            crossing_table: 路段交叉表；为None时只检测节点冲突
         """
         self.safety_margin = safety_margin
+        self.crossing_table = crossing_table
 
     def detect_all_conflicts(self, schedules: Dict[str, AircraftSchedule]) -> List[Conflict]:
         """
@@ -126,49 +170,122 @@ class ConflictDetector:
         conflict_dict = {}
         
         flight_list = list(schedules.values())
-        
+        traversals = self._prepare_traversals(flight_list)
+
         # 两两检测冲突
         for i, sched1 in enumerate(flight_list):
             for sched2 in flight_list[i+1:]:
-                # 检测节点冲突
-                node_conflicts = self._detect_node_conflicts(sched1, sched2)
-                
-                for conflict in node_conflicts:
-                    # 关键：排序航班ID，确保AB和BA是同一个key
-                    sorted_flight_ids = tuple(sorted(conflict.flight_ids))
-                    
-                    # 时间精确到分钟
-                    if hasattr(conflict.time, 'strftime'):
-                        time_key = conflict.time.strftime('%Y%m%d%H%M')
-                    else:
-                        time_str = str(conflict.time)
-                        # 提取时间部分，忽略日期
-                        if ' ' in time_str:
-                            time_key = time_str.split(' ')[1][:5].replace(':', '')
-                        else:
-                            time_key = time_str[:4]
-                    
-                    # 唯一键：排序后的航班对 + 节点ID + 时间
-                    conflict_key = (sorted_flight_ids, conflict.node_id, time_key)
-                    
-                    # 只保留第一个（AB检测到的）
-                    if conflict_key not in conflict_dict:
-                        # 确保flight_ids也是排序的，这样显示时一致
-                        conflict.flight_ids = list(sorted_flight_ids)
-                        conflict_dict[conflict_key] = conflict
-        
+                # 时间上不可能相遇的航班对直接跳过
+                if not self._schedules_overlap(sched1, sched2):
+                    continue
+                self._collect_pair_conflicts(sched1, sched2, traversals, conflict_dict)
+
         # 返回去重后的冲突列表
         return list(conflict_dict.values())
 
-                # 检测路径交叉冲突（暂时禁用，减少误报）
-                # crossing_conflicts = self._detect_crossing_conflicts(sched1, sched2)
-                # for conflict in crossing_conflicts:
-                #     conflict_key = (conflict.conflict_id, conflict.time)
-                #     if conflict_key not in seen_conflicts:
-                #         seen_conflicts.add(conflict_key)
-                #         conflicts.append(conflict)
+    def detect_windowed_conflicts(self, schedules: Dict[str, AircraftSchedule],
+                                  window_seconds: float) -> List[Conflict]:
+        """
+        按时间窗分解检测冲突（结果与detect_all_conflicts相同，顺序按窗口排列）
 
-        return conflicts
+        每个航班放入其占用时段 [开始, 结束 + 安全间隔] 覆盖到的所有窗口（相邻窗口互相重叠），
+        只在窗口内两两比较；一对航班只由"两者开始时刻较晚者"所在的窗口负责，
+        既不会遗漏跨窗口边界的冲突，也不会重复检测。
+        交通量有界时总代价随全天航班数线性增长。
+
+        参数:
+            schedules: 所有航班的调度方案
+            window_seconds: 窗口长度（秒）
+        """
+        conflict_dict = {}
+        flight_list = [sched for sched in schedules.values() if len(sched.waypoints) > 0]
+        traversals = self._prepare_traversals(flight_list)
+
+        # 分桶：保持输入顺序，使每对航班的比较顺序与整批检测一致
+        buckets: Dict[int, List[Tuple[int, AircraftSchedule]]] = {}
+        for order, sched in enumerate(flight_list):
+            start = sched.waypoints.epoch_at(0)
+            end = sched.waypoints.epoch_at(-1) + self.safety_margin
+            for window in range(int(start // window_seconds), int(end // window_seconds) + 1):
+                buckets.setdefault(window, []).append((order, sched))
+
+        for window in sorted(buckets):
+            members = buckets[window]
+            for i, (_, sched1) in enumerate(members):
+                start1 = sched1.waypoints.epoch_at(0)
+                for _, sched2 in members[i + 1:]:
+                    owner = max(start1, sched2.waypoints.epoch_at(0))
+                    if int(owner // window_seconds) != window:
+                        continue
+                    if not self._schedules_overlap(sched1, sched2):
+                        continue
+                    self._collect_pair_conflicts(sched1, sched2, traversals, conflict_dict)
+
+        return list(conflict_dict.values())
+
+    def _prepare_traversals(self, flight_list: List[AircraftSchedule]
+                            ) -> Dict[str, Dict[int, List[SegmentTraversal]]]:
+        """预先整理各航班的路段通行记录（未提供交叉表时为空）"""
+        traversals = {}
+        if self.crossing_table is not None:
+            for sched in flight_list:
+                traversals[sched.flight.flight_id] = _segment_traversals(
+                    sched.waypoints, self.crossing_table
+                )
+        return traversals
+
+    def _collect_pair_conflicts(self, sched1: AircraftSchedule, sched2: AircraftSchedule,
+                                traversals: Dict[str, Dict[int, List[SegmentTraversal]]],
+                                conflict_dict: Dict[tuple, Conflict]) -> None:
+        """检测一对航班的冲突并按去重键记入conflict_dict"""
+        # 检测节点冲突
+        node_conflicts = self._detect_node_conflicts(sched1, sched2)
+
+        for conflict in node_conflicts:
+            # 关键：排序航班ID，确保AB和BA是同一个key
+            sorted_flight_ids = tuple(sorted(conflict.flight_ids))
+
+            # 时间精确到分钟
+            if hasattr(conflict.time, 'strftime'):
+                time_key = conflict.time.strftime('%Y%m%d%H%M')
+            else:
+                time_str = str(conflict.time)
+                # 提取时间部分，忽略日期
+                if ' ' in time_str:
+                    time_key = time_str.split(' ')[1][:5].replace(':', '')
+                else:
+                    time_key = time_str[:4]
+
+            # 唯一键：排序后的航班对 + 节点ID + 时间
+            conflict_key = (sorted_flight_ids, conflict.node_id, time_key)
+
+            # 只保留第一个（AB检测到的）
+            if conflict_key not in conflict_dict:
+                # 确保flight_ids也是排序的，这样显示时一致
+                conflict.flight_ids = list(sorted_flight_ids)
+                conflict_dict[conflict_key] = conflict
+
+        # 检测路段冲突（同路段追越、对头、交叉/共用路段）
+        if self.crossing_table is not None:
+            segment_conflicts = self._detect_crossing_conflicts(
+                sched1, sched2,
+                traversals[sched1.flight.flight_id],
+                traversals[sched2.flight.flight_id]
+            )
+            for conflict in segment_conflicts:
+                conflict_key = (tuple(conflict.flight_ids), conflict.conflict_id,
+                                conflict.time.strftime('%Y%m%d%H%M'))
+                if conflict_key not in conflict_dict:
+                    conflict_dict[conflict_key] = conflict
+
+    def _schedules_overlap(self, sched1: AircraftSchedule, sched2: AircraftSchedule) -> bool:
+        """两航班的滑行时间段（含安全间隔）是否有交集（途经时刻单调递增）"""
+        wp1, wp2 = sched1.waypoints, sched2.waypoints
+        if len(wp1) == 0 or len(wp2) == 0:
+            return False
+        margin = self.safety_margin
+        return not (wp1.epoch_at(-1) + margin <= wp2.epoch_at(0) or
+                    wp2.epoch_at(-1) + margin <= wp1.epoch_at(0))
 
     def _calculate_conflict_severity(self, time_diff: float) -> str:
         """
@@ -190,74 +307,104 @@ class ConflictDetector:
                               sched2: AircraftSchedule) -> List[Conflict]:
         """检测节点冲突"""
         conflicts = []
-
-        for node1, time1 in sched1.waypoints:
-            for node2, time2 in sched2.waypoints:
-                if node1.id == node2.id:
-                    # 同一节点，检查时间间隔
-                    time_diff = abs((time1 - time2).total_seconds())
-                    if time_diff < self.safety_margin:
-                        # 根据时间差判断严重度（基于ICAO最低间隔标准）
-                        # HIGH: <30秒 - 紧急冲突，必须立即处理
-                        # MEDIUM: 30-90秒 - 中度冲突，需要调整
-                        # LOW: >90秒 - 轻度冲突，可容忍
-                        severity = self._calculate_conflict_severity(time_diff)
-                        
-                        # 排序航班ID，确保一致性
-                        sorted_ids = sorted([sched1.flight.flight_id, sched2.flight.flight_id])
-                        conflict = Conflict(
-                            conflict_id=f"node_{sorted_ids[0]}_{sorted_ids[1]}_{node1.id}",
-                            conflict_type='node',
-                            flight_ids=sorted_ids,
-                            node_id=node1.id,
-                            time=time1 if time1 < time2 else time2,
-                            severity=severity
-                        )
-                        conflicts.append(conflict)
+        wp1, wp2 = sched1.waypoints, sched2.waypoints
+        if len(wp1) == 0 or len(wp2) == 0:
+            return conflicts
+        margin = self.safety_margin
+
+        # 同一节点且时间间隔小于安全间隔的途经点对（按行优先顺序，与逐对比较一致）
+        times1, times2 = wp1.times, wp2.times
+        same_node = wp1.node_ids[:, None] == wp2.node_ids[None, :]
+        time_diffs = np.abs(times1[:, None] - times2[None, :])
+        rows, cols = np.nonzero(same_node & (time_diffs < margin))
+
+        for i, j in zip(rows.tolist(), cols.tolist()):
+            time_diff = float(time_diffs[i, j])
+            # 根据时间差判断严重度（基于ICAO最低间隔标准）
+            # HIGH: <30秒 - 紧急冲突，必须立即处理
+            # MEDIUM: 30-90秒 - 中度冲突，需要调整
+            # LOW: >90秒 - 轻度冲突，可容忍
+            severity = self._calculate_conflict_severity(time_diff)
+
+            # 排序航班ID，确保一致性
+            sorted_ids = sorted([sched1.flight.flight_id, sched2.flight.flight_id])
+            node_id = int(wp1.node_ids[i])
+            conflict = Conflict(
+                conflict_id=f"node_{sorted_ids[0]}_{sorted_ids[1]}_{node_id}",
+                conflict_type='node',
+                flight_ids=sorted_ids,
+                node_id=node_id,
+                time=wp1.time_at(i) if times1[i] < times2[j] else wp2.time_at(j),
+                severity=severity
+            )
+            conflicts.append(conflict)
 
         return conflicts
 
-    def _detect_crossing_conflicts(self, sched1: AircraftSchedule,
-                                  sched2: AircraftSchedule) -> List[Conflict]:
-        """检测路径交叉冲突"""
-        conflicts = []
+    def _detect_crossing_conflicts(self, sched1: AircraftSchedule, sched2: AircraftSchedule,
+                                   traversals1: Dict[int, List[SegmentTraversal]],
+                                   traversals2: Dict[int, List[SegmentTraversal]]) -> List[Conflict]:
+        """
+        检测路段冲突（仅检查交叉表中的候选路段对）
 
-        # 检测边交叉
-        for i in range(len(sched1.waypoints) - 1):
-            node1_a, time1_a = sched1.waypoints[i]
-            node1_b, time1_b = sched1.waypoints[i + 1]
-
-            for j in range(len(sched2.waypoints) - 1):
-                node2_a, time2_a = sched2.waypoints[j]
-                node2_b, time2_b = sched2.waypoints[j + 1]
-
-                # 检测边交叉 (a->b 与 c->d)
-                if self._edges_cross(node1_a, node1_b, node2_a, node2_b):
-                    # 检查时间重叠
-                    if self._time_ranges_overlap(
-                        (time1_a, time1_b),
-                        (time2_a, time2_b)
-                    ):
-                        # 排序航班ID，确保一致性
-                        sorted_ids = sorted([sched1.flight.flight_id, sched2.flight.flight_id])
-                        conflict = Conflict(
-                            conflict_id=f"cross_{sorted_ids[0]}_{sorted_ids[1]}_{node1_a.id}_{node2_a.id}",
-                            conflict_type='crossing',
-                            flight_ids=sorted_ids,
-                            node_id=node1_a.id,
-                            time=time1_a if time1_a < time2_a else time2_a,
-                            severity='high'
-                        )
-                        conflicts.append(conflict)
+        - edge:     同方向通过同一路段且发生追越（进入与离开顺序相反），
+                    或在重叠（共用）路段上通行时间重叠
+        - head_on:  反方向通过同一路段且通行时间重叠
+        - crossing: 通过几何相交的两条路段且通行时间重叠
+        """
+        conflicts = []
+        sorted_ids = sorted([sched1.flight.flight_id, sched2.flight.flight_id])
+
+        for segment, records1 in traversals1.items():
+            # 同一路段
+            for record1 in records1:
+                for record2 in traversals2.get(segment, ()):
+                    conflict_type = self._segment_conflict_type(record1, record2)
+                    if conflict_type:
+                        conflicts.append(self._make_segment_conflict(
+                            conflict_type, sorted_ids, sched1, record1, record2))
+
+            # 交叉或共用的其他路段
+            for other_segment, relation in self.crossing_table.related(segment).items():
+                records2 = traversals2.get(other_segment)
+                if not records2:
+                    continue
+                conflict_type = 'crossing' if relation == CrossingTable.CROSSING else 'edge'
+                for record1 in records1:
+                    for record2 in records2:
+                        if self._time_ranges_overlap(record1[2:4], record2[2:4]):
+                            conflicts.append(self._make_segment_conflict(
+                                conflict_type, sorted_ids, sched1, record1, record2))
 
         return conflicts
 
-    def _edges_cross(self, a1: Node, a2: Node, b1: Node, b2: Node) -> bool:
-        """检测两条边是否交叉"""
-        # 简化判断：如果两条边有共同的中间节点，则可能交叉
-        # 实际应用中可以使用更复杂的几何判断
-        return (a1.id != b1.id and a1.id != b2.id and
-                a2.id != b1.id and a2.id != b2.id)
+    def _segment_conflict_type(self, record1: SegmentTraversal,
+                               record2: SegmentTraversal) -> Optional[str]:
+        """同一路段上两次通行的冲突类型（无冲突返回None）"""
+        _, forward1, entry1, exit1, _ = record1
+        _, forward2, entry2, exit2, _ = record2
+        if forward1 != forward2:
+            if self._time_ranges_overlap((entry1, exit1), (entry2, exit2)):
+                return 'head_on'
+            return None
+        if (entry1 - entry2) * (exit1 - exit2) < 0:
+            return 'edge'
+        return None
+
+    def _make_segment_conflict(self, conflict_type: str, sorted_ids: List[str],
+                               sched1: AircraftSchedule, record1: SegmentTraversal,
+                               record2: SegmentTraversal) -> Conflict:
+        """构造路段冲突，时间取两次通行中较晚的进入时刻"""
+        node_id = int(sched1.waypoints.node_ids[record1[4]])
+        segment_a, segment_b = sorted((record1[0], record2[0]))
+        return Conflict(
+            conflict_id=f"{conflict_type}_{sorted_ids[0]}_{sorted_ids[1]}_{segment_a}_{segment_b}",
+            conflict_type=conflict_type,
+            flight_ids=sorted_ids,
+            node_id=node_id,
+            time=from_epoch_seconds(max(record1[2], record2[2])),
+            severity='medium' if conflict_type == 'edge' else 'high'
+        )
 
     def _time_ranges_overlap(self, range1, range2) -> bool:
         """检测时间范围是否重叠"""
@@ -266,6 +413,233 @@ class ConflictDetector:
         return not (end1 <= start2 or end2 <= start1)
 
 
+class OccupancyIndex:
+    """
+    时空占用索引
+
+    按节点记录已固定航班经过该节点的时刻（epoch秒，升序）；
+    提供交叉表时，还按路段记录通行时间段（按离开时刻升序），
+    用于快速查询某节点/路段在给定时刻之后的占用情况。
+    """
+
+    def __init__(self, crossing_table: Optional[CrossingTable] = None):
+        self.crossing_table = crossing_table
+        self._times: Dict[int, List[float]] = {}
+        self._flight_ids: Dict[int, List[str]] = {}
+        # 路段编号 -> 离开时刻列表 / (离开时刻, 进入时刻, 方向, 航班ID) 列表
+        self._segment_exits: Dict[int, List[float]] = {}
+        self._segment_records: Dict[int, List[Tuple[float, float, bool, str]]] = {}
+
+    def add(self, schedule: AircraftSchedule) -> None:
+        """登记一个航班的全部节点与路段占用"""
+        flight_id = schedule.flight.flight_id
+        waypoints = schedule.waypoints
+        for node_id, t in zip(waypoints.node_ids.tolist(), waypoints.times.tolist()):
+            times = self._times.setdefault(node_id, [])
+            flight_ids = self._flight_ids.setdefault(node_id, [])
+            pos = bisect.bisect_right(times, t)
+            times.insert(pos, t)
+            flight_ids.insert(pos, flight_id)
+
+        if self.crossing_table is None:
+            return
+        for records in _segment_traversals(waypoints, self.crossing_table).values():
+            for segment, forward, entry, exit_time, _ in records:
+                exits = self._segment_exits.setdefault(segment, [])
+                pos = bisect.bisect_right(exits, exit_time)
+                exits.insert(pos, exit_time)
+                self._segment_records.setdefault(segment, []).insert(
+                    pos, (exit_time, entry, forward, flight_id))
+
+    def remove(self, schedule: AircraftSchedule) -> None:
+        """移除一个航班的全部节点与路段占用"""
+        flight_id = schedule.flight.flight_id
+        for node_id in set(schedule.waypoints.node_ids.tolist()):
+            times = self._times.get(node_id, [])
+            flight_ids = self._flight_ids.get(node_id, [])
+            keep = [i for i, fid in enumerate(flight_ids) if fid != flight_id]
+            self._times[node_id] = [times[i] for i in keep]
+            self._flight_ids[node_id] = [flight_ids[i] for i in keep]
+
+        if self.crossing_table is None:
+            return
+        for segment in _segment_traversals(schedule.waypoints, self.crossing_table):
+            records = self._segment_records.get(segment, [])
+            kept = [record for record in records if record[3] != flight_id]
+            self._segment_records[segment] = kept
+            self._segment_exits[segment] = [record[0] for record in kept]
+
+    def times_after(self, node_id: int, t: float) -> List[float]:
+        """获取节点在时刻t之后（含）的全部占用时刻"""
+        times = self._times.get(node_id)
+        if not times:
+            return []
+        return times[bisect.bisect_left(times, t):]
+
+    def segment_records_after(self, segment: int, t: float) -> List[Tuple[float, float, bool, str]]:
+        """获取路段上离开时刻晚于t的全部通行记录 (离开时刻, 进入时刻, 方向, 航班ID)"""
+        exits = self._segment_exits.get(segment)
+        if not exits:
+            return []
+        return self._segment_records[segment][bisect.bisect_right(exits, t):]
+
+
+class MinimalDelayResolver:
+    """
+    最小延误冲突消解器
+
+    航班按调度策略顺序依次固定。对待固定航班计算平移量s的禁止区间（均为开区间）：
+    - 节点：途经时刻t与已占用时刻t_o满足 |t + s - t_o| < margin
+    - 对头/交叉/共用路段：通行时段[a+s, b+s]与已占用时段[c, d]重叠，即 s ∈ (c-b, d-a)
+    - 同向同路段：进入与离开顺序相反（追越），即 s 位于 c-a 与 d-b 之间
+    对所有禁止区间排序扫描，即可得到清除全部冲突的最小非负平移量。
+    由于已固定航班不再移动，纯延误策略一遍扫描即可收敛。
+    """
+
+    def __init__(self, safety_margin: float, crossing_table: Optional[CrossingTable] = None):
+        """
+        参数:
+            safety_margin: 安全时间间隔（秒），与ConflictDetector保持一致
+            crossing_table: 路段交叉表；为None时只考虑节点冲突
+        """
+        self.safety_margin = safety_margin
+        self.crossing_table = crossing_table
+        self.index = OccupancyIndex(crossing_table)
+
+    def forbidden_intervals(self, schedule: AircraftSchedule) -> List[Tuple[float, float]]:
+        """计算航班平移量的禁止区间（开区间，只保留与s >= 0相关的部分）"""
+        margin = self.safety_margin
+        intervals = []
+        waypoints = schedule.waypoints
+        for node_id, t in zip(waypoints.node_ids.tolist(), waypoints.times.tolist()):
+            for occupied in self.index.times_after(node_id, t - margin):
+                intervals.append((occupied - t - margin, occupied - t + margin))
+
+        if self.crossing_table is None:
+            return intervals
+
+        for segment, records in _segment_traversals(waypoints, self.crossing_table).items():
+            related = self.crossing_table.related(segment)
+            for _, forward, entry, exit_time, _ in records:
+                # 同一路段：反向为对头，同向为追越
+                for occupied_exit, occupied_entry, occupied_forward, _ in \
+                        self.index.segment_records_after(segment, entry):
+                    if occupied_forward != forward:
+                        intervals.append((occupied_entry - exit_time, occupied_exit - entry))
+                    else:
+                        low, high = sorted((occupied_entry - entry, occupied_exit - exit_time))
+                        if low < high:
+                            intervals.append((low, high))
+                # 交叉或共用的其他路段：通行时段不得重叠
+                for other_segment in related:
+                    for occupied_exit, occupied_entry, _, _ in \
+                            self.index.segment_records_after(other_segment, entry):
+                        intervals.append((occupied_entry - exit_time, occupied_exit - entry))
+        return intervals
+
+    def minimal_shift(self, schedule: AircraftSchedule) -> float:
+        """
+        计算清除与所有已固定航班冲突所需的最小延误（秒）
+
+        返回值向上取整到微秒并多留1微秒，避免浮点误差使边界处仍被判为冲突。
+        """
+        shift = 0.0
+        for low, high in sorted(self.forbidden_intervals(schedule)):
+            if low >= shift:
+                break
+            if high > shift:
+                shift = high
+        if shift <= 0:
+            return 0.0
+        return (math.ceil(shift * 1e6) + 1) / 1e6
+
+    def place(self, schedule: AircraftSchedule) -> None:
+        """将航班（已应用延误后）登记为固定航班"""
+        self.index.add(schedule)
+
+
+# ==================== 并行路径规划（子进程） ====================
+
+# 规划子进程映射的共享内存路网数组（由_init_planning_worker初始化）
+_worker_graph_arrays: Optional[GraphArrays] = None
+
+_planning_pool_lock = threading.Lock()
+
+
+def _init_planning_worker(handle: SharedGraphHandle) -> None:
+    """规划子进程初始化：零拷贝映射父进程发布的共享内存路网"""
+    global _worker_graph_arrays
+    _worker_graph_arrays = attach_shared_graph(handle)
+
+
+def _plan_route_task(task: Tuple[str, int, int, Dict[str, float], float, float]
+                     ) -> Tuple[str, Optional[List[int]], Dict]:
+    """
+    规划子进程任务：为单个航班执行A*搜索
+
+    参数:
+        task: (航班ID, 起点ID, 终点ID, 权重, 天气因子, 滑行速度)
+
+    返回:
+        (航班ID, 路径节点ID列表或None, 统计信息)
+    """
+    flight_id, start_id, goal_id, weights, weather_factor, aircraft_speed = task
+    path_ids, stats = _worker_graph_arrays.find_path(
+        start_id, goal_id,
+        weights=weights,
+        weather_factor=weather_factor,
+        aircraft_speed=aircraft_speed
+    )
+    return flight_id, path_ids, stats
+
+
+def _planning_context():
+    """
+    规划进程池的启动方式
+
+    API进程中同时运行着请求线程、预热线程和天气刷新线程，fork会把其他线程持有的锁
+    一并复制到子进程中而导致死锁，因此使用forkserver（不可用时使用spawn）启动子进程。
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def get_planning_pool(graph: AirportGraph, workers: int) -> ProcessPoolExecutor:
+    """
+    获取图的规划进程池（每个进程每个图一个，跨批次复用）
+
+    进程池在首次并行规划时创建，子进程启动时映射一次共享内存路网，之后各批次
+    只提交搜索任务；请求的进程数超过现有进程池时按新进程数重建。进程退出时关闭。
+    """
+    with _planning_pool_lock:
+        pool = getattr(graph, '_planning_pool', None)
+        if pool is not None:
+            executor, size, pid = pool
+            if pid == os.getpid() and size >= workers:
+                return executor
+            if pid == os.getpid():
+                # 不取消已提交的任务，正在使用旧进程池的批次照常完成
+                executor.shutdown(wait=False)
+
+        shared_graph = publish_graph(graph)
+        executor = ProcessPoolExecutor(max_workers=workers,
+                                       mp_context=_planning_context(),
+                                       initializer=_init_planning_worker,
+                                       initargs=(shared_graph.handle,))
+        graph._planning_pool = (executor, workers, os.getpid())
+        atexit.register(executor.shutdown, wait=False, cancel_futures=True)
+        return executor
+
+
+def _discard_planning_pool(graph: AirportGraph, executor: ProcessPoolExecutor) -> None:
+    """丢弃已损坏的进程池（子进程异常退出后），下次并行规划时重建"""
+    with _planning_pool_lock:
+        pool = getattr(graph, '_planning_pool', None)
+        if pool is not None and pool[0] is executor:
+            graph._planning_pool = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
 class MultiAircraftScheduler:
     """
     多航班调度器
@@ -273,33 +647,80 @@ class MultiAircraftScheduler:
     实现多种调度策略：
     1. FCFS (First-Come-First-Serve) - 先来先服务
     2. Priority-based - 基于优先级
-    3. Time-window - 时间窗调度
+    3. Time-window - 时间窗分解调度（按时间窗切分批次，逐窗口规划与消解冲突）
     """
 
     def __init__(self, graph: AirportGraph, strategy: str = 'fcfs',
                  time_window_minutes: int = 30, peak_threshold: float = 0.6,
-                 use_weather: bool = True):
+                 use_weather: bool = True,
+                 density_tracker: Optional[StreamingDensityTracker] = None,
+                 planning_workers: int = 1,
+                 conflict_resolution: str = 'minimal_delay',
+                 shared_route_cache: bool = False,
+                 weather_adcode: Optional[str] = None,
+                 progress_callback: Optional[Callable[[str, Dict[str, Any]], None]] = None):
         """
         初始化调度器
 
         参数:
             graph: 机场路网图
             strategy: 调度策略 ('fcfs', 'priority', 'time_window')
-            time_window_minutes: 时间窗口大小（分钟），用于密度分析
+            time_window_minutes: 时间窗口大小（分钟），用于密度分析；time_window策略下
+                                 同时作为调度分解的窗口长度
             peak_threshold: 高峰期阈值（密度百分比）
             use_weather: 是否考虑天气因素
+            density_tracker: 实时密度跟踪器（可选）。提供时，跟踪窗口覆盖范围内的航班
+                             直接使用实时时间段类型，无需重新执行整批密度分析
+            planning_workers: 路径规划进程数。1为串行规划；大于1时使用进程池并行执行
+                              各航班的A*搜索（进程池按图创建并跨批次复用，见get_planning_pool），
+                              time_window策略下各时间窗也并行规划与消解；0表示使用全部CPU核心
+            conflict_resolution: 冲突消解方式。'minimal_delay'按调度顺序为每个航班计算
+                                 恰好清除冲突的最小延误（一遍收敛）；'fixed_delay'为
+                                 逐轮固定延误45秒的旧方式
+            shared_route_cache: 是否启用进程级路径缓存（挂在路网图上，跨批次共享）；
+                                批内缓存始终启用
+            weather_adcode: 天气城市编码，默认为天气服务的默认城市
+            progress_callback: 进度回调 callback(事件类型, 事件数据)（可选），调度过程中依次收到
+                               routes_planning / route_searched / routes_planned / flight_planned /
+                               conflict_round / scheduled 事件；回调抛出的异常会中止调度
         """
         self.graph = graph
         self.strategy = strategy
+        self.time_window_minutes = time_window_minutes
         self.optimizer = AStarOptimizer(graph)
-        self.conflict_detector = ConflictDetector(safety_margin=30)
+        self.crossing_table = get_crossing_table(graph)
+        self.conflict_detector = ConflictDetector(safety_margin=30, crossing_table=self.crossing_table)
         self.density_analyzer = DensityAnalyzer(
             time_window_minutes=time_window_minutes,
             peak_threshold=peak_threshold
         )
         self.use_weather = use_weather
         self.weather_service = get_weather_service() if use_weather else None
+        self.weather_adcode = weather_adcode
         self.current_weather_factor = 1.0
+        self.weather_snapshot: Optional[WeatherSnapshot] = None
+        self.all_flights: List[Flight] = []
+        self.density_timeline: DensityTimeline = DensityTimeline.empty()
+        self.density_tracker = density_tracker
+        self.planning_workers = planning_workers if planning_workers > 0 else (os.cpu_count() or 1)
+        self.conflict_resolution = conflict_resolution
+        self.shared_route_cache: Optional[RouteCache] = (
+            get_shared_route_cache(graph) if shared_route_cache else None
+        )
+        self.route_cache_stats = self._empty_route_cache_stats()
+        self.progress_callback = progress_callback
+        # 进度计数（整批累计）；time_window策略下各窗口在多个线程中规划，计数与回调加锁
+        self._progress_lock = threading.RLock()
+        self._routes_searched = 0
+        self._routes_to_search = 0
+        self._flights_planned = 0
+        self._flights_total = 0
+
+    def _report(self, event: str, **data) -> None:
+        """向进度回调发布事件（多线程规划时逐个调用回调）"""
+        if self.progress_callback is not None:
+            with self._progress_lock:
+                self.progress_callback(event, data)
 
     def schedule_multiple_flights(self, flights: List[Flight],
                                   max_iterations: int = 10) -> Dict[str, AircraftSchedule]:
@@ -321,69 +742,28 @@ class MultiAircraftScheduler:
         # 1. 对航班排序
         sorted_flights = self._sort_flights(flights)
 
-        # 存储所有航班用于密度分析
-        self.all_flights = flights
+        self.route_cache_stats = self._empty_route_cache_stats()
+        self._routes_searched = self._routes_to_search = self._flights_planned = 0
+        self._flights_total = len(sorted_flights)
 
-        # 2. 依次为每个航班规划路径
-        schedules = {}
-        occupied_slots = []  # 时空占用记录
+        # 天气快照：整批只获取一次
+        self.refresh_weather_snapshot()
 
-        for flight in sorted_flights:
-            print(f"\n正在规划航班: {flight.flight_id}")
-
-            # 计算初始延误（如果有的话）
-            delay = timedelta(0)
-
-            # 尝试规划路径（考虑冲突）
-            schedule = self._plan_single_flight(
-                flight,
-                existing_schedules=schedules,
-                occupied_slots=occupied_slots
-            )
-
-            if schedule:
-                schedules[flight.flight_id] = schedule
-
-                # 记录时空占用
-                for node, time in schedule.waypoints:
-                    occupied_slots.append(SpatioTemporalSlot(
-                        node_id=node.id,
-                        start_time=time,
-                        end_time=time + timedelta(seconds=30),  # 假设占用30秒
-                        flight_id=flight.flight_id
-                    ))
+        # 存储所有航班用于密度分析，并一次性构建本批次的密度时间轴
+        self.all_flights = flights
+        self.density_timeline = self.density_analyzer.build_timeline(flights)
 
-                print(f"  ✓ 路径规划成功")
-                print(f"    - 路径长度: {schedule.total_distance:.2f} 米")
-                print(f"    - 预计时间: {schedule.total_time:.2f} 秒")
-                print(f"    - 延误: {delay.total_seconds():.2f} 秒")
-            else:
-                # 路径规划失败：创建一个失败的调度记录，包含错误信息
-                print(f"  ✗ 路径规划失败 - 起点: {flight.start_node.id}, 终点: {flight.end_node.id}")
+        # 2. 为所有航班规划路径（各航班的A*搜索互不依赖，可并行执行），
+        #    再按调度策略顺序依次合并；time_window策略按时间窗分解，逐窗口规划并消解冲突
+        self._report('routes_planning', flight_count=len(sorted_flights))
+        if self.strategy == 'time_window' and sorted_flights:
+            schedules = self._schedule_time_windows(sorted_flights)
+        else:
+            routes = self._plan_routes(sorted_flights)
+            self._report('routes_planned', route_cache=self.route_cache_summary())
+            schedules = self._merge_routes(sorted_flights, routes)
 
-                # 创建一个标记为失败的调度，这样前端也能看到这个航班
-                failed_schedule = AircraftSchedule(
-                    flight=flight,
-                    path=[flight.start_node, flight.end_node],  # 只包含起点和终点
-                    start_time=flight.scheduled_time,
-                    end_time=flight.scheduled_time,
-                    waypoints=[],
-                    total_distance=0,
-                    total_time=0,
-                    delay=timedelta(0)
-                )
-                # 添加一个特殊的冲突标记
-                failed_schedule.conflicts.append(Conflict(
-                    conflict_id=f"path_fail_{flight.flight_id}",
-                    conflict_type='path_not_found',
-                    flight_ids=[flight.flight_id],
-                    node_id=flight.start_node.id,
-                    time=flight.scheduled_time,
-                    severity='critical'
-                ))
-                schedules[flight.flight_id] = failed_schedule
-
-        # 3. 冲突检测与消解（多轮迭代）
+        # 3. 冲突检测与消解（多轮迭代；time_window策略已逐窗口消解，此处只做复核）
         print("\n" + "=" * 70)
         print("检测并消解冲突...")
         print("=" * 70)
@@ -392,18 +772,25 @@ class MultiAircraftScheduler:
         iteration = 0
 
         while iteration < max_iterations:
-            conflicts = self.conflict_detector.detect_all_conflicts(schedules)
+            detect_start = perf_counter()
+            conflicts = self._detect_conflicts(schedules)
+            CONFLICT_DETECTION_SECONDS.labels(self.strategy, iteration + 1).observe(
+                perf_counter() - detect_start)
+
+            # 清空上一轮分配的冲突（路径规划失败的标记保留）
+            for flight_id in list(schedules.keys()):
+                schedules[flight_id].conflicts = [
+                    c for c in schedules[flight_id].conflicts if c.conflict_type == 'path_not_found'
+                ]
 
             if not conflicts:
                 print(f"✓ 第{iteration + 1}轮：未发现冲突")
+                self._report('conflict_round', round=iteration + 1, conflicts=0, adjusted=0)
                 break
 
             print(f"\n第{iteration + 1}轮：发现 {len(conflicts)} 个冲突")
 
             # 将冲突分配给相关航班
-            for flight_id in list(schedules.keys()):
-                schedules[flight_id].conflicts = []  # 清空之前的冲突
-
             for conflict in conflicts:
                 for flight_id in conflict.flight_ids:
                     if flight_id in schedules:
@@ -411,11 +798,19 @@ class MultiAircraftScheduler:
 
             # 如果是第一轮，尝试消解冲突
             if iteration < max_iterations - 1:
-                resolved = self._resolve_conflicts_iteration(schedules, conflicts)
-                print(f"  已处理 {resolved} 个冲突")
+                if self.conflict_resolution == 'minimal_delay':
+                    resolved = self._resolve_conflicts_minimal_delay(
+                        schedules, [flight.flight_id for flight in sorted_flights]
+                    )
+                    print(f"  最小延误消解：调整 {resolved} 个航班")
+                else:
+                    resolved = self._resolve_conflicts_iteration(schedules, conflicts)
+                    print(f"  已处理 {resolved} 个冲突")
+                self._report('conflict_round', round=iteration + 1, conflicts=len(conflicts), adjusted=resolved)
                 iteration += 1
             else:
                 print(f"  达到最大迭代次数，停止消解")
+                self._report('conflict_round', round=iteration + 1, conflicts=len(conflicts), adjusted=0)
                 break
 
         if iteration == 0 and not conflicts:
@@ -425,85 +820,414 @@ class MultiAircraftScheduler:
 
         # 5. 输出统计信息
         self._print_statistics(schedules)
+        self._report('scheduled', flight_count=len(schedules),
+                     remaining_conflicts=len(conflicts))
+
+        return schedules
+
+    def _merge_routes(self, flights: List[Flight],
+                      routes: Dict[str, Tuple[Optional[List[Node]], Dict, Dict[str, float]]]
+                      ) -> Dict[str, AircraftSchedule]:
+        """
+        按给定顺序为航班生成初始时间安排（尚未消解冲突）
+
+        返回:
+            调度方案字典 {flight_id: AircraftSchedule}，按航班顺序排列
+        """
+        schedules = {}
+
+        for flight in flights:
+            print(f"\n正在规划航班: {flight.flight_id}")
+
+            # 计算初始延误（如果有的话）
+            delay = timedelta(0)
+
+            # 尝试规划路径（考虑冲突）
+            schedule = self._plan_single_flight(
+                flight,
+                existing_schedules=schedules,
+                route=routes.get(flight.flight_id)
+            )
+
+            if schedule:
+                schedules[flight.flight_id] = schedule
+
+                print(f"  ✓ 路径规划成功")
+                print(f"    - 路径长度: {schedule.total_distance:.2f} 米")
+                print(f"    - 预计时间: {schedule.total_time:.2f} 秒")
+                print(f"    - 延误: {delay.total_seconds():.2f} 秒")
+            else:
+                # 路径规划失败：创建一个失败的调度记录，包含错误信息
+                print(f"  ✗ 路径规划失败 - 起点: {flight.start_node.id}, 终点: {flight.end_node.id}")
+
+                # 创建一个标记为失败的调度，这样前端也能看到这个航班
+                schedules[flight.flight_id] = self._failed_schedule(flight)
+
+            with self._progress_lock:
+                self._flights_planned += 1
+                self._report('flight_planned', index=self._flights_planned, total=self._flights_total,
+                             flight_id=flight.flight_id, success=schedule is not None,
+                             total_distance=schedules[flight.flight_id].total_distance,
+                             total_time=schedules[flight.flight_id].total_time)
 
         return schedules
 
+    def _schedule_time_windows(self, sorted_flights: List[Flight]) -> Dict[str, AircraftSchedule]:
+        """
+        时间窗分解调度
+
+        1. 按计划时刻所属的时钟对齐窗口（time_window_minutes）切分航班，每个窗口单独
+           规划路径并生成时间安排；各窗口的规划互不依赖，并行执行
+        2. 窗口的占用时段为 [最早开始, 最晚结束 + 安全间隔]，通常延伸进后续窗口，
+           相邻窗口因此相互重叠。占用时段相接的连续窗口归为一组，组内逐窗口消解冲突：
+           每个窗口使用自己的最小延误消解器，并预先登记前面窗口延伸进本窗口的边界占用；
+           占用时段互不相接的组互不影响，并行消解
+        3. 组间协调：消解产生的延误可能使前一组的占用延伸进下一组，此时把边界占用
+           带入下一组重新消解（保留已规划的路径，只重算延误）
+
+        更早结束的航班不可能与本窗口冲突，因此结果与按同一顺序整批消解相同；
+        每个窗口只与相邻窗口的边界航班比较，总代价随全天航班数线性增长。
+        conflict_resolution为'fixed_delay'时只分解规划，冲突由后续的整批迭代消解。
+
+        返回:
+            调度方案字典 {flight_id: AircraftSchedule}，按调度策略顺序排列
+        """
+        windows: Dict[int, List[Flight]] = {}
+        for flight in sorted_flights:
+            windows.setdefault(self._window_index(flight.scheduled_time), []).append(flight)
+        window_flights = [windows[index] for index in sorted(windows)]
+        print(f"时间窗分解: {len(window_flights)} 个窗口（每窗 {self.time_window_minutes} 分钟）")
+
+        batch_routes: Dict[RouteKey, Tuple[Optional[List[Node]], Dict]] = {}
+        window_schedules = self._map_windows(
+            lambda flights: self._merge_routes(flights, self._plan_routes(flights, batch_routes)),
+            window_flights
+        )
+        self._report('routes_planned', route_cache=self.route_cache_summary())
+
+        if self.conflict_resolution == 'minimal_delay':
+            # 按未延误的占用时段分组：与前面任一窗口的占用相接的窗口并入当前组
+            groups: List[List[List[AircraftSchedule]]] = []
+            reach = None
+            for schedules in window_schedules:
+                valid = [schedule for schedule in schedules.values() if len(schedule.waypoints) > 0]
+                span = self._occupancy_span(valid)
+                if groups and (span is None or (reach is not None and span[0] < reach)):
+                    groups[-1].append(valid)
+                else:
+                    groups.append([valid])
+                if span is not None:
+                    reach = span[1] if reach is None else max(reach, span[1])
+
+            results = self._map_windows(self._resolve_window_group, groups)
+
+            # 组间协调：把前一组延伸进来的边界占用带入本组重新消解
+            boundary: List[AircraftSchedule] = []
+            delayed_count = 0
+            reconciled = 0
+            for group, (group_boundary, delayed) in zip(groups, results):
+                span = self._occupancy_span([schedule for window in group for schedule in window])
+                carried = [] if span is None else self._boundary_occupancy(boundary, span[0])
+                if carried:
+                    for window in group:
+                        for schedule in window:
+                            if schedule.delay:
+                                self._apply_delay(schedule, -schedule.delay)
+                    group_boundary, delayed = self._resolve_window_group(group, carried)
+                    reconciled += 1
+                boundary = group_boundary
+                delayed_count += delayed
+            print(f"时间窗消解: {len(groups)} 个占用互不相接的窗口组，{reconciled} 组因边界占用重新消解，"
+                  f"调整 {delayed_count} 个航班")
+
+        schedules = {}
+        for window in window_schedules:
+            schedules.update(window)
+        return schedules
+
+    def _map_windows(self, func: Callable[[Any], Any], items: List[Any]) -> List[Any]:
+        """对各时间窗（或窗口组）执行func，结果按输入顺序返回；planning_workers > 1 时多线程执行"""
+        workers = min(self.planning_workers, len(items))
+        if workers <= 1:
+            return [func(item) for item in items]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='time-window') as executor:
+            return list(executor.map(func, items))
+
+    def _occupancy_span(self, schedules: List[AircraftSchedule]) -> Optional[Tuple[float, float]]:
+        """一组航班的占用时段 (最早开始, 最晚结束 + 安全间隔)，epoch秒；没有有效航班时返回None"""
+        valid = [schedule for schedule in schedules if len(schedule.waypoints) > 0]
+        if not valid:
+            return None
+        return (min(schedule.waypoints.epoch_at(0) for schedule in valid),
+                max(schedule.waypoints.epoch_at(-1) for schedule in valid) + self.conflict_detector.safety_margin)
+
+    def _boundary_occupancy(self, schedules: List[AircraftSchedule], start: float) -> List[AircraftSchedule]:
+        """
+        延伸到时刻start（epoch秒）之后的边界占用
+
+        结束时刻加安全间隔不晚于start的航班，对start之后开始（或延误后开始）的航班
+        不产生任何禁止区间，可以从消解器中省去。
+        """
+        margin = self.conflict_detector.safety_margin
+        return [schedule for schedule in schedules if schedule.waypoints.epoch_at(-1) + margin > start]
+
+    def _resolve_window_group(self, group: List[List[AircraftSchedule]],
+                              carried: Optional[List[AircraftSchedule]] = None
+                              ) -> Tuple[List[AircraftSchedule], int]:
+        """
+        按窗口顺序依次消解一组相邻时间窗的冲突
+
+        参数:
+            group: 各窗口内路径规划成功的航班，按调度策略顺序排列
+            carried: 前一组延伸进本组的边界占用（已固定，不再移动），可选
+
+        返回:
+            (延伸到组末之后的边界占用, 被延误的航班数量)
+        """
+        margin = self.conflict_detector.safety_margin
+        boundary = list(carried or [])
+        delayed_count = 0
+
+        for window in group:
+            if not window:
+                continue
+            start = min(schedule.waypoints.epoch_at(0) for schedule in window)
+            boundary = self._boundary_occupancy(boundary, start)
+            resolver = MinimalDelayResolver(margin, self.conflict_detector.crossing_table)
+            for schedule in boundary:
+                resolver.place(schedule)
+            for schedule in window:
+                shift = resolver.minimal_shift(schedule)
+                if shift > 0:
+                    self._apply_delay(schedule, timedelta(seconds=shift))
+                    delayed_count += 1
+                resolver.place(schedule)
+            boundary.extend(window)
+
+        return boundary, delayed_count
+
     def _sort_flights(self, flights: List[Flight]) -> List[Flight]:
         """根据调度策略对航班排序"""
+        return sorted(flights, key=self._sort_key)
+
+    def _sort_key(self, flight: Flight) -> tuple:
+        """调度策略对应的排序键（未知策略返回常量，保持输入顺序）"""
         if self.strategy == 'fcfs':
             # 先来先服务：按计划时间排序
-            return sorted(flights, key=lambda f: f.scheduled_time)
+            return (flight.scheduled_time,)
 
         elif self.strategy == 'priority':
             # 基于优先级：先按优先级，再按时间
-            return sorted(flights,
-                        key=lambda f: (-f.priority.value, f.scheduled_time))
+            return (-flight.priority.value, flight.scheduled_time)
 
         elif self.strategy == 'time_window':
-            # 离港优先
-            return sorted(flights,
-                        key=lambda f: (0 if f.operation == OperationType.DEPARTURE else 1,
-                                     f.scheduled_time))
+            # 按时间窗分组，窗口内离港优先
+            return (self._window_index(flight.scheduled_time),
+                    0 if flight.operation == OperationType.DEPARTURE else 1,
+                    flight.scheduled_time)
+
+        return ()
+
+    def _route_request(self, flight: Flight) -> Tuple[Dict[str, float], float]:
+        """
+        确定航班路径搜索的输入：动态权重和天气因子
+
+        返回:
+            (权重字典, 天气因子)
+        """
+        # 根据航班计划时间获取动态权重
+        period_type = self._period_for_flight(flight)
+        weights = self.density_analyzer.get_weights_for_period(period_type)
+
+        # 获取天气因子（如果启用天气功能）：查询本次运行的天气快照，不发起网络请求
+        weather_factor = 1.0
+        if self.use_weather and self.weather_service:
+            if self.weather_snapshot is None:
+                self.refresh_weather_snapshot()
+            weather_factor = self.weather_snapshot.factor_at(flight.scheduled_time)
+
+        return weights, weather_factor
+
+    def refresh_weather_snapshot(self) -> Optional[WeatherSnapshot]:
+        """获取一次天气快照（每次调度运行开始时调用，规划循环内不再访问天气服务）"""
+        if not (self.use_weather and self.weather_service):
+            self.weather_snapshot = None
+            return None
+        self.weather_snapshot = self.weather_service.snapshot(adcode=self.weather_adcode)
+        self.current_weather_factor = self.weather_snapshot.current.weather_factor
+        return self.weather_snapshot
+
+    def _plan_routes(self, flights: List[Flight],
+                     batch_routes: Optional[Dict[RouteKey, Tuple[Optional[List[Node]], Dict]]] = None
+                     ) -> Dict[str, Tuple[Optional[List[Node]], Dict, Dict[str, float]]]:
+        """
+        为一批航班规划路径（不涉及时间安排）
+
+        起终点、权重、天气因子都相同的航班共用一次A*搜索结果：先查批内缓存，
+        再查可选的进程级缓存，只对剩余的不同输入执行搜索。
 
-        return flights
+        参数:
+            flights: 航班列表
+            batch_routes: 批内缓存（可选）。time_window策略的各窗口共用同一个，
+                          已由其他窗口搜索过的输入不再重复搜索
+
+        返回:
+            {航班ID: (路径或None, 统计信息, 权重)}
+        """
+        requests = {flight.flight_id: self._route_request(flight) for flight in flights}
+        aircraft_speed = self.optimizer.aircraft_speed
+
+        resolved = batch_routes if batch_routes is not None else {}
+        to_search: Dict[RouteKey, Flight] = {}
+        keys = {}
+        batch_hits = shared_hits = 0
+        for flight in flights:
+            weights, weather_factor = requests[flight.flight_id]
+            key = make_route_key(flight.start_node.id, flight.end_node.id,
+                                 weights, weather_factor, aircraft_speed)
+            keys[flight.flight_id] = key
+            if key in resolved or key in to_search:
+                batch_hits += 1
+                continue
+            if self.shared_route_cache is not None:
+                cached = self.shared_route_cache.get(key)
+                if cached is not None:
+                    resolved[key] = cached
+                    shared_hits += 1
+                    continue
+            to_search[key] = flight
+
+        with self._progress_lock:
+            self._routes_to_search += len(to_search)
+        searched = self._search_routes(list(to_search.values()), requests)
+        for key, flight in to_search.items():
+            resolved[key] = searched[flight.flight_id]
+            if self.shared_route_cache is not None:
+                self.shared_route_cache.put(key, resolved[key])
+        with self._progress_lock:
+            self.route_cache_stats['lookups'] += len(flights)
+            self.route_cache_stats['batch_hits'] += batch_hits
+            self.route_cache_stats['shared_hits'] += shared_hits
+            self.route_cache_stats['searches'] += len(to_search)
+        ROUTE_LOOKUPS.labels('batch_hit').inc(batch_hits)
+        ROUTE_LOOKUPS.labels('shared_hit').inc(shared_hits)
+        ROUTE_LOOKUPS.labels('search').inc(len(to_search))
+
+        # 每个航班持有独立的路径列表与统计字典
+        routes = {}
+        for flight in flights:
+            path, stats = resolved[keys[flight.flight_id]]
+            routes[flight.flight_id] = (list(path) if path else None, dict(stats),
+                                        requests[flight.flight_id][0])
+        return routes
+
+    def _search_routes(self, flights: List[Flight],
+                       requests: Dict[str, Tuple[Dict[str, float], float]]
+                       ) -> Dict[str, Tuple[Optional[List[Node]], Dict]]:
+        """
+        对一组航班执行A*搜索
+
+        planning_workers > 1 时将A*搜索分发到长期复用的进程池，子进程通过共享内存零拷贝
+        映射路网数组；结果按航班ID返回，由调用方按调度策略顺序合并。
+
+        返回:
+            {航班ID: (路径或None, 统计信息)}
+        """
+        workers = min(self.planning_workers, len(flights))
+        if workers > 1:
+            routes = self._search_routes_parallel(flights, requests, workers)
+            if routes is not None:
+                return routes
+
+        routes = {}
+        for flight in flights:
+            weights, weather_factor = requests[flight.flight_id]
+            path, stats = self.optimizer.find_path(
+                flight.start_node, flight.end_node,
+                weights=weights,
+                weather_factor=weather_factor
+            )
+            routes[flight.flight_id] = (path, stats)
+            self._route_searched(flight.flight_id)
+        return routes
+
+    def _search_routes_parallel(self, flights: List[Flight],
+                                requests: Dict[str, Tuple[Dict[str, float], float]],
+                                workers: int) -> Optional[Dict[str, Tuple[Optional[List[Node]], Dict]]]:
+        """
+        在长期复用的规划进程池中执行A*搜索
+
+        返回:
+            {航班ID: (路径或None, 统计信息)}；进程池损坏时返回None，由调用方改为串行搜索
+        """
+        print(f"\n并行规划 {len(flights)} 个航班路径（{workers} 个进程）...")
+        tasks = [
+            (flight.flight_id, flight.start_node.id, flight.end_node.id,
+             *requests[flight.flight_id], self.optimizer.aircraft_speed)
+            for flight in flights
+        ]
+        chunksize = max(1, len(tasks) // (workers * 4))
+
+        executor = get_planning_pool(self.graph, self.planning_workers)
+        routes = {}
+        try:
+            for flight_id, path_ids, stats in executor.map(_plan_route_task, tasks, chunksize=chunksize):
+                path = [self.graph.get_node(node_id) for node_id in path_ids] if path_ids else None
+                routes[flight_id] = (path, stats)
+                self._route_searched(flight_id)
+        except BrokenProcessPool as e:
+            print(f"[调度] 规划进程池异常退出，改为串行规划: {e}")
+            with self._progress_lock:
+                self._routes_searched -= len(routes)  # 串行重新搜索时重新计数
+            _discard_planning_pool(self.graph, executor)
+            return None
+        return routes
+
+    def _route_searched(self, flight_id: str) -> None:
+        """发布route_searched事件（已搜索数与待搜索数为本批次累计，分窗口规划时也单调递增）"""
+        with self._progress_lock:
+            self._routes_searched += 1
+            self._report('route_searched', done=self._routes_searched, total=self._routes_to_search,
+                         flight_id=flight_id)
 
     def _plan_single_flight(self, flight: Flight,
                            existing_schedules: Dict[str, AircraftSchedule],
-                           occupied_slots: List[SpatioTemporalSlot]) -> Optional[AircraftSchedule]:
+                           route: Optional[Tuple[Optional[List[Node]], Dict, Dict[str, float]]] = None
+                           ) -> Optional[AircraftSchedule]:
         """
         为单个航班规划路径（考虑已调度航班的占用）
 
         参数:
             flight: 航班
             existing_schedules: 已存在的调度
-            occupied_slots: 时空占用槽
+            route: 预先规划好的路径 (路径, 统计信息, 权重)，为None时现场执行A*搜索
 
         返回:
             调度方案
         """
-        # 根据航班计划时间获取动态权重
-        period_type = self.density_analyzer.get_period_for_time(
-            self.all_flights, flight.scheduled_time
-        )
-        weights = self.density_analyzer.get_weights_for_period(period_type)
-
-        # 获取天气因子（如果启用天气功能）
-        weather_factor = 1.0
-        if self.use_weather and self.weather_service:
-            weather = self.weather_service.get_current_weather()
-            weather_factor = weather.weather_factor
-            self.current_weather_factor = weather_factor
-
-        # 使用A*算法找路径，传入动态权重和天气因子
-        path, stats = self.optimizer.find_path(
-            flight.start_node, flight.end_node, 
-            weights=weights,
-            weather_factor=weather_factor
-        )
+        if route is None:
+            weights, weather_factor = self._route_request(flight)
+            # 使用A*算法找路径，传入动态权重和天气因子
+            path, stats = self.optimizer.find_path(
+                flight.start_node, flight.end_node,
+                weights=weights,
+                weather_factor=weather_factor
+            )
+        else:
+            path, stats, weights = route
 
         if not path:
             return None
 
-        # 计算时间节点
-        waypoints = []
-        current_time = flight.scheduled_time
-
-        for i, node in enumerate(path):
-            waypoints.append((node, current_time))
-
-            if i < len(path) - 1:
-                next_node = path[i + 1]
-                distance = math.sqrt((node.x - next_node.x)**2 +
-                                   (node.y - next_node.y)**2)
-                travel_time = distance / flight.speed
-                current_time += timedelta(seconds=travel_time)
+        # 计算时间节点（按匀速滑行，数组形式存储）
+        waypoints = CompactWaypoints.from_path(path, flight.scheduled_time, flight.speed)
 
         # 创建调度方案
         schedule = AircraftSchedule(
             flight=flight,
             path=path,
             start_time=flight.scheduled_time,
-            end_time=current_time,
+            end_time=waypoints.end_time(),
             waypoints=waypoints,
             total_distance=stats.get('total_distance', 0),
             total_time=stats.get('total_time', 0),
@@ -512,6 +1236,102 @@ class MultiAircraftScheduler:
 
         return schedule
 
+    @staticmethod
+    def _empty_route_cache_stats() -> Dict[str, int]:
+        """路径缓存统计：查询数、批内命中、进程级命中、实际搜索次数"""
+        return {'lookups': 0, 'batch_hits': 0, 'shared_hits': 0, 'searches': 0}
+
+    def route_cache_summary(self) -> Dict[str, float]:
+        """路径缓存统计（含命中率）"""
+        summary = dict(self.route_cache_stats)
+        lookups = summary['lookups']
+        hits = summary['batch_hits'] + summary['shared_hits']
+        summary['hit_rate'] = hits / lookups if lookups else 0.0
+        return summary
+
+    def _window_index(self, time: datetime) -> int:
+        """时刻所属的调度时间窗编号（按时钟对齐，不依赖批次起点）"""
+        return int(to_epoch_seconds(time) // (self.time_window_minutes * 60))
+
+    def _detect_conflicts(self, schedules: Dict[str, AircraftSchedule]) -> List[Conflict]:
+        """按调度策略选择整批或时间窗分解的冲突检测"""
+        if self.strategy == 'time_window':
+            return self.conflict_detector.detect_windowed_conflicts(
+                schedules, self.time_window_minutes * 60
+            )
+        return self.conflict_detector.detect_all_conflicts(schedules)
+
+    def _failed_schedule(self, flight: Flight) -> AircraftSchedule:
+        """构造路径规划失败的调度记录（带path_not_found冲突标记）"""
+        failed_schedule = AircraftSchedule(
+            flight=flight,
+            path=[flight.start_node, flight.end_node],  # 只包含起点和终点
+            start_time=flight.scheduled_time,
+            end_time=flight.scheduled_time,
+            waypoints=CompactWaypoints.empty(),
+            total_distance=0,
+            total_time=0,
+            delay=timedelta(0)
+        )
+        # 添加一个特殊的冲突标记
+        failed_schedule.conflicts.append(Conflict(
+            conflict_id=f"path_fail_{flight.flight_id}",
+            conflict_type='path_not_found',
+            flight_ids=[flight.flight_id],
+            node_id=flight.start_node.id,
+            time=flight.scheduled_time,
+            severity='critical'
+        ))
+        return failed_schedule
+
+    def _period_for_flight(self, flight: Flight) -> str:
+        """
+        获取航班计划时间所属的时间段类型
+
+        实时跟踪器存在且航班计划时间处于其当前窗口内（最新观测时刻前后各一个窗口长度）时
+        使用实时结果，否则查询本批次预计算的密度时间轴。
+        """
+        tracker = self.density_tracker
+        if tracker is not None and tracker.current_period != 'unknown':
+            latest = tracker.latest_time
+            window = timedelta(minutes=tracker.window_minutes)
+            if latest is not None and latest - window < flight.scheduled_time <= latest + window:
+                return tracker.current_period
+        return self.density_timeline.period_at(flight.scheduled_time)
+
+    def _resolve_conflicts_minimal_delay(self, schedules: Dict[str, AircraftSchedule],
+                                         ordered_flight_ids: List[str]) -> int:
+        """
+        最小延误冲突消解：按调度策略顺序依次固定航班
+
+        排在前面的航班具有通行优先权；每个航班只延误恰好清除与已固定航班
+        全部冲突（节点与路段）所需的最小时间，因此一遍处理后不再存在冲突。
+
+        参数:
+            schedules: 调度方案
+            ordered_flight_ids: 按调度策略排序的航班ID
+
+        返回:
+            被延误的航班数量
+        """
+        resolver = MinimalDelayResolver(self.conflict_detector.safety_margin,
+                                        self.conflict_detector.crossing_table)
+        delayed_count = 0
+
+        for flight_id in ordered_flight_ids:
+            schedule = schedules.get(flight_id)
+            # 跳过已失败的调度
+            if schedule is None or len(schedule.waypoints) == 0:
+                continue
+
+            shift = resolver.minimal_shift(schedule)
+            if shift > 0:
+                self._apply_delay(schedule, timedelta(seconds=shift))
+                delayed_count += 1
+            resolver.place(schedule)
+
+        return delayed_count
+
     def _resolve_conflicts_iteration(self,
                                      schedules: Dict[str, AircraftSchedule],
                                      conflicts: List[Conflict]) -> int:
@@ -580,11 +1400,8 @@ class MultiAircraftScheduler:
         schedule.end_time += delay
         schedule.delay += delay
 
-        # 更新所有waypoints的时间
-        new_waypoints = []
-        for node, time in schedule.waypoints:
-            new_waypoints.append((node, time + delay))
-        schedule.waypoints = new_waypoints
+        # 平移所有waypoints的时间（只修改偏移量）
+        schedule.waypoints.shift(delay.total_seconds())
 
     def _print_statistics(self, schedules: Dict[str, AircraftSchedule]):
         """打印统计信息"""
@@ -603,6 +1420,11 @@ class MultiAircraftScheduler:
         print(f"总延误时间: {total_delay:.2f} 秒 ({total_delay/60:.2f} 分钟)")
         print(f"剩余冲突数: {total_conflicts}")
 
+        cache = self.route_cache_summary()
+        print(f"路径缓存命中率: {cache['hit_rate'] * 100:.1f}% "
+              f"(查询 {cache['lookups']} 次，批内命中 {cache['batch_hits']}，"
+              f"进程级命中 {cache['shared_hits']}，A*搜索 {cache['searches']} 次)")
+
         print("\n各航班详细信息:")
         for flight_id, schedule in schedules.items():
             print(f"\n{flight_id}:")
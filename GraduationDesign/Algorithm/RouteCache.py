@@ -0,0 +1,185 @@
+"""
+航班路径缓存
+=====================================
+
+同一批次内大量航班的起终点（机位-跑道点）相同，而路径搜索的其余输入只有
+DensityAnalyzer给出的三种时段权重模板和一个天气因子，因此A*结果高度可复用。
+
+缓存键为 (起点ID, 终点ID, 权重, 天气因子, 基准速度)：
+- 调度器每批次使用一个无上限的批内缓存（字典）
+- 可选的进程级缓存（LRU）挂在路网图对象上，跨批次、跨调度器共享
+
+SingleFlight 合并并发的相同查询：多个请求同时查询同一路径时只执行一次A*，
+其余请求等待该次计算并共享结果（不缓存，计算结束即移除）。
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from .Astar import AirportGraph, Node
+
+RouteKey = Tuple[int, int, Tuple[Tuple[str, float], ...], float, float]
+RouteValue = Tuple[Optional[List[Node]], Dict]
+
+
+def make_route_key(start_id: int, goal_id: int, weights: Dict[str, float],
+                   weather_factor: float, aircraft_speed: float) -> RouteKey:
+    """构造路径缓存键（权重按名称排序，与字典顺序无关）"""
+    return (start_id, goal_id, tuple(sorted(weights.items())),
+            float(weather_factor), float(aircraft_speed))
+
+
+class RouteCache:
+    """线程安全的LRU路径缓存"""
+
+    def __init__(self, max_entries: int = 10000):
+        """
+        参数:
+            max_entries: 最大缓存条目数，超出后淘汰最久未使用的条目
+        """
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[RouteKey, RouteValue]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: RouteKey) -> Optional[RouteValue]:
+        """查询缓存，未命中返回None"""
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: RouteKey, value: RouteValue) -> None:
+        """写入缓存"""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, float]:
+        """命中统计"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def get_shared_route_cache(graph: AirportGraph, max_entries: int = 10000) -> RouteCache:
+    """获取图的进程级路径缓存（每个图一个）"""
+    cache = getattr(graph, '_route_cache', None)
+    if cache is None:
+        cache = RouteCache(max_entries=max_entries)
+        graph._route_cache = cache
+    return cache
+
+
+class _InFlightCall:
+    """进行中的一次计算"""
+
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    合并并发的相同计算
+
+    同一键同时只有一个调用者（leader）执行计算，期间到达的调用者等待并得到同一结果
+    （或同一异常）。结果对象在调用者之间共享，调用者应只读使用。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _InFlightCall] = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, func: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行或等待键对应的计算
+
+        参数:
+            key: 计算的键（输入相同的计算键相同）
+            func: 计算函数
+
+        返回:
+            (结果, 是否共享了其他调用者的计算)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.shared += 1
+                leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = func()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    def stats(self) -> Dict[str, int]:
+        """执行次数、共享次数与当前进行中的计算数"""
+        with self._lock:
+            return {
+                'executed': self.executed,
+                'shared': self.shared,
+                'in_flight': len(self._calls)
+            }
+
+
+_single_flight_lock = threading.Lock()
+
+
+def get_route_single_flight(graph: AirportGraph) -> SingleFlight:
+    """获取图的路径查询合并器（每个图一个）"""
+    flights = getattr(graph, '_route_single_flight', None)
+    if flights is None:
+        with _single_flight_lock:
+            flights = getattr(graph, '_route_single_flight', None)
+            if flights is None:
+                flights = SingleFlight()
+                graph._route_single_flight = flights
+    return flights
+
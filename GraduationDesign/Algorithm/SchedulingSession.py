@@ -0,0 +1,389 @@
+"""
+在线滚动时域调度会话
+=====================================
+
+MultiAircraftScheduler.schedule_multiple_flights 每次都从零开始规划整批航班。
+实时运行时航班信息是持续到达的事件流（新增、变更、取消），本模块在两次事件之间
+保留调度状态，只对受影响的航班做增量处理：
+
+- 路径：每个航班的A*路径连同其搜索输入（起终点、时段权重、天气因子）一起缓存，
+  只有搜索输入变化时（如计划时间移入高峰时段）才重新规划
+- 占用：已固定航班的节点/路段占用保存在 MinimalDelayResolver 的占用索引中
+- 时间安排：事件发生后，只有调度顺序位于变更航班之后、尚未开始滑行
+  且处于滚动时域内的航班会重新计算最小延误
+- 滚动时域：计划时间超出 now + horizon 的航班暂存为待定，时钟推进后再纳入；
+  已完成滑行的航班移出占用索引
+- 会话时钟只由创建参数 now 或 advance() 设定，只能向前推进；未设定时钟前
+  没有航班被视为已开始滑行，也不限制时域，结果与对同一批航班整批调度一致
+- 实时密度：时钟推进时，已开始滑行的航班作为起降事件送入会话自有的
+  StreamingDensityTracker；调度器对实时窗口内的航班使用跟踪器给出的时间段类型，
+  时间段切换时窗口内尚未滑行的航班按新的权重模板重新规划路径
+
+每个事件返回 ScheduleDelta，仅包含本次发生变化的航班。
+"""
+
+import itertools
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from .Astar import AirportGraph, Node
+from .DensityAnalyzer import StreamingDensityTracker
+from .MultiAircraftScheduler import (
+    AircraftSchedule,
+    Flight,
+    MinimalDelayResolver,
+    MultiAircraftScheduler
+)
+from .RouteCache import RouteKey, make_route_key
+
+Route = Tuple[Optional[List[Node]], Dict, Dict[str, float]]
+
+
+@dataclass
+class ScheduleDelta:
+    """一次事件处理后的调度增量"""
+    version: int
+    updated: Dict[str, AircraftSchedule] = field(default_factory=dict)  # 新增或时间发生变化的航班
+    removed: List[str] = field(default_factory=list)                    # 被取消的航班
+    completed: List[str] = field(default_factory=list)                  # 滑行结束、移出时域的航班
+    pending: List[str] = field(default_factory=list)                    # 超出时域、暂未调度的航班
+    replanned_routes: int = 0      # 本次执行A*搜索的航班数
+    rescheduled: int = 0           # 本次重新计算延误的航班数
+    elapsed: float = 0.0           # 处理耗时（秒）
+    density_period: str = 'unknown'  # 实时密度跟踪器当前的时间段类型
+
+    def merge(self, other: 'ScheduleDelta') -> None:
+        """合并另一个增量（同一批事件内按时间先后合并）"""
+        self.version = other.version
+        for flight_id in other.removed:
+            self.updated.pop(flight_id, None)
+        self.updated.update(other.updated)
+        self.removed.extend(other.removed)
+        self.completed.extend(other.completed)
+        self.pending.extend(flight_id for flight_id in other.pending if flight_id not in self.pending)
+        self.replanned_routes += other.replanned_routes
+        self.rescheduled += other.rescheduled
+        self.elapsed += other.elapsed
+        self.density_period = other.density_period
+
+
+class SchedulingSession:
+    """
+    有状态的在线调度会话
+
+    线程安全：所有事件在会话锁内串行处理。
+    """
+
+    def __init__(self, graph: AirportGraph, strategy: str = 'fcfs',
+                 horizon_minutes: int = 120, retention_minutes: int = 10,
+                 now: Optional[datetime] = None, use_weather: bool = False):
+        """
+        参数:
+            graph: 机场路网图
+            strategy: 调度策略 ('fcfs', 'priority', 'time_window')
+            horizon_minutes: 滚动时域长度（分钟），只调度计划时间在 now + horizon 之内的航班
+            retention_minutes: 航班滑行结束后在占用索引中保留的时间（分钟）
+            now: 会话时钟初始时刻；为None时在 advance() 之前不冻结任何航班，也不限制时域
+            use_weather: 是否考虑天气因素
+        """
+        # 实时密度跟踪器：由会话时钟推进时观测到的起降事件驱动
+        self.density_tracker = StreamingDensityTracker(window_minutes=30)
+        self.scheduler = MultiAircraftScheduler(graph, strategy=strategy, use_weather=use_weather,
+                                                shared_route_cache=True,
+                                                density_tracker=self.density_tracker)
+        self.horizon = timedelta(minutes=horizon_minutes)
+        self.retention = timedelta(minutes=retention_minutes)
+        self.now = now
+        self.version = 0
+        self.last_active = time.time()  # 最近一次事件或查询的时刻（用于清理空闲会话）
+
+        self.flights: Dict[str, Flight] = {}
+        self.schedules: Dict[str, AircraftSchedule] = {}   # 时域内已调度的航班
+        self.pending: Dict[str, Flight] = {}               # 超出时域的航班
+        self._routes: Dict[str, Route] = {}
+        self._route_keys: Dict[str, RouteKey] = {}         # 缓存路径对应的搜索输入
+        self._sequence: Dict[str, int] = {}                # 到达顺序，作为排序键的最后一级
+        self._observed: Set[str] = set()                   # 已送入密度跟踪器的航班
+        self._counter = itertools.count()
+        self._resolver = MinimalDelayResolver(
+            self.scheduler.conflict_detector.safety_margin,
+            self.scheduler.conflict_detector.crossing_table
+        )
+        self._lock = threading.Lock()
+
+    # ==================== 事件接口 ====================
+
+    def add_flights(self, flights: List[Flight]) -> ScheduleDelta:
+        """
+        批量新增航班，整批只重排一次
+
+        已存在的航班按变更处理：保留到达顺序，路径搜索输入不变时复用已缓存的路径（见_replan）。
+        """
+        with self._lock:
+            start = time.perf_counter()
+            delta = ScheduleDelta(version=self.version)
+            changed: Dict[str, Flight] = {}
+            anchors = []
+            for flight in flights:
+                previous = self.flights.get(flight.flight_id)
+                if previous is not None:
+                    old_schedule = self._unschedule(flight.flight_id)
+                    if old_schedule is not None:
+                        anchors.append(old_schedule.flight)
+                else:
+                    self._sequence[flight.flight_id] = next(self._counter)
+                self.flights[flight.flight_id] = flight
+                changed[flight.flight_id] = flight
+            self._replan(list(changed.values()), delta, anchors=anchors)
+            return self._finish(delta, start)
+
+    def add_flight(self, flight: Flight) -> ScheduleDelta:
+        """新增航班"""
+        return self.add_flights([flight])
+
+    def update_flight(self, flight: Flight) -> ScheduleDelta:
+        """
+        变更航班（计划时间、起终点、优先级等）
+
+        路径搜索输入（起终点、计划时间所在时段的权重、天气因子）不变时复用已缓存的路径，
+        只重新安排时间。
+        """
+        with self._lock:
+            start = time.perf_counter()
+            delta = ScheduleDelta(version=self.version)
+            previous = self.flights.get(flight.flight_id)
+            if previous is None:
+                raise KeyError(f"航班不存在: {flight.flight_id}")
+
+            old_schedule = self._unschedule(flight.flight_id)
+            self.flights[flight.flight_id] = flight
+
+            # 变更前后两个位置之后的航班都可能受影响，从较早的位置开始重排
+            anchors = [flight] if old_schedule is None else [flight, old_schedule.flight]
+            self._replan([flight], delta, anchors=anchors)
+            return self._finish(delta, start)
+
+    def cancel_flight(self, flight_id: str) -> ScheduleDelta:
+        """取消航班，释放其占用，并让排在其后的航班重新计算延误"""
+        with self._lock:
+            start = time.perf_counter()
+            delta = ScheduleDelta(version=self.version)
+            flight = self.flights.pop(flight_id, None)
+            if flight is None:
+                raise KeyError(f"航班不存在: {flight_id}")
+
+            self._unschedule(flight_id)
+            self.pending.pop(flight_id, None)
+            self._forget_route(flight_id)
+            self._sequence.pop(flight_id, None)
+            self._observed.discard(flight_id)
+            delta.removed.append(flight_id)
+
+            self._replan([], delta, anchors=[flight])
+            return self._finish(delta, start)
+
+    def advance(self, now: datetime) -> ScheduleDelta:
+        """
+        推进会话时钟
+
+        - 进入时域的待定航班被调度
+        - 已开始滑行的航班作为起降事件送入密度跟踪器；时间段类型切换时，
+          实时窗口内尚未滑行的航班重新规划
+        - 滑行结束超过保留时间的航班移出占用索引
+
+        异常:
+            ValueError: 时钟回退
+        """
+        with self._lock:
+            if self.now is not None and now < self.now:
+                raise ValueError(f"会话时钟不能回退: {now} 早于当前时刻 {self.now}")
+            start = time.perf_counter()
+            delta = ScheduleDelta(version=self.version)
+            self.now = now
+            switched = self._observe_movements(now)
+
+            for flight_id, schedule in list(self.schedules.items()):
+                if len(schedule.waypoints) and schedule.end_time + self.retention < now:
+                    self._resolver.index.remove(schedule)
+                    del self.schedules[flight_id]
+                    self.flights.pop(flight_id, None)
+                    self._forget_route(flight_id)
+                    self._sequence.pop(flight_id, None)
+                    self._observed.discard(flight_id)
+                    delta.completed.append(flight_id)
+
+            self._replan([], delta, anchors=self._live_window_flights() if switched else None)
+            return self._finish(delta, start)
+
+    def snapshot(self) -> Dict[str, AircraftSchedule]:
+        """当前时域内全部航班的调度方案"""
+        with self._lock:
+            self.last_active = time.time()
+            return dict(self.schedules)
+
+    # ==================== 内部实现 ====================
+
+    def _replan(self, changed: List[Flight], delta: ScheduleDelta,
+                anchors: Optional[List[Flight]] = None) -> None:
+        """
+        重新安排受影响的航班
+
+        参数:
+            changed: 新增或变更的航班（需要纳入调度）
+            delta: 增量结果
+            anchors: 决定重排起点的航班（默认为changed）；调度顺序位于最早锚点之后、
+                     尚未开始滑行的航班都会重新计算延误
+        """
+        # 时域之外的航班暂存，时域之内的待定航班纳入调度（未设定时钟时不限制时域）
+        horizon_end = self.now + self.horizon if self.now else None
+        entering = []
+        for flight in list(changed) + list(self.pending.values()):
+            if horizon_end is not None and flight.scheduled_time > horizon_end:
+                self.pending[flight.flight_id] = flight
+            else:
+                self.pending.pop(flight.flight_id, None)
+                entering.append(flight)
+        for flight_id in self.pending:
+            if flight_id not in delta.pending:
+                delta.pending.append(flight_id)
+
+        anchors = list(anchors or []) + entering
+        if not anchors:
+            return
+
+        # 确定重排范围：排序位置不早于最早锚点、且尚未开始滑行的航班
+        first_key = min(self._order_key(flight) for flight in anchors)
+        entering_ids = {flight.flight_id for flight in entering}
+        affected = [
+            flight for flight_id, flight in self.flights.items()
+            if (flight_id in entering_ids or
+                (flight_id in self.schedules and self._order_key(flight) >= first_key
+                 and not self._is_frozen(self.schedules[flight_id])))
+        ]
+        affected.sort(key=self._order_key)
+
+        # 权重取决于计划时间所在时段（随会话内航班密度变化），天气因子取决于计划时刻：
+        # 只为没有缓存路径、或路径缓存键（起终点、权重、天气因子、速度）已变化的航班执行A*搜索
+        self._refresh_density()
+        if affected:
+            self.scheduler.refresh_weather_snapshot()
+        keys = {flight.flight_id: self._route_key(flight) for flight in affected}
+        missing = [flight for flight in affected
+                   if self._route_keys.get(flight.flight_id) != keys[flight.flight_id]]
+        if missing:
+            self._routes.update(self.scheduler._plan_routes(missing))
+            self._route_keys.update((flight.flight_id, keys[flight.flight_id]) for flight in missing)
+            delta.replanned_routes += len(missing)
+
+        previous = {}
+        for flight in affected:
+            old = self.schedules.get(flight.flight_id)
+            if old is not None:
+                previous[flight.flight_id] = old
+                self._resolver.index.remove(old)
+
+        for flight in affected:
+            schedule = self.scheduler._plan_single_flight(
+                flight, existing_schedules=self.schedules,
+                route=self._routes[flight.flight_id]
+            )
+            if schedule is None:
+                schedule = self.scheduler._failed_schedule(flight)
+            else:
+                shift = self._resolver.minimal_shift(schedule)
+                if shift > 0:
+                    self.scheduler._apply_delay(schedule, timedelta(seconds=shift))
+                self._resolver.place(schedule)
+            self.schedules[flight.flight_id] = schedule
+            delta.rescheduled += 1
+
+            old = previous.get(flight.flight_id)
+            if old is None or self._schedule_changed(old, schedule):
+                delta.updated[flight.flight_id] = schedule
+
+    def _unschedule(self, flight_id: str) -> Optional[AircraftSchedule]:
+        """将航班移出时域内调度与占用索引"""
+        self.pending.pop(flight_id, None)
+        schedule = self.schedules.pop(flight_id, None)
+        if schedule is not None:
+            self._resolver.index.remove(schedule)
+        return schedule
+
+    def _order_key(self, flight: Flight) -> tuple:
+        """调度顺序：策略排序键 + 到达顺序"""
+        return self.scheduler._sort_key(flight) + (self._sequence.get(flight.flight_id, 0),)
+
+    def _observe_movements(self, now: datetime) -> bool:
+        """
+        把到now为止已开始滑行的航班送入密度跟踪器，并推进跟踪器时钟
+
+        返回:
+            时间段类型是否发生切换
+        """
+        tracker = self.density_tracker
+        period = tracker.current_period
+        started = []
+        for flight_id, flight in self.flights.items():
+            if flight_id in self._observed:
+                continue
+            schedule = self.schedules.get(flight_id)
+            movement_time = schedule.start_time if schedule is not None else flight.scheduled_time
+            if movement_time <= now:
+                started.append((movement_time, flight_id))
+        for movement_time, flight_id in sorted(started):
+            tracker.add_movement(movement_time)
+            self._observed.add(flight_id)
+        tracker.advance(now)
+        return tracker.current_period != period
+
+    def _live_window_flights(self) -> List[Flight]:
+        """计划时间位于跟踪器实时窗口内、尚未开始滑行的航班（时间段切换时重排的锚点）"""
+        latest = self.density_tracker.latest_time
+        if latest is None:
+            return []
+        window = timedelta(minutes=self.density_tracker.window_minutes)
+        return [
+            flight for flight_id, flight in self.flights.items()
+            if latest - window < flight.scheduled_time <= latest + window
+            and not (flight_id in self.schedules and self._is_frozen(self.schedules[flight_id]))
+        ]
+
+    def _is_frozen(self, schedule: AircraftSchedule) -> bool:
+        """已开始滑行的航班不再调整（未设定会话时钟时没有航班被冻结）"""
+        return self.now is not None and schedule.start_time <= self.now
+
+    def _refresh_density(self) -> None:
+        """按会话内全部航班更新密度时间轴（只影响之后规划的路径权重）"""
+        flights = list(self.flights.values())
+        self.scheduler.all_flights = flights
+        self.scheduler.density_timeline = self.scheduler.density_analyzer.build_timeline(flights)
+
+    def _route_key(self, flight: Flight) -> RouteKey:
+        """航班当前的路径缓存键（与调度器的路径缓存使用同一组搜索输入）"""
+        weights, weather_factor = self.scheduler._route_request(flight)
+        return make_route_key(flight.start_node.id, flight.end_node.id, weights,
+                              weather_factor, self.scheduler.optimizer.aircraft_speed)
+
+    def _forget_route(self, flight_id: str) -> None:
+        self._routes.pop(flight_id, None)
+        self._route_keys.pop(flight_id, None)
+
+    @staticmethod
+    def _schedule_changed(old: AircraftSchedule, new: AircraftSchedule) -> bool:
+        """调度结果是否发生对外可见的变化"""
+        return (old.start_time != new.start_time or
+                old.end_time != new.end_time or
+                [node.id for node in old.path] != [node.id for node in new.path] or
+                old.flight is not new.flight)
+
+    def _finish(self, delta: ScheduleDelta, start: float) -> ScheduleDelta:
+        """更新版本号并记录耗时"""
+        self.version += 1
+        self.last_active = time.time()
+        delta.version = self.version
+        delta.elapsed = time.perf_counter() - start
+        delta.density_period = self.density_tracker.current_period
+        return delta
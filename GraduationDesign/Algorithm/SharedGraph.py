@@ -0,0 +1,337 @@
+"""
+路网图数值数组的共享发布
+=====================================
+
+AirportGraph由大量Python对象和shapely几何构成，每个需要路网的子进程
+各自构建一份会使内存随进程数线性增长。
+
+本模块把A*搜索所需的数值部分抽取为连续数组：
+- 节点：ID、坐标、类型编码
+- 邻接关系：CSR格式（indptr/indices）
+- 边属性：长度、限速、类型编码
+
+并提供两种零拷贝共享方式：
+1. multiprocessing.shared_memory：父进程发布一次，子进程按句柄映射
+2. 内存映射文件（.npy）：写入目录后，任意进程以mmap方式只读加载
+
+子进程在这些数组上直接执行与AStarOptimizer.find_path相同的A*搜索（代价由Astar.weighted_cost
+计算，优先队列使用同一个PathNode）。
+
+适用范围：目前只有调度的规划进程池（MultiAircraftScheduler.get_planning_pool）映射共享内存图；
+API工作进程的路径查询仍使用完整的AirportGraph（需要几何、备选路径惩罚等数组中没有的信息），
+由gunicorn预加载后fork继承、写时复制共享。save/load供服务之外的独立进程（如离线批处理）使用，
+服务本身不调用。
+"""
+
+import atexit
+import heapq
+import json
+import math
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional, ClassVar
+
+import numpy as np
+
+from .Astar import AirportGraph, AStarOptimizer, Node, PathNode, RoutingConfig, weighted_cost
+
+
+@dataclass
+class GraphArrays:
+    """路网图的数值数组表示（CSR邻接）"""
+    node_ids: np.ndarray          # int64，按ID升序
+    xs: np.ndarray                # float64
+    ys: np.ndarray                # float64
+    node_type_codes: np.ndarray   # int16，索引node_type_names
+    indptr: np.ndarray            # int64，长度N+1
+    indices: np.ndarray           # int32，边的终点（节点下标）
+    edge_length: np.ndarray       # float64
+    edge_speed_limit: np.ndarray  # float64
+    edge_type_codes: np.ndarray   # int16，索引edge_type_names
+    node_type_names: Tuple[str, ...] = ()
+    edge_type_names: Tuple[str, ...] = ()
+    # 持有共享内存对象，保证数组视图有效期内映射不被释放
+    _owner: Optional[object] = field(default=None, repr=False, compare=False)
+
+    ARRAY_FIELDS: ClassVar[Tuple[str, ...]] = (
+        'node_ids', 'xs', 'ys', 'node_type_codes',
+        'indptr', 'indices', 'edge_length', 'edge_speed_limit', 'edge_type_codes'
+    )
+
+    @classmethod
+    def from_graph(cls, graph: AirportGraph) -> 'GraphArrays':
+        """从AirportGraph抽取数值数组（邻接顺序与graph.edges一致）"""
+        node_ids = np.array(sorted(graph.nodes), dtype=np.int64)
+        index_of = {int(node_id): i for i, node_id in enumerate(node_ids)}
+
+        node_type_names = sorted({node.node_type for node in graph.nodes.values()})
+        node_type_index = {name: code for code, name in enumerate(node_type_names)}
+        edge_type_names = sorted({edge.edge_type for edges in graph.edges.values() for edge in edges})
+        edge_type_index = {name: code for code, name in enumerate(edge_type_names)}
+
+        nodes = [graph.nodes[int(node_id)] for node_id in node_ids]
+        xs = np.array([node.x for node in nodes], dtype=np.float64)
+        ys = np.array([node.y for node in nodes], dtype=np.float64)
+        node_type_codes = np.array([node_type_index[node.node_type] for node in nodes], dtype=np.int16)
+
+        degree = np.array([len(graph.edges.get(int(node_id), [])) for node_id in node_ids], dtype=np.int64)
+        indptr = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        np.cumsum(degree, out=indptr[1:])
+
+        edges = [edge for node_id in node_ids for edge in graph.edges.get(int(node_id), [])]
+        indices = np.array([index_of[edge.to_node.id] for edge in edges], dtype=np.int32)
+        edge_length = np.array([edge.length for edge in edges], dtype=np.float64)
+        edge_speed_limit = np.array([edge.speed_limit for edge in edges], dtype=np.float64)
+        edge_type_codes = np.array([edge_type_index[edge.edge_type] for edge in edges], dtype=np.int16)
+
+        return cls(
+            node_ids=node_ids, xs=xs, ys=ys, node_type_codes=node_type_codes,
+            indptr=indptr, indices=indices,
+            edge_length=edge_length, edge_speed_limit=edge_speed_limit,
+            edge_type_codes=edge_type_codes,
+            node_type_names=tuple(node_type_names),
+            edge_type_names=tuple(edge_type_names)
+        )
+
+    @property
+    def node_count(self) -> int:
+        return len(self.node_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.indices)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.ARRAY_FIELDS)
+
+    def index_of(self, node_id: int) -> int:
+        """节点ID -> 数组下标（不存在时返回-1）"""
+        i = int(np.searchsorted(self.node_ids, node_id))
+        if i < self.node_count and self.node_ids[i] == node_id:
+            return i
+        return -1
+
+    def make_node(self, index: int) -> Node:
+        """按下标构造轻量Node对象（不含几何和属性）"""
+        return Node(
+            id=int(self.node_ids[index]),
+            node_type=self.node_type_names[self.node_type_codes[index]],
+            x=float(self.xs[index]),
+            y=float(self.ys[index])
+        )
+
+    def find_path(self, start_id: int, goal_id: int,
+                  weights: Dict[str, float] = None,
+                  weather_factor: float = 1.0,
+                  aircraft_speed: float = 15.0) -> Tuple[Optional[List[int]], Dict]:
+        """
+        在数组上执行A*搜索，与AStarOptimizer.find_path的代价模型和搜索顺序一致
+
+        参数:
+            start_id: 起点节点ID
+            goal_id: 终点节点ID
+            weights: 权重字典 {'distance', 'time', 'fuel'}，缺省使用AStarOptimizer默认权重
+            weather_factor: 天气速度折扣系数
+            aircraft_speed: 航空器滑行速度（米/秒）
+
+        返回:
+            (路径节点ID列表或None, 统计信息字典)
+        """
+        # 与AStarOptimizer相同地解析权重（缺少的键使用默认权重），代价由weighted_cost计算
+        config = RoutingConfig(aircraft_speed=aircraft_speed,
+                               weather_factor=weather_factor).with_overrides(weights=weights)
+        cost_weights = config.cost_weights
+        effective_speed = config.effective_speed
+
+        start = self.index_of(start_id)
+        goal = self.index_of(goal_id)
+        if start < 0 or goal < 0:
+            return None, {'iterations': 0, 'error': '未找到指定的节点'}
+
+        # memoryview逐元素访问直接得到Python标量，且不复制底层（共享）内存
+        xs, ys = memoryview(self.xs), memoryview(self.ys)
+        goal_x, goal_y = xs[goal], ys[goal]
+        indptr, indices = memoryview(self.indptr), memoryview(self.indices)
+        edge_length, edge_speed_limit = memoryview(self.edge_length), memoryview(self.edge_speed_limit)
+
+        def heuristic(i: int) -> float:
+            distance = math.sqrt((xs[i] - goal_x) ** 2 + (ys[i] - goal_y) ** 2)
+            return weighted_cost(distance, distance / effective_speed, *cost_weights)
+
+        g_scores: Dict[int, float] = {start: 0.0}
+        closed_set = set()
+        open_set = [PathNode(heuristic(start), 0.0, start)]
+
+        iterations = 0
+        max_iterations = self.node_count * 2
+
+        while open_set and iterations < max_iterations:
+            iterations += 1
+            current = heapq.heappop(open_set)
+            current_index = current.node
+
+            if current_index == goal:
+                # 与AStarOptimizer一致：沿入队条目的父指针回溯
+                path_indices = []
+                entry = current
+                while entry is not None:
+                    path_indices.append(entry.node)
+                    entry = entry.parent
+                path_indices.reverse()
+                path_nodes = [self.make_node(i) for i in path_indices]
+                cost_model = AStarOptimizer(None, aircraft_speed=aircraft_speed, weather_factor=weather_factor)
+                stats = cost_model._calculate_path_stats(path_nodes, config.weights, weather_factor)
+                return [node.id for node in path_nodes], stats
+
+            closed_set.add(current_index)
+
+            for e in range(indptr[current_index], indptr[current_index + 1]):
+                neighbor = indices[e]
+                if neighbor in closed_set:
+                    continue
+
+                length = edge_length[e]
+                actual_speed = min(edge_speed_limit[e], effective_speed)
+                tentative_g_score = current.g_score + weighted_cost(length, length / actual_speed, *cost_weights)
+
+                if neighbor not in g_scores or tentative_g_score < g_scores[neighbor]:
+                    g_scores[neighbor] = tentative_g_score
+                    heapq.heappush(open_set, PathNode(
+                        tentative_g_score + heuristic(neighbor), tentative_g_score, neighbor, current
+                    ))
+
+        return None, {'iterations': iterations, 'error': '未找到路径'}
+
+    # ---------- 内存映射文件 ----------
+
+    def save(self, directory: str) -> None:
+        """将数组写入目录（每个数组一个.npy文件 + meta.json）"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAY_FIELDS:
+            np.save(directory / f'{name}.npy', getattr(self, name))
+        with open(directory / 'meta.json', 'w', encoding='utf-8') as f:
+            json.dump({
+                'node_type_names': list(self.node_type_names),
+                'edge_type_names': list(self.edge_type_names)
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'GraphArrays':
+        """从目录加载数组；mmap=True时以只读内存映射方式打开，多个进程共享同一份页缓存"""
+        directory = Path(directory)
+        with open(directory / 'meta.json', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(directory / f'{name}.npy', mmap_mode='r' if mmap else None)
+            for name in cls.ARRAY_FIELDS
+        }
+        return cls(
+            node_type_names=tuple(meta['node_type_names']),
+            edge_type_names=tuple(meta['edge_type_names']),
+            **arrays
+        )
+
+
+# ==================== 共享内存发布 ====================
+
+@dataclass(frozen=True)
+class SharedGraphHandle:
+    """共享内存图的句柄（可pickle，传给子进程用于映射）"""
+    shm_name: str
+    layout: Tuple[Tuple[str, str, Tuple[int, ...], int], ...]  # (字段, dtype, shape, 偏移)
+    node_type_names: Tuple[str, ...]
+    edge_type_names: Tuple[str, ...]
+
+
+class SharedGraph:
+    """
+    发布到共享内存的路网数组（由父进程持有）
+
+    所有数组按8字节对齐放在同一个共享内存段中，子进程通过
+    attach_shared_graph(handle)得到指向同一物理内存的只读视图。
+    """
+
+    _ALIGNMENT = 8
+
+    def __init__(self, arrays: GraphArrays):
+        layout = []
+        offset = 0
+        for name in GraphArrays.ARRAY_FIELDS:
+            array = getattr(arrays, name)
+            layout.append((name, array.dtype.str, array.shape, offset))
+            offset += -(-array.nbytes // self._ALIGNMENT) * self._ALIGNMENT
+
+        self._shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for name, dtype, shape, start in layout:
+            view = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf, offset=start)
+            view[...] = getattr(arrays, name)
+
+        self.handle = SharedGraphHandle(
+            shm_name=self._shm.name,
+            layout=tuple(layout),
+            node_type_names=arrays.node_type_names,
+            edge_type_names=arrays.edge_type_names
+        )
+        self.nbytes = offset
+        self._closed = False
+
+    def close(self) -> None:
+        """释放共享内存段（父进程退出前调用）"""
+        if self._closed:
+            return
+        self._closed = True
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def attach_shared_graph(handle: SharedGraphHandle) -> GraphArrays:
+    """在子进程中映射共享内存图（零拷贝，只读）"""
+    try:
+        shm = shared_memory.SharedMemory(name=handle.shm_name, track=False)
+    except TypeError:
+        # Python < 3.13 没有track参数；进程池子进程与父进程共用同一个resource_tracker，
+        # 重复登记不会导致共享段被提前删除
+        shm = shared_memory.SharedMemory(name=handle.shm_name)
+
+    arrays = {}
+    for name, dtype, shape, offset in handle.layout:
+        view = np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+        view.flags.writeable = False
+        arrays[name] = view
+
+    return GraphArrays(
+        node_type_names=handle.node_type_names,
+        edge_type_names=handle.edge_type_names,
+        _owner=shm,
+        **arrays
+    )
+
+
+def get_graph_arrays(graph: AirportGraph) -> GraphArrays:
+    """获取图的数值数组（每个图只抽取一次）"""
+    arrays = getattr(graph, '_graph_arrays', None)
+    if arrays is None:
+        arrays = GraphArrays.from_graph(graph)
+        graph._graph_arrays = arrays
+    return arrays
+
+
+def publish_graph(graph: AirportGraph) -> SharedGraph:
+    """
+    将图的数值数组发布到共享内存（每个图只发布一次，进程退出时自动释放）
+
+    返回:
+        SharedGraph对象，其handle可传给任意数量的子进程
+    """
+    shared = getattr(graph, '_shared_graph', None)
+    if shared is None or shared._closed:
+        shared = SharedGraph(get_graph_arrays(graph))
+        graph._shared_graph = shared
+        atexit.register(shared.close)
+    return shared
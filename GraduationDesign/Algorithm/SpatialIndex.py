@@ -0,0 +1,185 @@
+"""
+路网空间索引与视口查询
+=====================================
+
+前端地图缩放到局部（例如某个机坪）时，只需要视口内的节点与路段。
+本模块在路网加载后为节点和路段几何各建立一棵STRtree，按视口范围查询，
+并按缩放级别控制细节：
+
+- 缩放级别 zoom=0 时整个机场约占 VIEWPORT_PIXELS 像素宽，每级放大一倍，
+  由此得到当前级别一个像素对应的米数
+- 路段几何按一个像素的容差简化（Douglas-Peucker），低级别下折线点数大幅减少
+- 节点按 NODE_SPACING_PIXELS 像素的网格抽稀，每格只保留一个节点；
+  机位、跑道点等关键节点（KEY_NODE_TYPES）始终保留
+- 达到 MAX_ZOOM 后不再简化和抽稀
+
+坐标与 /api/nodes 相同，为投影坐标（米）。
+"""
+
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+from shapely.geometry import LineString, box
+from shapely.strtree import STRtree
+
+from .Astar import AirportGraph, Edge, Node
+
+# zoom=0 时机场范围对应的像素宽度
+VIEWPORT_PIXELS = 1024
+# 节点抽稀网格（像素）
+NODE_SPACING_PIXELS = 6
+# 不参与抽稀的节点类型前缀
+KEY_NODE_TYPES = ('StandPoint', 'RunwayPoint')
+# 最大缩放级别（达到后返回完整几何与全部节点）
+MAX_ZOOM = 12
+
+
+class GraphSpatialIndex:
+    """路网节点与路段的STRtree索引"""
+
+    def __init__(self, graph: AirportGraph):
+        """
+        参数:
+            graph: 机场路网图
+        """
+        self.nodes: List[Node] = list(graph.nodes.values())
+        self.node_xy = np.array([(node.x, node.y) for node in self.nodes], dtype=np.float64).reshape(-1, 2)
+        self.node_tree = STRtree(shapely.points(self.node_xy))
+
+        # 双向边合并为一条路段
+        self.edges: List[Edge] = []
+        geometries = []
+        seen = set()
+        for edges in graph.edges.values():
+            for edge in edges:
+                key = tuple(sorted((edge.from_node.id, edge.to_node.id)))
+                if key in seen:
+                    continue
+                seen.add(key)
+                geometry = edge.geometry
+                if geometry is None or geometry.is_empty:
+                    geometry = LineString([(edge.from_node.x, edge.from_node.y),
+                                           (edge.to_node.x, edge.to_node.y)])
+                self.edges.append(edge)
+                geometries.append(geometry)
+        self.edge_geometries = geometries
+        self.edge_tree = STRtree(geometries)
+
+        if len(self.nodes):
+            min_x, min_y = self.node_xy.min(axis=0)
+            max_x, max_y = self.node_xy.max(axis=0)
+            self.bounds = (float(min_x), float(min_y), float(max_x), float(max_y))
+        else:
+            self.bounds = (0.0, 0.0, 0.0, 0.0)
+        extent = max(self.bounds[2] - self.bounds[0], self.bounds[3] - self.bounds[1], 1.0)
+        self.base_pixel_size = extent / VIEWPORT_PIXELS
+
+        # {zoom: {路段下标: 简化后的坐标}}
+        self._simplified: Dict[int, Dict[int, List[List[float]]]] = {}
+        self._lock = threading.Lock()
+
+    def pixel_size(self, zoom: int) -> float:
+        """缩放级别下一个像素对应的米数"""
+        return self.base_pixel_size / (2 ** zoom)
+
+    def query(self, bbox: Tuple[float, float, float, float], zoom: int = MAX_ZOOM,
+              node_types: Optional[Sequence[str]] = None,
+              edge_types: Optional[Sequence[str]] = None) -> Dict:
+        """
+        查询视口内的节点与路段
+
+        参数:
+            bbox: (min_x, min_y, max_x, max_y)，投影坐标（米）
+            zoom: 缩放级别（0 ~ MAX_ZOOM）
+            node_types: 节点类型前缀过滤（None为不过滤）
+            edge_types: 路段类型过滤（None为不过滤）
+
+        返回:
+            {'nodes': [...], 'edges': [...], 'zoom', 'tolerance', 'total_nodes'}
+            total_nodes 为抽稀前视口内（过滤后）的节点数
+        """
+        zoom = min(max(int(zoom), 0), MAX_ZOOM)
+        detailed = zoom >= MAX_ZOOM
+        tolerance = 0.0 if detailed else self.pixel_size(zoom)
+        viewport = box(*bbox)
+
+        # 节点：STRtree候选（包围盒相交），点几何的候选即结果
+        node_indices = np.sort(self.node_tree.query(viewport))
+        if node_types:
+            prefixes = tuple(node_types)
+            node_indices = np.array([i for i in node_indices.tolist()
+                                     if self.nodes[i].node_type.startswith(prefixes)], dtype=np.int64)
+        total_nodes = len(node_indices)
+        if not detailed and total_nodes:
+            node_indices = self._thin_nodes(node_indices, tolerance * NODE_SPACING_PIXELS)
+
+        # 路段：候选再做精确相交判断
+        edge_indices = np.sort(self.edge_tree.query(viewport, predicate='intersects'))
+        if edge_types:
+            wanted = set(edge_types)
+            edge_indices = np.array([i for i in edge_indices.tolist()
+                                     if self.edges[i].edge_type in wanted], dtype=np.int64)
+
+        nodes_data = []
+        for i in node_indices.tolist():
+            node = self.nodes[i]
+            nodes_data.append({
+                'id': node.id,
+                'type': node.node_type,
+                'x': node.x,
+                'y': node.y
+            })
+
+        edges_data = []
+        for i in edge_indices.tolist():
+            edge = self.edges[i]
+            edges_data.append({
+                'from_node_id': edge.from_node.id,
+                'to_node_id': edge.to_node.id,
+                'type': edge.edge_type,
+                'length': edge.length,
+                'coords': self._coords(i, zoom, tolerance)
+            })
+
+        return {
+            'zoom': zoom,
+            'tolerance': tolerance,
+            'total_nodes': total_nodes,
+            'nodes': nodes_data,
+            'edges': edges_data
+        }
+
+    def _thin_nodes(self, indices: np.ndarray, cell_size: float) -> np.ndarray:
+        """网格抽稀：每个网格单元保留第一个普通节点，关键节点全部保留"""
+        is_key = np.fromiter((self.nodes[i].node_type.startswith(KEY_NODE_TYPES) for i in indices.tolist()),
+                             dtype=bool, count=len(indices))
+        regular = indices[~is_key]
+        if len(regular) == 0 or cell_size <= 0:
+            return indices
+        cells = np.floor(self.node_xy[regular] / cell_size).astype(np.int64)
+        _, first = np.unique(cells, axis=0, return_index=True)
+        return np.sort(np.concatenate([indices[is_key], regular[first]]))
+
+    def _coords(self, index: int, zoom: int, tolerance: float) -> List[List[float]]:
+        """路段在缩放级别下的简化坐标（按级别缓存）"""
+        with self._lock:
+            cache = self._simplified.setdefault(zoom, {})
+            coords = cache.get(index)
+            if coords is None:
+                geometry = self.edge_geometries[index]
+                if tolerance > 0:
+                    geometry = geometry.simplify(tolerance, preserve_topology=False)
+                coords = shapely.get_coordinates(geometry).tolist()
+                cache[index] = coords
+            return coords
+
+
+def get_spatial_index(graph: AirportGraph) -> GraphSpatialIndex:
+    """获取图的空间索引（每个图只构建一次）"""
+    index = getattr(graph, '_spatial_index', None)
+    if index is None:
+        index = GraphSpatialIndex(graph)
+        graph._spatial_index = index
+    return index
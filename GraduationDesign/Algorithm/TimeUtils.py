@@ -0,0 +1,22 @@
+"""
+时间工具
+提供datetime与epoch秒之间的换算，供密度分析与调度模块共享
+
+说明：项目中的时间均为不带时区的本地时间（strptime解析得到），
+因此以朴素的1970-01-01为零点直接做差，避免系统时区/夏令时带来的偏移。
+"""
+
+from datetime import datetime, timedelta
+
+# 朴素datetime的参考零点
+EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch_seconds(dt: datetime) -> float:
+    """datetime -> epoch秒（浮点数）"""
+    return (dt - EPOCH).total_seconds()
+
+
+def from_epoch_seconds(seconds: float) -> datetime:
+    """epoch秒 -> datetime"""
+    return EPOCH + timedelta(seconds=float(seconds))
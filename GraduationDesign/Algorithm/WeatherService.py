@@ -7,6 +7,9 @@
 2. 将天气现象映射为滑行速度折扣系数
 3. 提供天气缓存机制，避免频繁调用API
 4. 支持天气对A*算法路径规划的影响量化
+5. 同时缓存多个城市的实况与逐小时预报时间轴，可查询任意未来时刻的折扣系数
+   （城市编码须为6位数字；首次成功获取天气后才登记并参与后台刷新，长期无人查询的城市被移除）
+6. 数据源可替换：高德API（AmapWeatherProvider）或录制响应回放（ReplayWeatherProvider，离线测试用）
 
 参考文献：
 1. 寇伟彬等(2024) - 韧性导向的机场航空器滑行路径及停机位分配联合优化
@@ -24,12 +27,27 @@
 日期：2026
 """
 
+import bisect
+import copy
+import json
+import random
+import re
 import requests
+import threading
 import time
 import os
-from typing import Dict, Optional, Tuple
-from dataclasses import dataclass, field
-from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from typing import Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass, field, replace
+from datetime import date, datetime, timedelta
+
+# 行政区划编码（高德adcode）：6位数字
+ADCODE_PATTERN = re.compile(r'\d{6}')
+
+
+def is_valid_adcode(adcode) -> bool:
+    """是否为格式正确的城市编码"""
+    return isinstance(adcode, str) and ADCODE_PATTERN.fullmatch(adcode) is not None
 
 
 @dataclass
@@ -66,18 +84,262 @@ class WeatherInfo:
         }
 
 
+@dataclass
+class ForecastBucket:
+    """预报时段：[start, end) 内的天气现象及折扣系数"""
+    start: datetime
+    end: datetime
+    weather: str
+    weather_factor: float
+
+
+@dataclass
+class WeatherSnapshot:
+    """
+    一次调度运行使用的天气快照
+
+    在调度开始前获取一次，之后按航班计划时间查询折扣系数，不再发起网络请求：
+    - 快照时刻起 live_horizon 之内（以及过去的时刻）使用实况天气
+    - 更晚的时刻落在某个预报时段内时使用预报天气
+    - 其余情况回退到实况天气
+    """
+    taken_at: datetime
+    current: WeatherInfo
+    buckets: List[ForecastBucket] = field(default_factory=list)
+    live_horizon: timedelta = timedelta(hours=2)
+
+    def __post_init__(self):
+        self.buckets = sorted(self.buckets, key=lambda bucket: bucket.start)
+        self._starts = [bucket.start for bucket in self.buckets]
+
+    def bucket_at(self, when: datetime) -> Optional[ForecastBucket]:
+        """查询时刻所在的预报时段（无预报或不在实况时域外时返回None）"""
+        if when <= self.taken_at + self.live_horizon:
+            return None
+        index = bisect.bisect_right(self._starts, when) - 1
+        if index >= 0 and when < self.buckets[index].end:
+            return self.buckets[index]
+        return None
+
+    def factor_at(self, when: datetime) -> float:
+        """查询时刻的速度折扣系数"""
+        bucket = self.bucket_at(when)
+        return bucket.weather_factor if bucket else self.current.weather_factor
+
+    def weather_at(self, when: datetime) -> str:
+        """查询时刻的天气现象"""
+        bucket = self.bucket_at(when)
+        return bucket.weather if bucket else self.current.weather
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    - closed:    正常放行请求，连续失败达到阈值后转为open
+    - open:      直接拒绝请求（调用方回退到缓存/默认数据），经过reset_timeout后转为half_open
+    - half_open: 放行一个探测请求，成功则恢复closed，失败则重新open
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 60.0):
+        """
+        参数:
+            failure_threshold: 连续失败多少次后熔断
+            reset_timeout: 熔断持续时间（秒），之后允许一次探测请求
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._state = self.CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.total_failures = 0
+        self.total_short_circuits = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.time() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow_request(self) -> bool:
+        """是否放行本次请求"""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.total_short_circuits += 1
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self, error: str) -> None:
+        with self._lock:
+            self.total_failures += 1
+            self._consecutive_failures += 1
+            self.last_error = error
+            if self._state == self.HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._state = self.OPEN
+                self._opened_at = time.time()
+                self._probe_in_flight = False
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            state = self._current_state()
+            retry_in = (max(0.0, self.reset_timeout - (time.time() - self._opened_at))
+                        if state == self.OPEN else 0.0)
+            return {
+                'state': state,
+                'consecutive_failures': self._consecutive_failures,
+                'failure_threshold': self.failure_threshold,
+                'total_failures': self.total_failures,
+                'total_short_circuits': self.total_short_circuits,
+                'retry_in_seconds': round(retry_in, 1),
+                'last_error': self.last_error
+            }
+
+
+@dataclass
+class LocationWeather:
+    """单个城市的天气缓存：实况 + 逐小时预报时间轴"""
+    adcode: str
+    current: Optional[WeatherInfo] = None
+    current_at: float = 0
+    timeline: List[ForecastBucket] = field(default_factory=list)
+    forecast_at: float = 0
+    last_read: float = field(default_factory=time.time)  # 最近一次被查询的时刻
+
+
+class WeatherProvider:
+    """
+    天气数据源接口
+
+    fetch 接收高德天气API的查询参数（city、extensions等），返回高德格式的响应JSON；
+    失败时抛出 requests.exceptions.RequestException（HTTP错误状态为HTTPError）或 ValueError，
+    重试与熔断由 WeatherService 统一处理：只有连接错误、超时与5xx会重试并计入熔断，
+    4xx立即失败且不计入熔断。
+    """
+
+    name = 'base'
+    requires_api_key = False
+
+    def fetch(self, params: Dict) -> Dict:
+        raise NotImplementedError
+
+
+class AmapWeatherProvider(WeatherProvider):
+    """高德天气API数据源（复用keep-alive连接池）"""
+
+    name = 'amap'
+    requires_api_key = True
+    API_URL = "https://restapi.amap.com/v3/weather/weatherInfo"
+
+    def __init__(self, url: str = API_URL,
+                 timeout: Tuple[float, float] = (3.0, 5.0),
+                 pool_maxsize: int = 4):
+        """
+        参数:
+            url: 接口地址
+            timeout: (连接超时, 读取超时)（秒）
+            pool_maxsize: 连接池大小
+        """
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def fetch(self, params: Dict) -> Dict:
+        response = self.session.get(self.url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class ReplayWeatherProvider(WeatherProvider):
+    """
+    录制响应回放数据源（离线测试/演示用）
+
+    录制文件格式：
+        {"responses": {"<城市编码>:<base|all>": <高德API原始响应>, ...}}
+
+    rebase_dates=True 时把预报日期整体平移，使录制的第一天对应今天，
+    从而回放出的预报时间轴始终覆盖未来。
+    """
+
+    name = 'replay'
+
+    def __init__(self, path: str, rebase_dates: bool = True):
+        """
+        参数:
+            path: 录制文件路径
+            rebase_dates: 是否把预报日期平移到今天
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        self.path = path
+        self.responses: Dict[str, Dict] = data.get('responses', {})
+        self.rebase_dates = rebase_dates
+        self.calls = 0
+
+    def fetch(self, params: Dict) -> Dict:
+        self.calls += 1
+        key = f"{params.get('city')}:{params.get('extensions', 'base')}"
+        response = self.responses.get(key)
+        if response is None:
+            raise requests.exceptions.ConnectionError(f"回放文件中没有 {key} 的记录")
+        response = copy.deepcopy(response)
+        if self.rebase_dates:
+            self._rebase_forecast_dates(response)
+        return response
+
+    @staticmethod
+    def _rebase_forecast_dates(response: Dict) -> None:
+        for forecast in response.get('forecasts', []):
+            casts = forecast.get('casts', [])
+            try:
+                shift = date.today() - datetime.strptime(casts[0]['date'], '%Y-%m-%d').date()
+            except (IndexError, KeyError, ValueError):
+                continue
+            for cast in casts:
+                try:
+                    day = datetime.strptime(cast['date'], '%Y-%m-%d') + shift
+                except (KeyError, ValueError):
+                    continue
+                cast['date'] = day.strftime('%Y-%m-%d')
+
+
 class WeatherService:
     """
     天气服务类
     
     负责：
-    - 调用高德天气API获取实时天气
+    - 通过数据源（默认高德天气API）获取实况与预报天气
     - 将天气现象转换为滑行速度折扣系数
-    - 缓存天气数据，控制API调用频率
+    - 按城市编码缓存实况与逐小时预报时间轴，控制API调用频率
+    - 过期数据先返回、后台异步刷新（stale-while-revalidate），调用方不阻塞在网络请求上
     """
     
     # 高德天气API接口地址
-    WEATHER_API_URL = "https://restapi.amap.com/v3/weather/weatherInfo"
+    WEATHER_API_URL = AmapWeatherProvider.API_URL
     
     # 天气现象 -> 速度折扣系数映射表
     # 基于文献调研结果（寇伟彬2024、Park&Kim、香港机场2020）
@@ -152,64 +414,187 @@ class WeatherService:
         '台风': 'extreme',
     }
     
-    def __init__(self, api_key: Optional[str] = None, 
+    # 预报时间轴步长（高德预报为逐日白天/夜间，展开为逐小时）
+    FORECAST_STEP = timedelta(hours=1)
+
+    def __init__(self, api_key: Optional[str] = None,
                  city_adcode: str = "610100",
-                 cache_seconds: int = 600):
+                 cache_seconds: int = 600,
+                 stale_while_revalidate: bool = True,
+                 request_timeout: Tuple[float, float] = (3.0, 5.0),
+                 max_retries: int = 2,
+                 retry_backoff: float = 0.5,
+                 circuit_breaker: Optional[CircuitBreaker] = None,
+                 provider: Optional[WeatherProvider] = None,
+                 max_locations: int = 32,
+                 location_idle_seconds: float = 24 * 3600):
         """
         初始化天气服务
-        
+
         参数:
             api_key: 高德API Key，如果为None则从环境变量读取
-            city_adcode: 城市编码（西安=610100）
+            city_adcode: 默认城市编码（西安=610100），其他城市可通过各方法的adcode参数查询
             cache_seconds: 缓存时间（秒），默认10分钟
+            stale_while_revalidate: 缓存过期时是否先返回旧数据并在后台刷新；
+                                    False时保持同步请求的旧行为
+            request_timeout: (连接超时, 读取超时)（秒）
+            max_retries: 单次获取的最大重试次数（不含首次请求）
+            retry_backoff: 重试退避基数（秒），第n次重试等待 backoff * 2^n 并加随机抖动
+            circuit_breaker: 熔断器，默认连续失败3次后熔断60秒
+            provider: 天气数据源，默认为高德API
+            max_locations: 登记（缓存并后台刷新）的城市数上限，超出时移除最久未被查询的城市
+            location_idle_seconds: 城市超过该时间未被查询即停止刷新并移除（默认城市除外）
         """
         self.api_key = api_key or os.getenv('AMAP_API_KEY', 'YOUR_AMAP_KEY_HERE')
         self.city_adcode = city_adcode
         self.cache_seconds = cache_seconds
-        
-        # 缓存
-        self._cached_weather: Optional[WeatherInfo] = None
-        self._cache_timestamp: float = 0
-        
+        self.stale_while_revalidate = stale_while_revalidate
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.provider = provider or AmapWeatherProvider(self.WEATHER_API_URL, timeout=request_timeout)
+        self._last_success: float = 0
+
+        # 后台刷新状态（正在刷新的城市编码）
+        self._refresh_state_lock = threading.Lock()
+        self._refreshing: Set[str] = set()
+        self._refresher: Optional[threading.Thread] = None
+        self._stop_refresher = threading.Event()
+
+        # 按城市编码缓存
+        self._locations_lock = threading.Lock()
+        self._locations: Dict[str, LocationWeather] = {city_adcode: LocationWeather(city_adcode)}
+        self.max_locations = max_locations
+        self.location_idle_seconds = location_idle_seconds
+        # 未登记城市最近一次获取失败的时刻：缓存时长内不再请求，避免无效编码反复消耗配额
+        self._failed_lookups: Dict[str, float] = {}
+
         # 默认天气（API不可用时的回退）
         self._default_weather = WeatherInfo()
-    
-    def _is_cache_valid(self) -> bool:
-        """检查缓存是否有效"""
-        if self._cached_weather is None:
+
+    # ==================== 多城市缓存 ====================
+
+    def _location(self, adcode: Optional[str] = None, touch: bool = False) -> LocationWeather:
+        """
+        获取城市缓存
+
+        已登记的城市返回共享缓存；未登记的城市返回临时缓存，首次成功获取天气后才登记
+        （见 _register_location），无效编码不会进入后台刷新。
+
+        参数:
+            adcode: 城市编码，默认为 city_adcode
+            touch: 是否记为一次查询（后台刷新不计入，用于清理长期无人查询的城市）
+
+        异常:
+            ValueError: 城市编码格式错误
+        """
+        adcode = adcode or self.city_adcode
+        if not is_valid_adcode(adcode):
+            raise ValueError(f"无效的城市编码: {adcode!r}（应为6位数字）")
+        with self._locations_lock:
+            location = self._locations.get(adcode)
+        if location is None:
+            location = LocationWeather(adcode)
+        if touch:
+            location.last_read = time.time()
+        return location
+
+    def _register_location(self, location: LocationWeather) -> None:
+        """登记成功获取到天气的城市；超出上限时移除最久未被查询的城市（默认城市除外）"""
+        with self._locations_lock:
+            if location.adcode in self._locations:
+                return
+            self._failed_lookups.pop(location.adcode, None)
+            while len(self._locations) >= self.max_locations:
+                candidates = [loc for code, loc in self._locations.items() if code != self.city_adcode]
+                if not candidates:
+                    break
+                oldest = min(candidates, key=lambda loc: loc.last_read)
+                del self._locations[oldest.adcode]
+            self._locations[location.adcode] = location
+
+    def _record_failed_lookup(self, adcode: str) -> None:
+        """记录未登记城市的获取失败"""
+        with self._locations_lock:
+            if adcode in self._locations:
+                return
+            self._failed_lookups[adcode] = time.time()
+            # 只保留最近的记录
+            while len(self._failed_lookups) > self.max_locations * 8:
+                del self._failed_lookups[next(iter(self._failed_lookups))]
+
+    def _recently_failed(self, adcode: str) -> bool:
+        with self._locations_lock:
+            failed_at = self._failed_lookups.get(adcode)
+        return failed_at is not None and time.time() - failed_at < self.cache_seconds
+
+    def _evict_idle_locations(self) -> List[str]:
+        """移除超过 location_idle_seconds 未被查询的城市（默认城市除外）"""
+        deadline = time.time() - self.location_idle_seconds
+        with self._locations_lock:
+            idle = [code for code, location in self._locations.items()
+                    if code != self.city_adcode and location.last_read < deadline]
+            for code in idle:
+                del self._locations[code]
+        if idle:
+            print(f"[WeatherService] 移除长期未查询的城市: {', '.join(idle)}")
+        return idle
+
+    def add_location(self, adcode: str) -> None:
+        """登记需要缓存的城市（不等待首次获取）"""
+        self._register_location(self._location(adcode, touch=True))
+
+    @property
+    def locations(self) -> List[str]:
+        """已登记的城市编码"""
+        with self._locations_lock:
+            return list(self._locations)
+
+    def _default_for(self, adcode: str) -> WeatherInfo:
+        """城市的回退天气"""
+        if adcode == self._default_weather.adcode:
+            return self._default_weather
+        return replace(self._default_weather, city='', adcode=adcode)
+
+    def _is_cache_valid(self, adcode: Optional[str] = None) -> bool:
+        """检查实况缓存是否有效"""
+        location = self._location(adcode)
+        if location.current is None:
             return False
-        elapsed = time.time() - self._cache_timestamp
+        elapsed = time.time() - location.current_at
         return elapsed < self.cache_seconds
-    
+
+    @staticmethod
+    def _visibility_impact(weather_factor: float) -> str:
+        """能见度影响判断"""
+        if weather_factor >= 0.85:
+            return 'none'
+        if weather_factor >= 0.60:
+            return 'moderate'
+        return 'severe'
+
     def _parse_weather_response(self, data: Dict) -> WeatherInfo:
         """
         解析高德天气API响应
-        
+
         参数:
             data: API返回的JSON数据
-            
+
         返回:
             WeatherInfo对象
         """
         lives = data.get('lives', [])
         if not lives:
             return self._default_weather
-        
+
         live = lives[0]
         weather_str = live.get('weather', '晴')
-        
+
         # 获取速度折扣系数
         weather_factor = self.WEATHER_FACTOR_MAP.get(weather_str, 1.0)
         weather_level = self.WEATHER_LEVEL_MAP.get(weather_str, 'normal')
-        
-        # 能见度影响判断
-        if weather_factor >= 0.85:
-            visibility_impact = 'none'
-        elif weather_factor >= 0.60:
-            visibility_impact = 'moderate'
-        else:
-            visibility_impact = 'severe'
-        
+
         return WeatherInfo(
             city=live.get('city', '西安市'),
             adcode=live.get('adcode', '610100'),
@@ -221,74 +606,379 @@ class WeatherService:
             reporttime=live.get('reporttime', ''),
             weather_factor=weather_factor,
             weather_level=weather_level,
-            visibility_impact=visibility_impact
+            visibility_impact=self._visibility_impact(weather_factor)
         )
-    
-    def get_current_weather(self, force_refresh: bool = False) -> WeatherInfo:
+
+    def _has_api_key(self) -> bool:
+        return bool(self.api_key) and self.api_key != 'YOUR_AMAP_KEY_HERE'
+
+    def _can_fetch(self) -> bool:
+        """数据源是否可用（高德API需要Key，回放数据源不需要）"""
+        return not self.provider.requires_api_key or self._has_api_key()
+
+    def get_current_weather(self, force_refresh: bool = False,
+                            adcode: Optional[str] = None) -> WeatherInfo:
         """
         获取当前天气
-        
+
+        缓存有效时直接返回；缓存过期时（stale_while_revalidate模式）返回旧数据或默认数据，
+        并触发一次后台刷新，不阻塞调用方。
+
         参数:
-            force_refresh: 是否强制刷新缓存
-            
+            force_refresh: 是否强制同步刷新缓存
+            adcode: 城市编码，默认为 city_adcode
+
         返回:
             WeatherInfo对象
         """
+        location = self._location(adcode, touch=True)
+        fallback = location.current or self._default_for(location.adcode)
+
         # 检查缓存
-        if not force_refresh and self._is_cache_valid():
-            return self._cached_weather
-        
+        if not force_refresh and self._is_cache_valid(location.adcode):
+            return location.current
+
         # API Key未设置，返回默认天气
-        if not self.api_key or self.api_key == 'YOUR_AMAP_KEY_HERE':
+        if not self._can_fetch():
             print("[WeatherService] 警告: 高德API Key未设置，使用默认天气数据")
-            return self._default_weather
-        
+            return self._default_for(location.adcode)
+
+        if self._recently_failed(location.adcode):
+            return fallback
+
+        if not force_refresh and self.stale_while_revalidate:
+            self._trigger_refresh(location.adcode)
+            return fallback
+
+        return self._fetch_current_weather(location.adcode) or fallback
+
+    def _fetch_current_weather(self, adcode: Optional[str] = None) -> Optional[WeatherInfo]:
+        """
+        同步请求实况天气并更新缓存
+
+        返回:
+            新的WeatherInfo；请求失败时返回None
+        """
+        location = self._location(adcode)
         try:
             # 调用高德天气API
             params = {
                 'key': self.api_key,
-                'city': self.city_adcode,
+                'city': location.adcode,
                 'extensions': 'base'  # 获取实时天气
             }
-            
-            response = requests.get(self.WEATHER_API_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            # 检查API返回状态
-            if data.get('status') != '1':
+
+            data = self._request_json(params)
+            if data is None:
+                return None
+
+            # 检查API返回状态（无实况数据的编码同样视为失败，不登记）
+            if data.get('status') != '1' or not data.get('lives'):
                 error_info = data.get('info', '未知错误')
-                print(f"[WeatherService] 天气API错误: {error_info}")
-                return self._cached_weather or self._default_weather
-            
+                print(f"[WeatherService] 天气API错误（{location.adcode}）: {error_info}")
+                self._record_failed_lookup(location.adcode)
+                return None
+
             # 解析天气数据
             weather = self._parse_weather_response(data)
-            
+
             # 更新缓存
-            self._cached_weather = weather
-            self._cache_timestamp = time.time()
-            
+            location.current = weather
+            location.current_at = time.time()
+            self._register_location(location)
+
             print(f"[WeatherService] 天气更新: {weather.city} {weather.weather} "
                   f"{weather.temperature}°C 风速{weather.windpower}级 "
                   f"折扣系数:{weather.weather_factor}")
-            
+
             return weather
-            
+
         except requests.exceptions.RequestException as e:
             print(f"[WeatherService] 网络请求失败: {e}")
-            # 网络错误时返回缓存或默认数据
-            return self._cached_weather or self._default_weather
+            return None
         except Exception as e:
             print(f"[WeatherService] 获取天气异常: {e}")
-            return self._cached_weather or self._default_weather
-    
+            return None
+
+    def _request_json(self, params: Dict) -> Optional[Dict]:
+        """
+        经熔断器与有限重试请求天气数据源
+
+        返回:
+            响应JSON；熔断中或重试耗尽时返回None（调用方回退到缓存/默认数据）
+        """
+        if not self.circuit_breaker.allow_request():
+            return None
+
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            try:
+                data = self.provider.fetch(params)
+                self.circuit_breaker.record_success()
+                self._last_success = time.time()
+                return data
+            except requests.exceptions.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status is not None and status < 500:
+                    # 4xx（Key无效、参数错误等）是配置问题，重试无用；数据源本身可达，
+                    # 按可达记录（不计入熔断，半开状态的探测也随之结束），立即失败
+                    print(f"[WeatherService] 天气请求被拒绝（HTTP {status}），不重试: {e}")
+                    self.circuit_breaker.record_success()
+                    return None
+                last_error = e
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                last_error = e
+            except (requests.exceptions.RequestException, ValueError) as e:
+                # 其他请求错误与无法解析的响应：重试无益，直接计为一次失败
+                last_error = e
+                break
+            if attempt < self.max_retries:
+                # 只对连接错误、超时与5xx重试：指数退避 + 随机抖动，避免多个进程同时重试
+                time.sleep(self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5))
+
+        print(f"[WeatherService] 网络请求失败（已重试{attempt}次）: {last_error}")
+        self.circuit_breaker.record_failure(str(last_error))
+        return None
+
+    def _location_status(self, location: LocationWeather, now: float) -> Dict:
+        """单个城市的缓存状态"""
+        return {
+            'current_cached': location.current is not None,
+            'current_age_seconds': round(now - location.current_at, 1) if location.current else None,
+            'current_stale': not self._is_cache_valid(location.adcode),
+            'forecast_buckets': len(location.timeline),
+            'forecast_age_seconds': (round(now - location.forecast_at, 1)
+                                     if location.timeline else None),
+            'refreshing': self.is_refreshing(location.adcode)
+        }
+
+    def get_status(self) -> Dict:
+        """天气服务运行状态：数据源、熔断器、各城市缓存新鲜度、后台刷新"""
+        now = time.time()
+        with self._locations_lock:
+            locations = list(self._locations.values())
+        status = {
+            'provider': self.provider.name,
+            'api_key_configured': self._has_api_key(),
+            'circuit_breaker': self.circuit_breaker.to_dict(),
+            'cache_seconds': self.cache_seconds,
+            'default_adcode': self.city_adcode
+        }
+        # 顶层字段为默认城市的状态
+        status.update(self._location_status(self._location(), now))
+        status.update({
+            'locations': {location.adcode: self._location_status(location, now)
+                          for location in locations},
+            'last_success_age_seconds': round(now - self._last_success, 1) if self._last_success else None,
+            'refreshing': self.is_refreshing(),
+            'background_refresh': self._refresher is not None and self._refresher.is_alive()
+        })
+        return status
+
+    # ==================== 后台刷新 ====================
+
+    def refresh_now(self, adcode: Optional[str] = None) -> None:
+        """
+        同步刷新实况与预报缓存（后台线程及启动预热使用）
+
+        参数:
+            adcode: 城市编码；为None时刷新全部已登记的城市
+        """
+        for code in ([adcode] if adcode else self.locations):
+            self._fetch_current_weather(code)
+            self._fetch_forecast(code)
+
+    def _begin_refresh(self, adcode: str) -> bool:
+        """标记城市进入刷新（已在刷新时返回False）"""
+        with self._refresh_state_lock:
+            if adcode in self._refreshing:
+                return False
+            self._refreshing.add(adcode)
+            return True
+
+    def _end_refresh(self, adcode: str) -> None:
+        with self._refresh_state_lock:
+            self._refreshing.discard(adcode)
+
+    def _trigger_refresh(self, adcode: Optional[str] = None) -> bool:
+        """
+        触发一次后台刷新（该城市已有刷新在进行时忽略）
+
+        返回:
+            是否启动了新的刷新线程
+        """
+        adcode = adcode or self.city_adcode
+        if not self._begin_refresh(adcode):
+            return False
+
+        def worker():
+            try:
+                self.refresh_now(adcode)
+            finally:
+                self._end_refresh(adcode)
+
+        threading.Thread(target=worker, name='weather-revalidate', daemon=True).start()
+        return True
+
+    def start_background_refresh(self, interval_seconds: Optional[float] = None) -> bool:
+        """
+        启动周期性后台刷新线程，在缓存过期前主动更新全部已登记城市
+
+        参数:
+            interval_seconds: 刷新间隔（秒），默认为缓存时间的80%
+
+        返回:
+            是否启动（数据源不可用或已在运行时返回False）
+        """
+        if not self._can_fetch():
+            return False
+        if self._refresher is not None and self._refresher.is_alive():
+            return False
+
+        interval = interval_seconds or max(1.0, self.cache_seconds * 0.8)
+        self._stop_refresher.clear()
+
+        def loop():
+            while True:
+                self._evict_idle_locations()
+                for adcode in self.locations:
+                    if not self._begin_refresh(adcode):
+                        continue
+                    try:
+                        self.refresh_now(adcode)
+                    finally:
+                        self._end_refresh(adcode)
+                if self._stop_refresher.wait(interval):
+                    break
+
+        self._refresher = threading.Thread(target=loop, name='weather-refresher', daemon=True)
+        self._refresher.start()
+        print(f"[WeatherService] 后台刷新已启动，间隔 {interval:g} 秒")
+        return True
+
+    def stop_background_refresh(self) -> None:
+        """停止周期性后台刷新线程"""
+        self._stop_refresher.set()
+        if self._refresher is not None:
+            self._refresher.join(timeout=1)
+            self._refresher = None
+
+    def is_refreshing(self, adcode: Optional[str] = None) -> bool:
+        """是否有刷新正在进行（adcode为None时检查全部城市）"""
+        with self._refresh_state_lock:
+            if adcode is None:
+                return bool(self._refreshing)
+            return adcode in self._refreshing
+
+    # ==================== 预报时间轴 ====================
+
+    def _parse_forecast_response(self, data: Dict) -> List[ForecastBucket]:
+        """
+        解析高德天气API预报响应（extensions='all'），生成逐小时时间轴
+
+        高德预报为逐日的白天/夜间天气：白天覆盖 08:00-20:00，夜间覆盖 20:00-次日08:00，
+        按 FORECAST_STEP 展开为连续的小时时段。
+        """
+        forecasts = data.get('forecasts', [])
+        if not forecasts:
+            return []
+
+        buckets = []
+        for cast in forecasts[0].get('casts', []):
+            try:
+                day = datetime.strptime(cast['date'], '%Y-%m-%d')
+            except (KeyError, ValueError):
+                continue
+            day_weather = cast.get('dayweather', '晴')
+            night_weather = cast.get('nightweather', day_weather)
+
+            start = day + timedelta(hours=8)
+            end = day + timedelta(hours=32)
+            night_start = day + timedelta(hours=20)
+            while start < end:
+                weather = day_weather if start < night_start else night_weather
+                buckets.append(ForecastBucket(
+                    start=start,
+                    end=start + self.FORECAST_STEP,
+                    weather=weather,
+                    weather_factor=self.WEATHER_FACTOR_MAP.get(weather, 1.0)
+                ))
+                start += self.FORECAST_STEP
+        return buckets
+
+    def get_forecast(self, force_refresh: bool = False,
+                     adcode: Optional[str] = None) -> List[ForecastBucket]:
+        """
+        获取逐小时预报时间轴（与实况共用缓存时长）
+
+        缓存过期时与实况相同地先返回旧数据并后台刷新；API不可用时返回已缓存的预报或空列表。
+        """
+        location = self._location(adcode, touch=True)
+        if (not force_refresh and location.timeline and
+                time.time() - location.forecast_at < self.cache_seconds):
+            return location.timeline
+
+        if not self._can_fetch() or self._recently_failed(location.adcode):
+            return location.timeline
+
+        if not force_refresh and self.stale_while_revalidate:
+            self._trigger_refresh(location.adcode)
+            return location.timeline
+
+        self._fetch_forecast(location.adcode)
+        return location.timeline
+
+    def _fetch_forecast(self, adcode: Optional[str] = None) -> bool:
+        """同步请求天气预报并更新缓存，返回是否成功"""
+        location = self._location(adcode)
+        try:
+            params = {
+                'key': self.api_key,
+                'city': location.adcode,
+                'extensions': 'all'  # 获取预报天气
+            }
+            data = self._request_json(params)
+            if data is None:
+                return False
+
+            if data.get('status') != '1' or not data.get('forecasts'):
+                print(f"[WeatherService] 天气预报API错误（{location.adcode}）: {data.get('info', '未知错误')}")
+                self._record_failed_lookup(location.adcode)
+                return False
+
+            location.timeline = self._parse_forecast_response(data)
+            location.forecast_at = time.time()
+            self._register_location(location)
+            return True
+
+        except Exception as e:
+            print(f"[WeatherService] 获取天气预报失败: {e}")
+            return False
+
+    def snapshot(self, include_forecast: bool = True,
+                 adcode: Optional[str] = None) -> WeatherSnapshot:
+        """
+        获取天气快照（实况 + 预报时间轴），供一次调度运行使用
+
+        参数:
+            include_forecast: 是否包含预报时段
+            adcode: 城市编码，默认为 city_adcode
+        """
+        current = self.get_current_weather(adcode=adcode)
+        buckets = self.get_forecast(adcode=adcode) if include_forecast else []
+        return WeatherSnapshot(taken_at=datetime.now(), current=current, buckets=list(buckets))
+
+    def factor_at(self, when: datetime, adcode: Optional[str] = None) -> float:
+        """查询任意时刻的速度折扣系数（只读缓存，不阻塞在网络请求上）"""
+        return self.snapshot(adcode=adcode).factor_at(when)
+
     def get_weather_factor(self, weather_type: Optional[str] = None) -> float:
         """
         获取指定天气类型的速度折扣系数
-        
+
         参数:
             weather_type: 天气类型，如果为None则获取当前实时天气的系数
-            
+
         返回:
             速度折扣系数 (0.0 ~ 1.0)
         """
@@ -296,24 +986,42 @@ class WeatherService:
             weather = self.get_current_weather()
             return weather.weather_factor
         return self.WEATHER_FACTOR_MAP.get(weather_type, 1.0)
-    
-    def get_weather_for_path_planning(self) -> Dict:
+
+    def get_weather_for_path_planning(self, when: Optional[datetime] = None,
+                                      adcode: Optional[str] = None) -> Dict:
         """
         获取用于路径规划的天气信息
-        
+
+        参数:
+            when: 计划滑行时刻；提供时按预报时间轴取该时刻的天气，否则使用实况
+            adcode: 城市编码，默认为 city_adcode
+
         返回:
             包含weather_factor、weather_level等关键字段的字典
         """
-        weather = self.get_current_weather()
-        return {
+        weather = self.get_current_weather(adcode=adcode)
+        info = {
             'weather_factor': weather.weather_factor,
             'weather_level': weather.weather_level,
             'visibility_impact': weather.visibility_impact,
             'weather_description': weather.weather,
             'temperature': weather.temperature,
             'wind_power': weather.windpower,
+            'source': 'live',
             'raw': weather.to_dict()
         }
+        if when is not None:
+            bucket = self.snapshot(adcode=adcode).bucket_at(when)
+            if bucket is not None:
+                info.update({
+                    'weather_factor': bucket.weather_factor,
+                    'weather_level': self.WEATHER_LEVEL_MAP.get(bucket.weather, 'normal'),
+                    'visibility_impact': self._visibility_impact(bucket.weather_factor),
+                    'weather_description': bucket.weather,
+                    'source': 'forecast'
+                })
+            info['planned_time'] = when.strftime('%Y-%m-%d %H:%M:%S')
+        return info
 
 
 # 全局天气服务实例（单例模式）
@@ -324,19 +1032,24 @@ def get_weather_service(api_key: Optional[str] = None,
                         city_adcode: str = "610100") -> WeatherService:
     """
     获取全局天气服务实例（单例）
-    
+
+    单例按城市编码分别缓存，其他城市通过各方法的adcode参数查询。
+    设置环境变量 WEATHER_REPLAY_FILE 时使用录制响应回放数据源（无需API Key，离线可用）。
+
     参数:
         api_key: 高德API Key
-        city_adcode: 城市编码
-        
+        city_adcode: 默认城市编码
+
     返回:
         WeatherService实例
     """
     global _weather_service_instance
     if _weather_service_instance is None:
+        replay_file = os.getenv('WEATHER_REPLAY_FILE')
         _weather_service_instance = WeatherService(
             api_key=api_key,
-            city_adcode=city_adcode
+            city_adcode=city_adcode,
+            provider=ReplayWeatherProvider(replay_file) if replay_file else None
         )
     return _weather_service_instance
 
@@ -344,6 +1057,8 @@ def get_weather_service(api_key: Optional[str] = None,
 def reset_weather_service():
     """重置天气服务实例（用于测试）"""
     global _weather_service_instance
+    if _weather_service_instance is not None:
+        _weather_service_instance.stop_background_refresh()
     _weather_service_instance = None
 
 
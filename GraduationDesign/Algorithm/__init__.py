@@ -3,25 +3,63 @@
 包含机场路径规划相关的算法实现
 """
 
-from .Astar import AirportGraph, AStarOptimizer
+from .Astar import AirportGraph, AStarOptimizer, RoutingConfig
 from .MultiAircraftScheduler import (
     MultiAircraftScheduler,
     Flight,
     OperationType,
     PriorityLevel,
     generate_simulation_data,
-    ConflictDetector
+    ConflictDetector,
+    MinimalDelayResolver
+)
+from .CompactSchedule import CompactWaypoints
+from .CrossingTable import CrossingTable, get_crossing_table
+from .GraphExport import export_columnar, read_columnar
+from .Metrics import MetricsRegistry, REGISTRY
+from .RouteCache import RouteCache, SingleFlight, get_route_single_flight, get_shared_route_cache
+from .SchedulingSession import SchedulingSession, ScheduleDelta
+from .SpatialIndex import GraphSpatialIndex, get_spatial_index
+from .SharedGraph import GraphArrays, SharedGraph, attach_shared_graph, publish_graph
+from .DensityAnalyzer import (
+    DensityAnalyzer,
+    DensityTimeline,
+    StreamingDensityTracker,
+    PeriodTransition
 )
-from .DensityAnalyzer import DensityAnalyzer
 
 __all__ = [
     'AirportGraph',
     'AStarOptimizer',
+    'RoutingConfig',
     'MultiAircraftScheduler',
     'Flight',
     'OperationType',
     'PriorityLevel',
     'generate_simulation_data',
     'ConflictDetector',
-    'DensityAnalyzer'
+    'MinimalDelayResolver',
+    'DensityAnalyzer',
+    'DensityTimeline',
+    'StreamingDensityTracker',
+    'PeriodTransition',
+    'CompactWaypoints',
+    'CrossingTable',
+    'get_crossing_table',
+    'export_columnar',
+    'read_columnar',
+    'MetricsRegistry',
+    'REGISTRY',
+    'RouteCache',
+    'get_shared_route_cache',
+    'SingleFlight',
+    'get_route_single_flight',
+    'SchedulingSession',
+    'ScheduleDelta',
+    'GraphSpatialIndex',
+    'get_spatial_index',
+    'GraphArrays',
+    'SharedGraph',
+    'attach_shared_graph',
+    'publish_graph'
 ]
@@ -3,10 +3,13 @@
 提供A*算法的HTTP接口
 """
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, Response, g, jsonify, request, send_from_directory
 from flask_cors import CORS
 import os
 import sys
+import threading
+import time
+import uuid
 from pathlib import Path
 
 # 加载环境变量
@@ -27,10 +30,29 @@ from Algorithm.MultiAircraftScheduler import (
     PriorityLevel,
     generate_simulation_data
 )
-from Algorithm.DensityAnalyzer import DensityAnalyzer
-from Algorithm.WeatherService import get_weather_service
+from Algorithm.CrossingTable import get_crossing_table
+from Algorithm.DensityAnalyzer import DensityAnalyzer, DensityTimeline, validate_window_sizes
+from Algorithm.GraphExport import export_columnar
+from Algorithm.Metrics import REGISTRY
+from Algorithm.RouteCache import get_route_single_flight, get_shared_route_cache
+from Algorithm.SchedulingSession import SchedulingSession
+from Algorithm.SharedGraph import get_graph_arrays
+from Algorithm.SpatialIndex import get_spatial_index
+from Algorithm.WeatherService import get_weather_service, is_valid_adcode
+from graph_payload import CachedPayload, get_cached_payload
+from job_queue import JobQueue, QueueFullError, SUCCEEDED
+from serialization import (
+    FastJSONProvider,
+    format_time,
+    format_times,
+    serialize_node,
+    serialize_path,
+    serialize_schedule,
+    serialize_time
+)
 
 app = Flask(__name__, static_folder='static', static_url_path='')
+app.json = FastJSONProvider(app)  # jsonify使用orjson编码（未安装时回退标准库）
 CORS(app)  # 允许跨域请求
 
 # 全局变量存储图和优化器
@@ -38,33 +60,283 @@ graph = None
 optimizer = None
 weather_service = None
 
+# 在线调度会话 {session_id: SchedulingSession}
+scheduling_sessions = {}
+scheduling_sessions_lock = threading.Lock()
+# 会话空闲超时（秒）与同时存在的会话数上限
+SESSION_IDLE_SECONDS = float(os.getenv('SESSION_IDLE_SECONDS', '1800'))
+MAX_SESSIONS = int(os.getenv('MAX_SESSIONS', '32'))
+_session_reaper = None
+
+# 每批调度的路径规划进程数（1为串行；大于1时使用长期复用的进程池，0表示全部CPU核心）
+PLANNING_WORKERS = int(os.getenv('PLANNING_WORKERS', '1'))
+
+# 后台任务队列：大批量调度在有界线程池中执行，不占用交互式请求的服务线程
+job_queue = JobQueue(
+    max_workers=int(os.getenv('JOB_WORKERS', '2')),
+    max_pending=int(os.getenv('JOB_MAX_PENDING', '16'))
+)
+# SSE事件流无新事件时发送保活注释的间隔（秒）
+JOB_EVENTS_KEEPALIVE = 15.0
+# 同时打开的SSE事件流上限：每个事件流在推送期间占用一个服务线程，默认最多占用一半
+# （API_THREADS 与 gunicorn.conf.py 一致），其余线程始终留给交互式请求
+JOB_MAX_STREAMS = int(os.getenv('JOB_MAX_STREAMS', str(max(1, int(os.getenv('API_THREADS', '4')) // 2))))
+_job_streams = threading.BoundedSemaphore(JOB_MAX_STREAMS)
+
 # 数据路径
 BASE_PATH = "/Users/xupeihong/Desktop/毕业设计/demo/GraduationDesign/西安机场"
 
 
-def initialize_system():
-    """初始化路网图和优化器"""
-    global graph, optimizer, weather_service
+# 初始化锁：多线程服务下并发的首个请求只触发一次加载
+_init_lock = threading.Lock()
+
+# 预热状态：路网与各项只读缓存全部构建完成后就绪，/api/readyz 返回200
+_ready = threading.Event()
+_warmup_lock = threading.Lock()         # 预热期间持有，保证只执行一次
+_warmup_thread_lock = threading.Lock()  # 只保护后台预热线程的启动，不随预热持有
+_warmup_thread = None
+warmup_status = {
+    'state': 'pending',       # pending / running / ready / failed
+    'started_at': None,
+    'finished_at': None,
+    'steps': {},              # {步骤: 耗时（秒）}
+    'error': None
+}
+
+# 运行指标（进程内，/metrics 导出）
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    'http_request_duration_seconds', 'HTTP请求处理耗时（秒），route为路由模板', ['route', 'method', 'status'])
+GRAPH_LOAD_SECONDS = REGISTRY.gauge(
+    'graph_load_duration_seconds', '路网加载及交叉表、空间索引构建耗时（秒）')
+WARMUP_STEP_SECONDS = REGISTRY.gauge(
+    'warmup_step_duration_seconds', '启动预热各步骤耗时（秒）', ['step'])
+
+
+def initialize_graph():
+    """
+    加载路网图并构建只读衍生结构（交叉表、空间索引）和A*优化器
 
-    if graph is None:
+    使用gunicorn预加载（preload_app）时在主进程执行一次，工作进程fork后共享同一份路网
+    """
+    global graph, optimizer
+
+    with _init_lock:
+        if graph is not None:
+            return
+
+        load_start = time.perf_counter()
         print("正在加载路网数据...")
-        graph = AirportGraph(BASE_PATH)
-        graph.load_data()
+        new_graph = AirportGraph(BASE_PATH)
+        new_graph.load_data()
+
+        print("正在预计算路段交叉表...")
+        crossing_table = get_crossing_table(new_graph)
+        print(f"  - 路段数: {crossing_table.segment_count}，交叉/共用路段对: {crossing_table.pair_count}")
+
+        print("正在构建空间索引...")
+        get_spatial_index(new_graph)
 
         print("正在初始化A*优化器...")
         optimizer = AStarOptimizer(
-            graph=graph,
+            graph=new_graph,
             weight_distance=1.0,
             weight_time=1.0,
             weight_fuel=0.5,
             aircraft_speed=15.0
         )
-        print("系统初始化完成！")
-    
+        GRAPH_LOAD_SECONDS.set(time.perf_counter() - load_start)
+        # 最后发布graph：其他线程看到graph非空时优化器等已就绪
+        graph = new_graph
+        print("路网初始化完成！")
+
+
+def initialize_weather_service():
+    """初始化天气服务并启动后台刷新（每个进程一次，后台线程不能跨fork继承）"""
+    global weather_service
+
+    with _init_lock:
+        if weather_service is None:
+            print("正在初始化天气服务...")
+            service = get_weather_service()
+            # 后台周期刷新天气缓存，请求处理线程不再等待天气API
+            service.start_background_refresh()
+            weather_service = service
+            print("天气服务初始化完成！")
+
+
+def warm_up(include_weather=True):
+    """
+    预热：加载路网并预构建全部只读缓存，完成后标记就绪
+
+    只执行一次：并发调用等待同一次预热完成；失败后再次调用会重试。
+
+    参数:
+        include_weather: 是否同时初始化天气服务（gunicorn主进程预加载时为False，
+                         由各工作进程启动后初始化）
+    """
+    with _warmup_lock:
+        if _ready.is_set():
+            if include_weather:
+                initialize_weather_service()
+            return
+
+        warmup_status.update(state='running', started_at=time.time(), finished_at=None,
+                             steps={}, error=None)
+        steps = [
+            ('graph', initialize_graph),
+            ('graph_arrays', lambda: get_graph_arrays(graph)),
+            ('route_cache', lambda: (get_shared_route_cache(graph), get_route_single_flight(graph))),
+            ('nodes_payload', lambda: get_cached_payload(graph, 'nodes', _build_nodes_payload)),
+            ('nodes_binary', lambda: get_cached_payload(graph, 'nodes_binary', _build_nodes_binary_payload))
+        ]
+        if include_weather:
+            steps.append(('weather', initialize_weather_service))
+
+        try:
+            for name, step in steps:
+                step_start = time.perf_counter()
+                step()
+                elapsed = time.perf_counter() - step_start
+                warmup_status['steps'][name] = round(elapsed, 3)
+                WARMUP_STEP_SECONDS.labels(name).set(elapsed)
+        except Exception as e:
+            import traceback
+            print(f"[API] 预热失败: {e}")
+            traceback.print_exc()
+            warmup_status.update(state='failed', finished_at=time.time(), error=str(e))
+            return
+
+        warmup_status.update(state='ready', finished_at=time.time())
+        _ready.set()
+        print(f"系统预热完成，耗时 {warmup_status['finished_at'] - warmup_status['started_at']:.2f} 秒")
+
+
+def start_warm_up(include_weather=True):
+    """在后台线程中预热（已在预热或已就绪时不重复启动），服务可立即响应存活探针"""
+    global _warmup_thread
+
+    with _warmup_thread_lock:
+        if _ready.is_set() or (_warmup_thread is not None and _warmup_thread.is_alive()):
+            return
+        _warmup_thread = threading.Thread(target=warm_up, args=(include_weather,),
+                                          name='warm-up', daemon=True)
+        _warmup_thread.start()
+
+
+# 不依赖路网、预热完成前也可访问的接口
+_WARMUP_EXEMPT_ENDPOINTS = {
+    'api_index', 'health_check', 'liveness_probe', 'readiness_probe',
+    'get_current_weather', 'get_weather_forecast', 'get_weather_status', 'get_weather_factor_map',
+    'schedule_job_state', 'schedule_job_events'
+}
+
+
+@app.before_request
+def _start_request_timer():
+    """记录请求开始时刻（先于就绪检查注册，503响应也计入耗时）"""
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def _observe_request(response):
+    """按路由模板记录请求耗时；流式响应记录到开始返回为止"""
+    start = g.pop('request_start', None)
+    if start is not None:
+        # 未匹配路由（404等）归为一类，避免任意路径产生新的标签值
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        HTTP_REQUEST_SECONDS.labels(route, request.method, response.status_code).observe(
+            time.perf_counter() - start)
+    return response
+
+
+@app.before_request
+def _require_ready():
+    """预热完成前，依赖路网的接口返回503（并确保预热已启动），不在请求线程中加载路网"""
+    if _ready.is_set() or request.method == 'OPTIONS' or not request.path.startswith('/api/'):
+        return None
+    if request.endpoint in _WARMUP_EXEMPT_ENDPOINTS:
+        return None
+    start_warm_up()
+    response, status = _json_response({
+        'success': False,
+        'error': '系统预热中，请稍后重试',
+        'warmup': warmup_status
+    }, 503)
+    response.headers['Retry-After'] = '5'
+    return response, status
+
+
+@app.route('/api/livez', methods=['GET'])
+def liveness_probe():
+    """存活探针：进程可以处理请求即返回200"""
+    return jsonify({'status': 'alive'})
+
+
+@app.route('/api/readyz', methods=['GET'])
+def readiness_probe():
+    """就绪探针：路网与缓存预热完成后返回200，否则返回503"""
+    ready = _ready.is_set()
+    return jsonify({
+        'status': 'ready' if ready else warmup_status['state'],
+        'warmup': warmup_status
+    }), 200 if ready else 503
+
+
+def _weather_cache_ages():
+    if weather_service is None:
+        return None
+    samples = []
+    for adcode, location in weather_service.get_status()['locations'].items():
+        samples.append(((adcode, 'current'), location['current_age_seconds']))
+        samples.append(((adcode, 'forecast'), location['forecast_age_seconds']))
+    return samples
+
+
+def _weather_circuit_state():
     if weather_service is None:
-        print("正在初始化天气服务...")
-        weather_service = get_weather_service()
-        print("天气服务初始化完成！")
+        return None
+    state = weather_service.circuit_breaker.to_dict()['state']
+    return [((name,), 1.0 if name == state else 0.0) for name in ('closed', 'open', 'half_open')]
+
+
+def _route_cache_stat(field):
+    return get_shared_route_cache(graph).stats()[field] if graph is not None else None
+
+
+def _route_cache_requests():
+    if graph is None:
+        return None
+    stats = get_shared_route_cache(graph).stats()
+    return [(('hit',), stats['hits']), (('miss',), stats['misses'])]
+
+
+def _route_coalesced_calls():
+    if graph is None:
+        return None
+    stats = get_route_single_flight(graph).stats()
+    return [(('executed',), stats['executed']), (('shared',), stats['shared'])]
+
+
+# 导出时计算的指标：天气缓存年龄、熔断器状态、进程级路径缓存与查询合并统计
+REGISTRY.callback('app_ready', '预热是否完成（1为就绪）', lambda: 1.0 if _ready.is_set() else 0.0)
+REGISTRY.callback('weather_cache_age_seconds', '各城市天气缓存距上次成功刷新的时间（秒）',
+                  _weather_cache_ages, ['adcode', 'kind'])
+REGISTRY.callback('weather_circuit_breaker_state', '天气API熔断器状态（当前状态为1）',
+                  _weather_circuit_state, ['state'])
+REGISTRY.callback('route_cache_requests_total', '进程级路径缓存查询次数',
+                  _route_cache_requests, ['result'], kind='counter')
+REGISTRY.callback('route_cache_hit_ratio', '进程级路径缓存命中率',
+                  lambda: _route_cache_stat('hit_rate'))
+REGISTRY.callback('route_cache_entries', '进程级路径缓存条目数',
+                  lambda: _route_cache_stat('entries'))
+REGISTRY.callback('route_coalesced_calls_total', '相同路径查询合并：executed为实际计算，shared为共享结果',
+                  _route_coalesced_calls, ['outcome'], kind='counter')
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 指标（文本格式0.0.4，每个进程独立计数，样本带pid标签）"""
+    return Response(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 @app.route('/')
@@ -81,16 +353,29 @@ def api_index():
         'version': '2.0',
         'endpoints': {
             '/api/health': '健康检查',
+            '/api/livez': '存活探针（GET）',
+            '/api/readyz': '就绪探针：路网与缓存预热完成后返回200（GET）',
+            '/metrics': 'Prometheus指标：请求耗时、A*搜索、冲突检测、缓存命中与天气缓存年龄（GET）',
             '/api/nodes': '获取所有节点',
             '/api/nodes/by-type/<node_type>': '根据类型获取节点',
+            '/api/nodes/binary': '以列式二进制获取全部节点和边（GET）',
+            '/api/nodes/viewport': '按视口范围/缩放级别/类型获取节点和路段（GET）',
             '/api/path': '计算路径（POST）',
             '/api/demo/farthest-stand': '获取距离最远的机位对',
             '/api/demo/stand-to-runway': '获取机位到跑道点',
             '/api/multi-aircraft/generate-simulation': '生成模拟航班数据（POST）',
             '/api/multi-aircraft/schedule': '多航班调度（POST）',
+            '/api/jobs/schedule': '提交后台多航班调度任务，返回任务ID（POST）',
+            '/api/jobs/<job_id>': '查询任务状态、进度与结果（GET）/ 取消任务（DELETE）',
+            '/api/jobs/<job_id>/events': '任务进度事件流（GET，text/event-stream）',
+            '/api/sessions': '创建在线调度会话（POST）',
+            '/api/sessions/<session_id>': '获取会话全量调度（GET）/ 关闭会话（DELETE）',
+            '/api/sessions/<session_id>/events': '提交航班新增/变更/取消事件，返回增量（POST）',
             '/api/density/analyze': '航班密度分析（POST）',
             '/api/density/current-weights': '获取当前权重（POST）',
-    '/api/weather/current': '获取当前天气（GET）'
+    '/api/weather/current': '获取当前天气（GET）',
+    '/api/weather/forecast': '逐小时天气折扣系数时间轴（GET）',
+    '/api/weather/status': '天气服务状态：熔断器与缓存（GET）'
         }
     })
 
@@ -99,58 +384,84 @@ def api_index():
 def health_check():
     """健康检查"""
     try:
-        if graph is None:
-            initialize_system()
-
         return jsonify({
             'status': 'ok',
+            'ready': _ready.is_set(),
             'graph_loaded': graph is not None,
             'node_count': len(graph.nodes) if graph else 0,
-            'edge_count': sum(len(edges) for edges in graph.edges.values()) if graph else 0
+            'edge_count': sum(len(edges) for edges in graph.edges.values()) if graph else 0,
+            'route_coalescing': get_route_single_flight(graph).stats() if graph else None
         })
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
+def _build_nodes_payload():
+    """序列化全部节点与边（每个路网图只执行一次）"""
+    nodes_data = []
+    for node in graph.nodes.values():
+        nodes_data.append({
+            'id': node.id,
+            'type': node.node_type,
+            'x': node.x,
+            'y': node.y,
+            'properties': node.properties
+        })
+
+    # 同时返回边数据
+    edges_data = []
+    for from_node_id, edges in graph.edges.items():
+        for edge in edges:
+            edges_data.append({
+                'from_node_id': edge.from_node.id,
+                'to_node_id': edge.to_node.id,
+                'from_x': edge.from_node.x,
+                'from_y': edge.from_node.y,
+                'to_x': edge.to_node.x,
+                'to_y': edge.to_node.y,
+                'type': edge.edge_type,
+                'length': edge.length
+            })
+
+    return CachedPayload.from_json({
+        'success': True,
+        'count': len(nodes_data),
+        'nodes': nodes_data,
+        'edges': edges_data,
+        'edge_count': len(edges_data)
+    }, app.json.dumps)
+
+
+def _build_nodes_binary_payload():
+    """导出全部节点与边的列式二进制（每个路网图只执行一次）"""
+    return CachedPayload(export_columnar(get_graph_arrays(graph)), mimetype='application/octet-stream')
+
+
 @app.route('/api/nodes', methods=['GET'])
 def get_nodes():
-    """获取所有节点"""
+    """
+    获取所有节点
+
+    响应在每个路网图上只序列化一次，按 Accept-Encoding 返回 gzip/brotli 压缩正文；
+    携带 If-None-Match 且 ETag 未变化时返回 304
+    """
     try:
-        if graph is None:
-            initialize_system()
+        payload = get_cached_payload(graph, 'nodes', _build_nodes_payload)
+        return payload.response(request)
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        nodes_data = []
-        for node in graph.nodes.values():
-            nodes_data.append({
-                'id': node.id,
-                'type': node.node_type,
-                'x': node.x,
-                'y': node.y,
-                'properties': node.properties
-            })
 
-        # 同时返回边数据
-        edges_data = []
-        for from_node_id, edges in graph.edges.items():
-            for edge in edges:
-                edges_data.append({
-                    'from_node_id': edge.from_node.id,
-                    'to_node_id': edge.to_node.id,
-                    'from_x': edge.from_node.x,
-                    'from_y': edge.from_node.y,
-                    'to_x': edge.to_node.x,
-                    'to_y': edge.to_node.y,
-                    'type': edge.edge_type,
-                    'length': edge.length
-                })
+@app.route('/api/nodes/binary', methods=['GET'])
+def get_nodes_binary():
+    """
+    以列式二进制获取全部节点与边（格式见 Algorithm/GraphExport.py）
 
-        return jsonify({
-            'success': True,
-            'count': len(nodes_data),
-            'nodes': nodes_data,
-            'edges': edges_data,
-            'edge_count': len(edges_data)
-        })
+    与 /api/nodes 相同地按路网图缓存，支持 gzip/brotli 与 ETag/304
+    """
+    try:
+        payload = get_cached_payload(graph, 'nodes_binary', _build_nodes_binary_payload)
+        return payload.response(request)
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
@@ -159,9 +470,6 @@ def get_nodes():
 def get_nodes_by_type(node_type):
     """根据类型获取节点"""
     try:
-        if graph is None:
-            initialize_system()
-
         nodes = graph.find_nodes_by_type(node_type)
 
         nodes_data = []
@@ -184,6 +492,82 @@ def get_nodes_by_type(node_type):
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/nodes/viewport', methods=['GET'])
+def get_nodes_in_viewport():
+    """
+    按视口范围与缩放级别获取节点和路段
+
+    查询参数:
+        bbox: "min_x,min_y,max_x,max_y"（投影坐标，米），缺省为整个机场
+        zoom: 缩放级别 0~12，缺省为12（完整细节）；级别越低路段简化越多、普通节点抽稀越多
+        types: 节点类型过滤，逗号分隔（前缀匹配，如 StandPoint,RunwayPoint）
+        edge_types: 路段类型过滤，逗号分隔
+    """
+    try:
+        index = get_spatial_index(graph)
+        bbox_param = request.args.get('bbox')
+        if bbox_param:
+            try:
+                bbox = tuple(float(value) for value in bbox_param.split(','))
+            except ValueError:
+                bbox = ()
+            if len(bbox) != 4 or bbox[0] > bbox[2] or bbox[1] > bbox[3]:
+                return jsonify({
+                    'success': False,
+                    'error': 'bbox格式应为 min_x,min_y,max_x,max_y'
+                }), 400
+        else:
+            bbox = index.bounds
+
+        types = request.args.get('types')
+        edge_types = request.args.get('edge_types')
+        result = index.query(
+            bbox,
+            zoom=request.args.get('zoom', 12, type=int),
+            node_types=types.split(',') if types else None,
+            edge_types=edge_types.split(',') if edge_types else None
+        )
+
+        return jsonify({
+            'success': True,
+            'bbox': list(bbox),
+            'bounds': list(index.bounds),
+            'count': len(result['nodes']),
+            'edge_count': len(result['edges']),
+            **result
+        })
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def _routing_config(data, weather_factor=None):
+    """
+    由请求参数构造本次查询的路径配置
+
+    以全局optimizer的默认参数为基础，覆盖请求中的 weights / speed / weather_factor；
+    不修改全局optimizer，并发请求互不影响
+    """
+    return optimizer.config.with_overrides(
+        weights=data.get('weights'),
+        weather_factor=weather_factor,
+        aircraft_speed=data.get('speed') or None
+    )
+
+
+def _coalesced_route(key, compute):
+    """
+    合并并发的相同路径查询：同一键同时只执行一次A*，其余请求等待并共享结果（只读使用）
+
+    参数:
+        key: 查询键（包含起终点与本次请求的RoutingConfig）
+        compute: 执行查询的函数
+    """
+    result, _ = get_route_single_flight(graph).do(key, compute)
+    return result
+
+
 @app.route('/api/path', methods=['POST'])
 def find_path():
     """
@@ -198,13 +582,12 @@ def find_path():
             "fuel": float
         },
         "speed": float,
-        "weather_factor": float  // 可选：天气速度折扣系数 (0.0~1.0)
+        "weather_factor": float,  // 可选：天气速度折扣系数 (0.0~1.0)
+        "planned_time": str,      // 可选：计划滑行时刻 "YYYY-MM-DD HH:MM:SS"，按预报时间轴取该时刻天气
+        "adcode": str             // 可选：天气城市编码，默认为西安
     }
     """
     try:
-        if graph is None:
-            initialize_system()
-
         data = request.get_json()
 
         start_node_id = data.get('start_node_id')
@@ -226,60 +609,39 @@ def find_path():
                 'error': '未找到指定的节点'
             }), 404
 
-        # 更新权重（如果提供）
-        weights = data.get('weights', {})
-        if weights:
-            optimizer.weight_distance = weights.get('distance', 1.0)
-            optimizer.weight_time = weights.get('time', 1.0)
-            optimizer.weight_fuel = weights.get('fuel', 0.5)
-
-        # 更新速度（如果提供）
-        speed = data.get('speed')
-        if speed:
-            optimizer.aircraft_speed = speed
-        
+        try:
+            _validate_adcode(data.get('adcode'))
+            planned_time = _parse_planned_time(data.get('planned_time'))
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+
         # 获取天气因子（如果提供，否则使用当前实时天气）
         weather_factor = data.get('weather_factor')
         weather_info = None
         if weather_factor is None:
-            # 自动获取当前天气
+            # 自动获取天气（提供计划时刻时使用预报时间轴）
             if weather_service is None:
-                initialize_system()
-            weather_info = weather_service.get_weather_for_path_planning()
+                initialize_weather_service()
+            weather_info = weather_service.get_weather_for_path_planning(
+                when=planned_time,
+                adcode=data.get('adcode')
+            )
             weather_factor = weather_info['weather_factor']
 
-        # 执行A*算法（传入天气因子）
-        path, stats = optimizer.find_path(start_node, goal_node, weather_factor=weather_factor)
+        # 执行A*算法（本次请求的权重、速度、天气因子）
+        config = _routing_config(data, weather_factor=weather_factor)
+        path, stats = _coalesced_route(
+            ('path', start_node.id, goal_node.id, config),
+            lambda: optimizer.find_path(start_node, goal_node, config=config)
+        )
 
         if path:
-            # 构建路径数据
-            path_data = []
-            for node in path:
-                path_data.append({
-                    'id': node.id,
-                    'type': node.node_type,
-                    'x': node.x,
-                    'y': node.y,
-                    'lon': node.properties.get('lon'),
-                    'lat': node.properties.get('lat')
-                })
-
             response = {
                 'success': True,
-                'path': path_data,
+                'path': serialize_path(path, geo=True),
                 'stats': stats,
-                'start_node': {
-                    'id': start_node.id,
-                    'type': start_node.node_type,
-                    'x': start_node.x,
-                    'y': start_node.y
-                },
-                'goal_node': {
-                    'id': goal_node.id,
-                    'type': goal_node.node_type,
-                    'x': goal_node.x,
-                    'y': goal_node.y
-                }
+                'start_node': serialize_node(start_node),
+                'goal_node': serialize_node(goal_node)
             }
             
             # 如果使用了实时天气，返回天气信息
@@ -310,7 +672,9 @@ def get_alternative_paths():
     {
         "start_node_id": int,
         "goal_node_id": int,
-        "k": int  # 可选，默认3条路径
+        "k": int,  # 可选，默认3条路径
+        "weights": {...},  # 可选，同 /api/path
+        "speed": float     # 可选，同 /api/path
     }
     
     返回格式:
@@ -339,9 +703,6 @@ def get_alternative_paths():
     }
     """
     try:
-        if graph is None:
-            initialize_system()
-        
         data = request.get_json()
         
         start_node_id = data.get('start_node_id')
@@ -365,7 +726,11 @@ def get_alternative_paths():
             }), 404
         
         # 使用KSP算法查找多条路径
-        paths_with_stats = optimizer.find_k_shortest_paths(start_node, goal_node, k)
+        config = _routing_config(data)
+        paths_with_stats = _coalesced_route(
+            ('alternatives', start_node.id, goal_node.id, k, config),
+            lambda: optimizer.find_k_shortest_paths(start_node, goal_node, k, config=config)
+        )
         
         if not paths_with_stats:
             return jsonify({
@@ -379,16 +744,6 @@ def get_alternative_paths():
         # 构建响应数据
         paths_data = []
         for rank, (path, stats) in enumerate(paths_with_stats, 1):
-            # 构建节点数据
-            nodes_data = []
-            for node in path:
-                nodes_data.append({
-                    'id': node.id,
-                    'type': node.node_type,
-                    'x': node.x,
-                    'y': node.y
-                })
-            
             # 计算与最佳路径的差异
             if rank == 1:
                 differences = {'distance': 0, 'time': 0, 'fuel': 0}
@@ -401,7 +756,7 @@ def get_alternative_paths():
             
             paths_data.append({
                 'path_id': f'path_{rank}',
-                'nodes': nodes_data,
+                'nodes': serialize_path(path),
                 'distance': stats['total_distance'],
                 'time': stats['total_time'],
                 'fuel': stats['fuel_consumption'],
@@ -430,9 +785,6 @@ def get_alternative_paths():
 def get_farthest_stand():
     """获取距离最远的机位对（用于演示）"""
     try:
-        if graph is None:
-            initialize_system()
-
         import math
 
         standpoints = graph.find_nodes_by_type('StandPoint')
@@ -458,22 +810,8 @@ def get_farthest_stand():
 
         return jsonify({
             'success': True,
-            'start_node': {
-                'id': start_node.id,
-                'type': start_node.node_type,
-                'x': start_node.x,
-                'y': start_node.y,
-                'lon': start_node.properties.get('lon'),
-                'lat': start_node.properties.get('lat')
-            },
-            'goal_node': {
-                'id': goal_node.id,
-                'type': goal_node.node_type,
-                'x': goal_node.x,
-                'y': goal_node.y,
-                'lon': goal_node.properties.get('lon'),
-                'lat': goal_node.properties.get('lat')
-            },
+            'start_node': serialize_node(start_node, geo=True),
+            'goal_node': serialize_node(goal_node, geo=True),
             'distance': max_distance
         })
 
@@ -487,9 +825,6 @@ def get_farthest_stand():
 def get_stand_to_runway():
     """获取距离最远的机位到跑道点（用于演示）"""
     try:
-        if graph is None:
-            initialize_system()
-
         import math
 
         standpoints = graph.find_nodes_by_type('StandPoint')
@@ -516,22 +851,8 @@ def get_stand_to_runway():
 
         return jsonify({
             'success': True,
-            'start_node': {
-                'id': start_node.id,
-                'type': start_node.node_type,
-                'x': start_node.x,
-                'y': start_node.y,
-                'lon': start_node.properties.get('lon'),
-                'lat': start_node.properties.get('lat')
-            },
-            'goal_node': {
-                'id': goal_node.id,
-                'type': goal_node.node_type,
-                'x': goal_node.x,
-                'y': goal_node.y,
-                'lon': goal_node.properties.get('lon'),
-                'lat': goal_node.properties.get('lat')
-            },
+            'start_node': serialize_node(start_node, geo=True),
+            'goal_node': serialize_node(goal_node, geo=True),
             'distance': max_distance
         })
 
@@ -543,14 +864,220 @@ def get_stand_to_runway():
 
 # ==================== 多航班调度API ====================
 
+def _parse_flight(flight_data):
+    """
+    将请求中的航班数据转换为Flight对象
+
+    返回:
+        Flight；起点或终点节点不存在时返回None
+    """
+    from datetime import datetime
+
+    start_node = graph.get_node(flight_data['start_node_id'])
+    end_node = graph.get_node(flight_data['end_node_id'])
+
+    if not start_node or not end_node:
+        print(f"[API] 未找到节点: {flight_data.get('start_node_id')} 或 {flight_data.get('end_node_id')}")
+        return None
+
+    return Flight(
+        flight_id=flight_data['flight_id'],
+        aircraft_type=flight_data.get('aircraft_type', 'A320'),
+        operation=OperationType.DEPARTURE if flight_data['operation'] == 'departure' else OperationType.ARRIVAL,
+        start_node=start_node,
+        end_node=end_node,
+        scheduled_time=datetime.strptime(flight_data['scheduled_time'], '%Y-%m-%d %H:%M:%S'),
+        priority=PriorityLevel.HIGH if flight_data.get('priority') == 'high' else
+                (PriorityLevel.LOW if flight_data.get('priority') == 'low' else PriorityLevel.MEDIUM),
+        speed=flight_data.get('speed', 15.0)
+    )
+
+
+def _epoch_times(data=None):
+    """请求是否要求时间输出为epoch秒（?time_format=epoch 或请求体 "time_format": "epoch"）"""
+    time_format = request.args.get('time_format') or (data or {}).get('time_format')
+    return time_format == 'epoch'
+
+
+def _validate_adcode(adcode):
+    """
+    检查请求中的天气城市编码（可选）
+
+    异常:
+        ValueError: 不是6位数字的编码
+    """
+    if adcode is not None and not is_valid_adcode(adcode):
+        raise ValueError(f'无效的城市编码: {adcode!r}（应为6位数字）')
+
+
+def _parse_planned_time(planned_time):
+    """
+    解析请求中的计划滑行时刻（可选，"YYYY-MM-DD HH:MM:SS"）
+
+    返回:
+        datetime，未提供时为None
+
+    异常:
+        ValueError: 格式不正确
+    """
+    from datetime import datetime
+
+    if not planned_time:
+        return None
+    try:
+        return datetime.strptime(planned_time, '%Y-%m-%d %H:%M:%S')
+    except (TypeError, ValueError):
+        raise ValueError(f'无效的计划时刻: {planned_time!r}（格式应为 YYYY-MM-DD HH:MM:SS）') from None
+
+
+def _parse_schedule_request(data):
+    """
+    解析多航班调度请求
+
+    返回:
+        (调度策略, Flight列表)
+
+    异常:
+        ValueError: 未提供航班数据、没有有效的航班或城市编码无效
+    """
+    strategy = data.get('strategy', 'fcfs')
+    flights_data = data.get('flights', [])
+
+    print(f"[API] 调度请求: strategy={strategy}, flights={len(flights_data)}")
+
+    if not flights_data:
+        raise ValueError('请提供航班数据')
+    _validate_adcode(data.get('adcode'))
+
+    # 构建Flight对象列表
+    flights = []
+    for flight_data in flights_data:
+        try:
+            flight = _parse_flight(flight_data)
+            if flight is None:
+                continue
+            flights.append(flight)
+        except Exception as e:
+            print(f"[API] 处理航班数据时出错: {e}")
+            continue
+
+    if not flights:
+        raise ValueError('没有有效的航班数据')
+
+    return strategy, flights
+
+
+def _execute_schedule(strategy, flights, adcode=None, progress_callback=None):
+    """
+    执行多航班调度
+
+    参数:
+        strategy: 调度策略
+        flights: Flight列表
+        adcode: 天气城市编码（可选）
+        progress_callback: 调度进度回调（可选），见 MultiAircraftScheduler
+
+    返回:
+        (调度器, {flight_id: AircraftSchedule})
+    """
+    print(f"[API] 开始调度 {len(flights)} 个航班...")
+
+    # 创建调度器并执行调度
+    scheduler = MultiAircraftScheduler(graph, strategy=strategy, shared_route_cache=True,
+                                       planning_workers=PLANNING_WORKERS,
+                                       weather_adcode=adcode, progress_callback=progress_callback)
+    schedules = scheduler.schedule_multiple_flights(flights)
+    return scheduler, schedules
+
+
+def _iter_serialized_schedules(schedules, epoch=False):
+    """逐个序列化调度结果（单个航班出错时跳过）"""
+    for flight_id, schedule in schedules.items():
+        try:
+            yield serialize_schedule(flight_id, schedule, epoch)
+        except Exception as e:
+            print(f"[API] 处理调度结果时出错: {e}")
+            continue
+
+
+def _schedule_summary(strategy, scheduler, schedules):
+    """调度总体统计（不含各航班调度）"""
+    total_distance = sum(s.total_distance for s in schedules.values())
+    total_time = sum(s.total_time for s in schedules.values())
+    total_delay = sum(s.delay.total_seconds() for s in schedules.values())
+    total_conflicts = sum(len(s.conflicts) for s in schedules.values())
+
+    print(f"[API] 调度完成: {len(schedules)} 个航班, {total_conflicts} 个冲突")
+
+    return {
+        'success': True,
+        'strategy': strategy,
+        'flight_count': len(schedules),
+        'total_distance': total_distance,
+        'total_time': total_time,
+        'total_delay': total_delay,
+        'total_conflicts': total_conflicts,
+        'route_cache': scheduler.route_cache_summary()
+    }
+
+
+def _run_schedule(strategy, flights, adcode=None, progress_callback=None, epoch=False):
+    """执行多航班调度并构建完整的返回数据（参数同 _execute_schedule，epoch为时间是否输出epoch秒）"""
+    scheduler, schedules = _execute_schedule(strategy, flights, adcode, progress_callback)
+    response_data = _schedule_summary(strategy, scheduler, schedules)
+    response_data['schedules'] = list(_iter_serialized_schedules(schedules, epoch))
+    return response_data
+
+
+def _wants_ndjson():
+    """请求是否要求NDJSON流式返回（?stream=ndjson 或 Accept: application/x-ndjson）"""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'ndjson'):
+        return True
+    return 'application/x-ndjson' in request.headers.get('Accept', '')
+
+
+def _stream_schedule(strategy, scheduler, schedules, epoch=False):
+    """
+    以NDJSON流式返回调度结果
+
+    冲突消解结束后各航班的调度即为最终结果，逐个序列化后立即写出，每行一条记录：
+    先是各航班的 {"type": "schedule", ...}（字段同 schedules 数组元素），
+    最后是 {"type": "summary", ...}（字段同非流式响应中除 schedules 以外的部分）。
+    写出过程中出错时以 {"type": "error", ...} 结束。
+    """
+    dumps = app.json.dumps
+
+    def generate():
+        try:
+            for record in _iter_serialized_schedules(schedules, epoch):
+                record['type'] = 'schedule'
+                yield dumps(record) + '\n'
+            summary = _schedule_summary(strategy, scheduler, schedules)
+            summary['type'] = 'summary'
+            yield dumps(summary) + '\n'
+        except Exception as e:
+            print(f"[API] 流式返回调度结果出错: {e}")
+            yield dumps({'type': 'error', 'success': False, 'error': str(e),
+                         'error_type': type(e).__name__}) + '\n'
+
+    response = Response(generate(), mimetype='application/x-ndjson')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
 @app.route('/api/multi-aircraft/schedule', methods=['POST', 'OPTIONS'])
 def schedule_multi_aircraft():
     """
-    多航班调度接口
+    多航班调度接口（同步，请求在调度完成后返回；大批量航班请使用 /api/jobs/schedule）
+
+    ?stream=ndjson 或 Accept: application/x-ndjson 时以NDJSON流式返回，见 _stream_schedule
     POST数据格式:
     {
         "strategy": "fcfs" | "priority" | "time_window",
-        "flights": [...]
+        "flights": [...],
+        "adcode": str  // 可选：天气城市编码，默认为西安
     }
     """
     # 处理OPTIONS请求（CORS预检）
@@ -562,162 +1089,467 @@ def schedule_multi_aircraft():
         return response
 
     try:
-        if graph is None:
-            initialize_system()
-
         data = request.get_json(force=True, silent=True)
         if data is None:
             data = {}
 
-        strategy = data.get('strategy', 'fcfs')
-        flights_data = data.get('flights', [])
-
-        print(f"[API] 调度请求: strategy={strategy}, flights={len(flights_data)}")
-
-        if not flights_data:
+        try:
+            strategy, flights = _parse_schedule_request(data)
+        except ValueError as e:
             error_response = jsonify({
                 'success': False,
-                'error': '请提供航班数据'
+                'error': str(e)
             })
             error_response.headers.add('Access-Control-Allow-Origin', '*')
             return error_response, 400
 
-        # 构建Flight对象列表
-        flights = []
-        for flight_data in flights_data:
-            try:
-                start_node = graph.get_node(flight_data['start_node_id'])
-                end_node = graph.get_node(flight_data['end_node_id'])
+        if _wants_ndjson():
+            scheduler, schedules = _execute_schedule(strategy, flights, adcode=data.get('adcode'))
+            return _stream_schedule(strategy, scheduler, schedules, epoch=_epoch_times(data))
 
-                if not start_node or not end_node:
-                    print(f"[API] 未找到节点: {flight_data.get('start_node_id')} 或 {flight_data.get('end_node_id')}")
-                    continue
+        response = jsonify(_run_schedule(strategy, flights, adcode=data.get('adcode'),
+                                         epoch=_epoch_times(data)))
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        return response
 
-                from datetime import datetime
+    except Exception as e:
+        import traceback
+        print(f"[API] 调度错误: {e}")
+        traceback.print_exc()
 
-                flight = Flight(
-                    flight_id=flight_data['flight_id'],
-                    aircraft_type=flight_data.get('aircraft_type', 'A320'),
-                    operation=OperationType.DEPARTURE if flight_data['operation'] == 'departure' else OperationType.ARRIVAL,
-                    start_node=start_node,
-                    end_node=end_node,
-                    scheduled_time=datetime.strptime(flight_data['scheduled_time'], '%Y-%m-%d %H:%M:%S'),
-                    priority=PriorityLevel.HIGH if flight_data.get('priority') == 'high' else
-                            (PriorityLevel.LOW if flight_data.get('priority') == 'low' else PriorityLevel.MEDIUM),
-                    speed=flight_data.get('speed', 15.0)
-                )
-                flights.append(flight)
+        error_response = jsonify({
+            'success': False,
+            'error': str(e),
+            'error_type': type(e).__name__
+        })
+        error_response.headers.add('Access-Control-Allow-Origin', '*')
+        return error_response, 500
+
+
+# ==================== 在线调度会话API ====================
+
+def _cors_preflight(methods):
+    """CORS预检响应"""
+    response = jsonify({'status': 'ok'})
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    response.headers.add('Access-Control-Allow-Headers', 'Content-Type')
+    response.headers.add('Access-Control-Allow-Methods', methods)
+    return response
+
+
+def _json_response(payload, status=200):
+    """带CORS头的JSON响应"""
+    response = jsonify(payload)
+    response.headers.add('Access-Control-Allow-Origin', '*')
+    return response, status
+
+
+def _serialize_delta(delta, epoch=False):
+    """将ScheduleDelta转换为接口返回的字典"""
+    return {
+        'version': delta.version,
+        'updated': [serialize_schedule(flight_id, schedule, epoch)
+                    for flight_id, schedule in delta.updated.items()],
+        'removed': delta.removed,
+        'completed': delta.completed,
+        'pending': delta.pending,
+        'replanned_routes': delta.replanned_routes,
+        'rescheduled': delta.rescheduled,
+        'density_period': delta.density_period,
+        'elapsed_ms': round(delta.elapsed * 1000, 3)
+    }
+
+
+def _get_session(session_id):
+    _purge_idle_sessions()
+    with scheduling_sessions_lock:
+        return scheduling_sessions.get(session_id)
+
+
+def _purge_idle_sessions():
+    """关闭空闲超过 SESSION_IDLE_SECONDS 的会话"""
+    deadline = time.time() - SESSION_IDLE_SECONDS
+    with scheduling_sessions_lock:
+        expired = [session_id for session_id, session in scheduling_sessions.items()
+                   if session.last_active < deadline]
+        for session_id in expired:
+            del scheduling_sessions[session_id]
+    for session_id in expired:
+        print(f"[API] 调度会话 {session_id} 空闲超时，已关闭")
+
+
+def _reap_idle_sessions():
+    # 没有会话请求时也定期清理，空闲会话不会一直占用内存
+    while True:
+        time.sleep(min(SESSION_IDLE_SECONDS, 60.0))
+        _purge_idle_sessions()
+
+
+def _start_session_reaper():
+    """启动会话清理线程（在创建会话时按需启动，后台线程不能跨fork继承）"""
+    global _session_reaper
+    with scheduling_sessions_lock:
+        if _session_reaper is None or not _session_reaper.is_alive():
+            _session_reaper = threading.Thread(target=_reap_idle_sessions, name='session-reaper', daemon=True)
+            _session_reaper.start()
+
+
+def _sessions_full_response():
+    response, status = _json_response({
+        'success': False,
+        'error': f'调度会话数已达上限 ({MAX_SESSIONS})，请关闭不再使用的会话后重试'
+    }, 503)
+    response.headers['Retry-After'] = '60'
+    return response, status
+
+
+@app.route('/api/sessions', methods=['POST', 'OPTIONS'])
+def create_scheduling_session():
+    """
+    创建在线调度会话
+    POST数据格式:
+    {
+        "strategy": "fcfs" | "priority" | "time_window",
+        "horizon_minutes": 120,        # 可选，滚动时域长度
+        "retention_minutes": 10,       # 可选，滑行结束后保留占用的时间
+        "now": "2024-01-20 14:00:00",  # 可选，会话初始时刻
+        "flights": [...]               # 可选，初始航班，格式同多航班调度接口
+    }
+
+    会话空闲 SESSION_IDLE_SECONDS 秒后自动关闭；会话数达到 MAX_SESSIONS 时返回503。
+    """
+    if request.method == 'OPTIONS':
+        return _cors_preflight('POST, OPTIONS')
+
+    _purge_idle_sessions()
+    with scheduling_sessions_lock:
+        full = len(scheduling_sessions) >= MAX_SESSIONS
+    if full:
+        return _sessions_full_response()
+
+    try:
+        from datetime import datetime
+
+        data = request.get_json(force=True, silent=True) or {}
+        now = data.get('now')
+        session = SchedulingSession(
+            graph,
+            strategy=data.get('strategy', 'fcfs'),
+            horizon_minutes=data.get('horizon_minutes', 120),
+            retention_minutes=data.get('retention_minutes', 10),
+            now=datetime.strptime(now, '%Y-%m-%d %H:%M:%S') if now else None
+        )
+
+        flights = []
+        for flight_data in data.get('flights', []):
+            try:
+                flight = _parse_flight(flight_data)
+                if flight is not None:
+                    flights.append(flight)
             except Exception as e:
                 print(f"[API] 处理航班数据时出错: {e}")
-                continue
 
-        if not flights:
-            error_response = jsonify({
-                'success': False,
-                'error': '没有有效的航班数据'
-            })
-            error_response.headers.add('Access-Control-Allow-Origin', '*')
-            return error_response, 400
+        delta = session.add_flights(flights)
 
-        print(f"[API] 开始调度 {len(flights)} 个航班...")
+        session_id = uuid.uuid4().hex
+        with scheduling_sessions_lock:
+            # 构建期间其他请求可能已创建会话，插入时再次检查上限
+            full = len(scheduling_sessions) >= MAX_SESSIONS
+            if not full:
+                scheduling_sessions[session_id] = session
+        if full:
+            return _sessions_full_response()
+        _start_session_reaper()
 
-        # 创建调度器并执行调度
-        scheduler = MultiAircraftScheduler(graph, strategy=strategy)
-        schedules = scheduler.schedule_multiple_flights(flights)
+        print(f"[API] 创建调度会话 {session_id}: {len(flights)} 个初始航班")
+        return _json_response({
+            'success': True,
+            'session_id': session_id,
+            'strategy': session.scheduler.strategy,
+            'delta': _serialize_delta(delta, _epoch_times(data))
+        })
 
-        # 构建返回数据
-        schedules_data = []
-        for flight_id, schedule in schedules.items():
+    except Exception as e:
+        import traceback
+        print(f"[API] 创建调度会话错误: {e}")
+        traceback.print_exc()
+        return _json_response({'success': False, 'error': str(e), 'error_type': type(e).__name__}, 500)
+
+
+@app.route('/api/sessions/<session_id>', methods=['GET', 'DELETE', 'OPTIONS'])
+def scheduling_session_state(session_id):
+    """获取会话内全部航班的当前调度（GET），或关闭会话（DELETE）"""
+    if request.method == 'OPTIONS':
+        return _cors_preflight('GET, DELETE, OPTIONS')
+
+    if request.method == 'DELETE':
+        with scheduling_sessions_lock:
+            session = scheduling_sessions.pop(session_id, None)
+        if session is None:
+            return _json_response({'success': False, 'error': f'会话不存在: {session_id}'}, 404)
+        return _json_response({'success': True, 'session_id': session_id})
+
+    session = _get_session(session_id)
+    if session is None:
+        return _json_response({'success': False, 'error': f'会话不存在: {session_id}'}, 404)
+
+    schedules = session.snapshot()
+    epoch = _epoch_times()
+    return _json_response({
+        'success': True,
+        'session_id': session_id,
+        'version': session.version,
+        'now': serialize_time(session.now, epoch),
+        'flight_count': len(schedules),
+        'pending': list(session.pending),
+        'schedules': [serialize_schedule(flight_id, schedule, epoch) for flight_id, schedule in schedules.items()]
+    })
+
+
+@app.route('/api/sessions/<session_id>/events', methods=['POST', 'OPTIONS'])
+def scheduling_session_events(session_id):
+    """
+    向会话提交事件，按顺序处理并返回合并后的增量（连续的新增事件合并为一次批量新增）
+    POST数据格式:
+    {
+        "now": "2024-01-20 14:15:00",   # 可选，先推进会话时钟
+        "events": [
+            {"type": "add", "flight": {...}},
+            {"type": "update", "flight": {...}},
+            {"type": "cancel", "flight_id": "CA1234"}
+        ]
+    }
+    """
+    if request.method == 'OPTIONS':
+        return _cors_preflight('POST, OPTIONS')
+
+    session = _get_session(session_id)
+    if session is None:
+        return _json_response({'success': False, 'error': f'会话不存在: {session_id}'}, 404)
+
+    try:
+        from datetime import datetime
+
+        data = request.get_json(force=True, silent=True) or {}
+        delta = None
+        errors = []
+
+        def merge(step):
+            nonlocal delta
+            if delta is None:
+                delta = step
+            else:
+                delta.merge(step)
+
+        if data.get('now'):
             try:
-                # 构建路径数据
-                path_data = []
-                for node in schedule.path:
-                    path_data.append({
-                        'id': node.id,
-                        'type': node.node_type,
-                        'x': node.x,
-                        'y': node.y
-                    })
-
-                # 构建时间点数据
-                waypoints_data = []
-                for node, time in schedule.waypoints:
-                    waypoints_data.append({
-                        'node_id': node.id,
-                        'x': node.x,
-                        'y': node.y,
-                        'time': time.strftime('%Y-%m-%d %H:%M:%S')
-                    })
-
-                # 构建冲突数据
-                conflicts_data = []
-                for conflict in schedule.conflicts:
-                    conflicts_data.append({
-                        'conflict_id': conflict.conflict_id,
-                        'conflict_type': conflict.conflict_type,
-                        'flight_ids': conflict.flight_ids,
-                        'node_id': conflict.node_id,
-                        'time': conflict.time.strftime('%Y-%m-%d %H:%M:%S'),
-                        'severity': conflict.severity
-                    })
-
-                schedules_data.append({
-                    'flight_id': flight_id,
-                    'aircraft_type': schedule.flight.aircraft_type,
-                    'operation': schedule.flight.operation.value,
-                    'start_node_id': schedule.flight.start_node.id,
-                    'end_node_id': schedule.flight.end_node.id,
-                    'scheduled_time': schedule.flight.scheduled_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'start_time': schedule.start_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'end_time': schedule.end_time.strftime('%Y-%m-%d %H:%M:%S'),
-                    'path': path_data,
-                    'waypoints': waypoints_data,
-                    'total_distance': schedule.total_distance,
-                    'total_time': schedule.total_time,
-                    'delay': schedule.delay.total_seconds(),
-                    'conflicts': conflicts_data,
-                    'conflict_count': len(conflicts_data),
-                    'weights': schedule.weights  # 动态权重配置
-                })
+                merge(session.advance(datetime.strptime(data['now'], '%Y-%m-%d %H:%M:%S')))
+            except ValueError as e:
+                return _json_response({'success': False, 'error': str(e)}, 400)
+
+        def record_error(index, event_type, e):
+            print(f"[API] 处理会话事件 #{index} 出错: {e}")
+            message = e.args[0] if isinstance(e, KeyError) and e.args else str(e)
+            errors.append({'index': index, 'type': event_type, 'error': message})
+
+        # 连续的新增事件暂存，遇到其他事件或结束时一次性新增（只重排、重建密度一次）
+        pending_adds = []
+
+        def flush_adds():
+            if not pending_adds:
+                return
+            try:
+                merge(session.add_flights([flight for _, flight in pending_adds]))
             except Exception as e:
-                print(f"[API] 处理调度结果时出错: {e}")
-                continue
+                for index, _ in pending_adds:
+                    record_error(index, 'add', e)
+            pending_adds.clear()
+
+        for index, event in enumerate(data.get('events', [])):
+            event_type = event.get('type')
+            try:
+                if event_type in ('add', 'update'):
+                    flight = _parse_flight(event['flight'])
+                    if flight is None:
+                        raise ValueError('起点或终点节点不存在')
+                    if event_type == 'add':
+                        pending_adds.append((index, flight))
+                        continue
+                    flush_adds()
+                    merge(session.update_flight(flight))
+                elif event_type == 'cancel':
+                    flush_adds()
+                    merge(session.cancel_flight(event['flight_id']))
+                else:
+                    raise ValueError(f'未知事件类型: {event_type}')
+            except Exception as e:
+                record_error(index, event_type, e)
+        flush_adds()
+        errors.sort(key=lambda error: error['index'])
+
+        return _json_response({
+            'success': not errors,
+            'session_id': session_id,
+            'version': session.version,
+            'delta': _serialize_delta(delta, _epoch_times(data)) if delta else None,
+            'errors': errors
+        })
 
-        # 计算总体统计
-        total_distance = sum(s.total_distance for s in schedules.values())
-        total_time = sum(s.total_time for s in schedules.values())
-        total_delay = sum(s.delay.total_seconds() for s in schedules.values())
-        total_conflicts = sum(len(s.conflicts) for s in schedules.values())
+    except Exception as e:
+        import traceback
+        print(f"[API] 会话事件错误: {e}")
+        traceback.print_exc()
+        return _json_response({'success': False, 'error': str(e), 'error_type': type(e).__name__}, 500)
 
-        response_data = {
-            'success': True,
-            'strategy': strategy,
-            'flight_count': len(schedules),
-            'total_distance': total_distance,
-            'total_time': total_time,
-            'total_delay': total_delay,
-            'total_conflicts': total_conflicts,
-            'schedules': schedules_data
-        }
 
-        print(f"[API] 调度完成: {len(schedules)} 个航班, {total_conflicts} 个冲突")
+# ==================== 后台调度任务API ====================
 
-        response = jsonify(response_data)
-        response.headers.add('Access-Control-Allow-Origin', '*')
-        return response
+def _schedule_job(strategy, flights, adcode=None, epoch=False):
+    """构建多航班调度任务函数：调度器的进度事件转发为任务事件并汇总到任务进度"""
+    phases = {
+        'routes_planning': 'routing',
+        'routes_planned': 'merging',
+        'conflict_round': 'resolving',
+        'scheduled': 'done'
+    }
+
+    def run(job):
+        job.emit('accepted', {'strategy': strategy, 'flight_count': len(flights)},
+                 progress={'phase': 'pending', 'flights_total': len(flights), 'flights_planned': 0})
+
+        def on_progress(event, data):
+            progress = {}
+            if event in phases:
+                progress['phase'] = phases[event]
+            if event == 'route_searched':
+                progress.update(routes_searched=data['done'], routes_to_search=data['total'])
+            elif event == 'flight_planned':
+                progress['flights_planned'] = data['index']
+            elif event == 'conflict_round':
+                progress.update(conflict_round=data['round'], conflicts=data['conflicts'])
+            job.emit(event, data, progress=progress)
+
+        result = _run_schedule(strategy, flights, adcode=adcode, progress_callback=on_progress, epoch=epoch)
+        job.emit('result', {key: value for key, value in result.items() if key != 'schedules'})
+        return result
+
+    return run
+
+
+@app.route('/api/jobs/schedule', methods=['POST', 'OPTIONS'])
+def submit_schedule_job():
+    """
+    提交后台多航班调度任务，立即返回任务ID
+    POST数据格式同 /api/multi-aircraft/schedule
+    """
+    if request.method == 'OPTIONS':
+        return _cors_preflight('POST, OPTIONS')
+
+    try:
+        data = request.get_json(force=True, silent=True) or {}
+        try:
+            strategy, flights = _parse_schedule_request(data)
+        except ValueError as e:
+            return _json_response({'success': False, 'error': str(e)}, 400)
+
+        try:
+            job = job_queue.submit('schedule', _schedule_job(strategy, flights, data.get('adcode'),
+                                                             epoch=_epoch_times(data)))
+        except QueueFullError as e:
+            response, status = _json_response({'success': False, 'error': str(e)}, 503)
+            response.headers['Retry-After'] = '10'
+            return response, status
+
+        print(f"[API] 提交调度任务 {job.job_id}: {len(flights)} 个航班")
+        return _json_response({
+            'success': True,
+            'job_id': job.job_id,
+            'status': job.status,
+            'status_url': f'/api/jobs/{job.job_id}',
+            'events_url': f'/api/jobs/{job.job_id}/events'
+        }, 202)
 
     except Exception as e:
         import traceback
-        print(f"[API] 调度错误: {e}")
+        print(f"[API] 提交调度任务错误: {e}")
         traceback.print_exc()
+        return _json_response({'success': False, 'error': str(e), 'error_type': type(e).__name__}, 500)
 
-        error_response = jsonify({
+
+@app.route('/api/jobs/<job_id>', methods=['GET', 'DELETE', 'OPTIONS'])
+def schedule_job_state(job_id):
+    """查询任务状态与进度，成功结束后附带调度结果（GET）；取消任务（DELETE）"""
+    if request.method == 'OPTIONS':
+        return _cors_preflight('GET, DELETE, OPTIONS')
+
+    job = job_queue.cancel(job_id) if request.method == 'DELETE' else job_queue.get(job_id)
+    if job is None:
+        return _json_response({'success': False, 'error': f'任务不存在: {job_id}'}, 404)
+
+    payload = {'success': True, **job.summary()}
+    if request.method == 'GET' and job.status == SUCCEEDED:
+        payload['result'] = job.result
+    return _json_response(payload)
+
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def schedule_job_events(job_id):
+    """
+    任务进度事件流（Server-Sent Events）
+
+    每个事件为 `id: 序号` / `event: 类型` / `data: JSON`；断线重连时浏览器自动携带
+    Last-Event-ID，也可用 ?after=序号 指定，从该序号之后续传。任务结束后关闭连接。
+    同时打开的事件流达到 JOB_MAX_STREAMS 时返回503，客户端应改为轮询 /api/jobs/<job_id>。
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        return _json_response({'success': False, 'error': f'任务不存在: {job_id}'}, 404)
+
+    if not _job_streams.acquire(blocking=False):
+        response, status = _json_response({
             'success': False,
-            'error': str(e),
-            'error_type': type(e).__name__
-        })
-        error_response.headers.add('Access-Control-Allow-Origin', '*')
-        return error_response, 500
+            'error': f'事件流连接数已达上限 ({JOB_MAX_STREAMS})，请改为轮询任务状态',
+            'status_url': f'/api/jobs/{job_id}'
+        }, 503)
+        response.headers['Retry-After'] = '5'
+        return response, status
+
+    try:
+        after = int(request.headers.get('Last-Event-ID') or request.args.get('after', 0))
+    except ValueError:
+        after = 0
+    dumps = app.json.dumps
+
+    def stream():
+        seq = after
+        while True:
+            events, finished = job.events_after(seq, timeout=JOB_EVENTS_KEEPALIVE)
+            for event in events:
+                seq = event.seq
+                yield f"id: {event.seq}\nevent: {event.event}\ndata: {dumps(event.data)}\n\n"
+            if finished and not events:
+                return
+            if not events:
+                yield ": keep-alive\n\n"
+
+    # 连接关闭时（含客户端断开、流尚未开始迭代）归还名额
+    released = threading.Event()
+
+    def release_stream():
+        if not released.is_set():
+            released.set()
+            _job_streams.release()
+
+    try:
+        response = Response(stream(), mimetype='text/event-stream')
+    except Exception:
+        release_stream()
+        raise
+    response.call_on_close(release_stream)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
 
 
 @app.route('/api/multi-aircraft/generate-simulation', methods=['POST', 'OPTIONS'])
@@ -739,9 +1571,6 @@ def generate_simulation():
         return response
 
     try:
-        if graph is None:
-            initialize_system()
-
         data = request.get_json(force=True, silent=True)
         if data is None:
             data = {}
@@ -768,7 +1597,7 @@ def generate_simulation():
                     'start_node_type': flight.start_node.node_type,
                     'end_node_id': flight.end_node.id,
                     'end_node_type': flight.end_node.node_type,
-                    'scheduled_time': flight.scheduled_time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'scheduled_time': format_time(flight.scheduled_time),
                     'priority': flight.priority.name.lower(),
                     'speed': flight.speed,
                     'start_position': {
@@ -813,6 +1642,39 @@ def generate_simulation():
 
 # ==================== 航班密度分析API ====================
 
+def _parse_scheduled_epoch_times(flights_data):
+    """
+    批量解析航班计划时间为epoch秒数组
+
+    格式与其他接口一致（'%Y-%m-%d %H:%M:%S'），先逐条校验格式，再用numpy整体解析。
+
+    异常:
+        ValueError: 存在缺失或格式错误的计划时间（不跳过，保证 flight_count 与输入一致）
+    """
+    import re
+    import numpy as np
+    from datetime import datetime
+
+    pattern = re.compile(r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}')
+    time_strings = [flight_data.get('scheduled_time') if isinstance(flight_data, dict) else None
+                    for flight_data in flights_data]
+    invalid = [index for index, value in enumerate(time_strings)
+               if not isinstance(value, str) or not pattern.fullmatch(value)]
+    if not invalid:
+        try:
+            return np.array(time_strings, dtype='datetime64[s]').astype(np.int64).astype(np.float64)
+        except ValueError:
+            # 格式正确但日期不存在（如2月30日），逐条定位
+            for index, value in enumerate(time_strings):
+                try:
+                    datetime.strptime(value, '%Y-%m-%d %H:%M:%S')
+                except ValueError:
+                    invalid.append(index)
+    index = invalid[0]
+    raise ValueError(f'{len(invalid)} 个航班的计划时间无效（格式应为 YYYY-MM-DD HH:MM:SS），'
+                     f'第 {index + 1} 个为 {time_strings[index]!r}')
+
+
 @app.route('/api/density/analyze', methods=['POST', 'OPTIONS'])
 def analyze_density():
     """
@@ -821,7 +1683,8 @@ def analyze_density():
     {
         "flights": [...],  # 航班列表，格式同多航班调度接口
         "time_window_minutes": 30,  # 可选，时间窗口大小（分钟）
-        "peak_threshold": 0.6       # 可选，高峰期阈值（0-1）
+        "peak_threshold": 0.6,      # 可选，高峰期阈值（0-1）
+        "window_sizes": [5, 15, 30, 60]  # 可选，多分辨率分析的窗口尺寸（分钟）
     }
     """
     # 处理OPTIONS请求（CORS预检）
@@ -849,58 +1712,70 @@ def analyze_density():
             error_response.headers.add('Access-Control-Allow-Origin', '*')
             return error_response, 400
 
-        # 创建DensityAnalyzer实例
-        analyzer = DensityAnalyzer(
-            time_window_minutes=time_window_minutes,
-            peak_threshold=peak_threshold
-        )
-
-        # 构建Flight对象列表
-        flights = []
-        for flight_data in flights_data:
-            try:
-                # 解析计划时间
-                from datetime import datetime
-                scheduled_time = datetime.strptime(flight_data['scheduled_time'], '%Y-%m-%d %H:%M:%S')
-
-                # 创建Flight对象（简化版，只需要时间信息）
-                flight = Flight(
-                    flight_id=flight_data['flight_id'],
-                    aircraft_type=flight_data.get('aircraft_type', 'A320'),
-                    operation=OperationType.DEPARTURE if flight_data['operation'] == 'departure' else OperationType.ARRIVAL,
-                    start_node=None,  # 不需要具体节点
-                    end_node=None,
-                    scheduled_time=scheduled_time,
-                    priority=PriorityLevel.MEDIUM
-                )
-                flights.append(flight)
-            except Exception as e:
-                print(f"[API] 处理航班 {flight_data.get('flight_id')} 时出错: {e}")
-                continue
-
-        # 执行密度分析
-        analysis = analyzer.analyze_density(flights)
+        window_sizes = data.get('window_sizes') or []
+        try:
+            if not isinstance(window_sizes, list):
+                raise ValueError('window_sizes 必须为数组')
+            validate_window_sizes([time_window_minutes] + [w for w in window_sizes if w != time_window_minutes])
+
+            # 创建DensityAnalyzer实例
+            analyzer = DensityAnalyzer(
+                time_window_minutes=time_window_minutes,
+                peak_threshold=peak_threshold
+            )
+
+            # 一次性解析所有航班的计划时间（epoch秒），无需构造Flight对象，
+            # 全年规模的历史航班也能快速完成分析
+            epoch_times = _parse_scheduled_epoch_times(flights_data)
+
+            analysis = analyzer.analyze_epoch_times(
+                epoch_times, [time_window_minutes] + [w for w in window_sizes if w != time_window_minutes]
+            )
+        except ValueError as e:
+            error_response = jsonify({
+                'success': False,
+                'error': str(e)
+            })
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 400
+        histogram = analysis['resolutions'][time_window_minutes]
 
         # 转换结果为可序列化格式
+        edge_strings = format_times(histogram['window_edges'])
+        time_windows = list(zip(edge_strings[:-1], edge_strings[1:]))
+        period_codes = histogram['period_codes'].tolist()
+
         serializable_analysis = {
-            'time_windows': [(start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S'))
-                            for start, end in analysis['time_windows']],
-            'densities': analysis['densities'],
-            'average_density': analysis['average_density'],
-            'peak_windows': [(start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S'))
-                           for start, end in analysis['peak_windows']],
-            'off_peak_windows': [(start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S'))
-                               for start, end in analysis['off_peak_windows']],
-            'normal_windows': [(start.strftime('%Y-%m-%d %H:%M:%S'), end.strftime('%Y-%m-%d %H:%M:%S'))
-                             for start, end in analysis['normal_windows']],
+            'time_windows': time_windows,
+            'densities': histogram['densities'].tolist(),
+            'average_density': histogram['average_density'],
+            'peak_windows': [w for w, code in zip(time_windows, period_codes) if code == 2],
+            'off_peak_windows': [w for w, code in zip(time_windows, period_codes) if code == 0],
+            'normal_windows': [w for w, code in zip(time_windows, period_codes) if code == 1],
             'flight_count': analysis['flight_count'],
             'time_range': {
-                'start': analysis['time_range']['start'].strftime('%Y-%m-%d %H:%M:%S'),
-                'end': analysis['time_range']['end'].strftime('%Y-%m-%d %H:%M:%S'),
-                'duration_hours': analysis['time_range']['duration_hours']
+                'start': format_time(analysis['start']) if analysis['start'] else None,
+                'end': format_time(analysis['end']) if analysis['end'] else None,
+                'duration_hours': (analysis['end'] - analysis['start']).total_seconds() / 3600
+                                  if analysis['start'] else 0
             }
         }
 
+        # 多分辨率结果（可选）：紧凑的数组格式
+        if window_sizes:
+            serializable_analysis['resolutions'] = {
+                str(size): {
+                    'window_minutes': size,
+                    'window_start': serializable_analysis['time_range']['start'],
+                    'counts': analysis['resolutions'][size]['counts'].tolist(),
+                    'densities': analysis['resolutions'][size]['densities'].tolist(),
+                    'period_codes': analysis['resolutions'][size]['period_codes'].tolist(),
+                    'average_density': analysis['resolutions'][size]['average_density']
+                }
+                for size in window_sizes
+            }
+            serializable_analysis['period_labels'] = list(DensityTimeline.PERIOD_LABELS)
+
         response_data = {
             'success': True,
             'analysis': serializable_analysis,
@@ -964,6 +1839,16 @@ def get_current_weights():
             error_response.headers.add('Access-Control-Allow-Origin', '*')
             return error_response, 400
 
+        try:
+            validate_window_sizes([time_window_minutes])
+        except ValueError as e:
+            error_response = jsonify({
+                'success': False,
+                'error': str(e)
+            })
+            error_response.headers.add('Access-Control-Allow-Origin', '*')
+            return error_response, 400
+
         # 创建DensityAnalyzer实例
         analyzer = DensityAnalyzer(
             time_window_minutes=time_window_minutes,
@@ -1006,7 +1891,7 @@ def get_current_weights():
             'period_type': weight_info['period_type'],
             'weights': weight_info['weights'],
             'description': weight_info['description'],
-            'current_time': weight_info['current_time'].strftime('%Y-%m-%d %H:%M:%S')
+            'current_time': format_time(weight_info['current_time'])
         }
 
         response_data = {
@@ -1038,7 +1923,10 @@ def get_current_weights():
 def get_current_weather():
     """
     获取当前实时天气
-    
+
+    查询参数:
+        adcode: 城市编码（可选），默认为西安
+
     返回:
         {
             "success": true,
@@ -1057,15 +1945,17 @@ def get_current_weather():
     """
     try:
         if weather_service is None:
-            initialize_system()
-        
-        weather = weather_service.get_current_weather()
+            initialize_weather_service()
         
+        weather = weather_service.get_current_weather(adcode=request.args.get('adcode'))
+
         return jsonify({
             'success': True,
             'weather': weather.to_dict()
         })
-        
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         import traceback
         print(f"[API] 天气获取错误: {e}")
@@ -1078,6 +1968,80 @@ def get_current_weather():
         }), 500
 
 
+@app.route('/api/weather/forecast', methods=['GET'])
+def get_weather_forecast():
+    """
+    获取逐小时天气折扣系数时间轴
+
+    查询参数:
+        adcode: 城市编码（可选），默认为西安
+        hours: 时间轴长度（小时），默认24，最大96
+
+    近期时刻使用实况天气，更远的时刻使用预报；只读取缓存，不阻塞在天气API上
+    """
+    try:
+        from datetime import timedelta
+
+        if weather_service is None:
+            initialize_weather_service()
+
+        adcode = request.args.get('adcode')
+        hours = min(max(request.args.get('hours', 24, type=int), 1), 96)
+        snapshot = weather_service.snapshot(adcode=adcode)
+        start = snapshot.taken_at.replace(minute=0, second=0, microsecond=0)
+
+        timeline = []
+        for hour in range(hours + 1):
+            when = start + timedelta(hours=hour)
+            bucket = snapshot.bucket_at(when)
+            timeline.append({
+                'time': format_time(when),
+                'weather': snapshot.weather_at(when),
+                'weather_factor': snapshot.factor_at(when),
+                'source': 'forecast' if bucket else 'live'
+            })
+
+        return jsonify({
+            'success': True,
+            'adcode': adcode or weather_service.city_adcode,
+            'current': snapshot.current.to_dict(),
+            'timeline': timeline
+        })
+
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
+@app.route('/api/weather/status', methods=['GET'])
+def get_weather_status():
+    """
+    获取天气服务运行状态
+
+    返回熔断器状态（closed/open/half_open）、连续失败次数、缓存新鲜度及后台刷新情况
+    """
+    try:
+        if weather_service is None:
+            initialize_weather_service()
+
+        return jsonify({
+            'success': True,
+            'status': weather_service.get_status()
+        })
+
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+
 @app.route('/api/weather/factor-map', methods=['GET'])
 def get_weather_factor_map():
     """
@@ -1134,10 +2098,15 @@ if __name__ == '__main__':
     print("="*70)
     print("\\n服务地址: http://localhost:5001")
     print("API文档: http://localhost:5001/")
-    print("\\n正在初始化系统...")
-    initialize_system()
+    print("就绪探针: http://localhost:5001/api/readyz")
     print("\\n" + "="*70)
-    print("服务启动中...")
+    print("服务启动中（后台预热路网与缓存）...")
     print("="*70 + "\\n")
 
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    debug = True
+    # 调试模式的重载监控进程不处理请求，只在实际服务的进程中预热
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_warm_up()
+
+    # 路径查询使用每个请求各自的RoutingConfig，可多线程处理请求
+    app.run(host='0.0.0.0', port=5001, debug=debug, threaded=True)
@@ -0,0 +1,120 @@
+"""
+路网数据响应缓存
+=====================================
+
+/api/nodes 返回整个路网（全部节点及其属性、全部边），是最大的响应，
+而其内容只在路网重新加载时才会变化。本模块在每个路网图上只序列化一次：
+
+- 预先生成原始JSON及 gzip / brotli（可选依赖）压缩版本
+- ETag 取内容摘要，每种压缩格式是不同的表示，各有自己的ETag（如 "<摘要>-gzip"）；
+  客户端携带 If-None-Match 且与将要返回的表示的ETag一致时返回 304，不再传输正文
+- 按 Accept-Encoding 协商压缩格式，并设置 Vary: Accept-Encoding
+
+缓存挂在路网图对象上，重新加载路网（新的图对象）即得到新的版本。
+"""
+
+import gzip
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from flask import Request, Response
+
+try:
+    import brotli
+except ImportError:  # brotli为可选依赖，缺失时只提供gzip
+    brotli = None
+
+_build_lock = threading.Lock()
+
+
+class CachedPayload:
+    """预序列化、预压缩的响应正文"""
+
+    def __init__(self, body: bytes, mimetype: str = 'application/json'):
+        """
+        参数:
+            body: 未压缩的响应正文
+            mimetype: 内容类型
+        """
+        self.mimetype = mimetype
+        self.variants: Dict[str, bytes] = {
+            'identity': body,
+            'gzip': gzip.compress(body, compresslevel=6)
+        }
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(body, quality=9)
+        digest = hashlib.sha1(body).hexdigest()
+        # 不同压缩格式的字节不同，使用各自的强ETag，缓存不会用一种编码的验证结果返回另一种编码的正文
+        self.etags: Dict[str, str] = {
+            encoding: f'"{digest}"' if encoding == 'identity' else f'"{digest}-{encoding}"'
+            for encoding in self.variants
+        }
+
+    @classmethod
+    def from_json(cls, payload: Any, dumps: Callable[[Any], str]) -> 'CachedPayload':
+        """由可JSON序列化的对象构建"""
+        return cls(dumps(payload).encode('utf-8'))
+
+    def sizes(self) -> Dict[str, int]:
+        """各编码的正文字节数"""
+        return {encoding: len(body) for encoding, body in self.variants.items()}
+
+    def choose_encoding(self, accept_encoding: str) -> str:
+        """按 Accept-Encoding 选择压缩格式（br 优先于 gzip）"""
+        accepted = set()
+        for item in accept_encoding.split(','):
+            name, _, params = item.partition(';')
+            params = params.replace(' ', '')
+            try:
+                quality = float(params[2:]) if params.startswith('q=') else 1.0
+            except ValueError:
+                quality = 1.0
+            if quality > 0:
+                accepted.add(name.strip().lower())
+        for encoding in ('br', 'gzip'):
+            if encoding in self.variants and (encoding in accepted or '*' in accepted):
+                return encoding
+        return 'identity'
+
+    def response(self, request: Request) -> Response:
+        """构建响应：If-None-Match 与协商出的表示的ETag一致时返回304，否则返回该表示的正文"""
+        encoding = self.choose_encoding(request.headers.get('Accept-Encoding', ''))
+        etag = self.etags[encoding]
+        if_none_match = request.headers.get('If-None-Match', '')
+        if etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*':
+            response = Response(status=304)
+        else:
+            response = Response(self.variants[encoding], mimetype=self.mimetype)
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        response.headers['ETag'] = etag
+        response.headers['Vary'] = 'Accept-Encoding'
+        # 允许缓存，但每次使用前须向服务端验证ETag
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Expose-Headers'] = 'ETag'
+        return response
+
+
+def get_cached_payload(graph: Any, name: str,
+                       build: Callable[[], CachedPayload]) -> CachedPayload:
+    """
+    获取挂在路网图上的缓存响应（每个图、每个名称只构建一次）
+
+    参数:
+        graph: 路网图
+        name: 响应名称（如 'nodes'）
+        build: 缓存缺失时的构建函数
+    """
+    cache: Optional[Dict[str, CachedPayload]] = getattr(graph, '_payload_cache', None)
+    if cache is not None and name in cache:
+        return cache[name]
+    with _build_lock:
+        cache = getattr(graph, '_payload_cache', None)
+        if cache is None:
+            cache = {}
+            graph._payload_cache = cache
+        if name not in cache:
+            cache[name] = build()
+        return cache[name]
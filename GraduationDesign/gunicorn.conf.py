@@ -0,0 +1,40 @@
+"""
+gunicorn配置：预加载路网的多进程 + 多线程服务
+
+    gunicorn -c gunicorn.conf.py
+
+环境变量:
+    API_BIND     监听地址，默认 0.0.0.0:5001
+    API_WORKERS  工作进程数，默认 1
+    API_THREADS  每个工作进程的线程数，默认 4
+
+注意：在线调度会话（/api/sessions）与后台调度任务（/api/jobs）保存在工作进程内存中，
+后续请求必须落到同一进程，因此默认只启动一个工作进程，通过 API_THREADS 扩展并发；
+只使用无状态接口（路径查询、同步调度等）时才可增加 API_WORKERS。每个任务事件流（SSE）
+连接在推送期间占用一个线程，同时打开的事件流不超过 JOB_MAX_STREAMS（默认 API_THREADS 的一半），
+超出时返回503。
+"""
+
+import gc
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.getenv('API_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('API_WORKERS', '1'))
+worker_class = 'gthread'
+threads = int(os.getenv('API_THREADS', '4'))
+timeout = 120
+
+# 主进程导入wsgi模块时加载路网，工作进程fork后共享
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # 冻结主进程中已加载的对象，避免工作进程中的垃圾回收触碰这些对象而产生写时复制
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    # 天气服务的后台刷新线程不能跨fork继承，在每个工作进程中启动
+    from api import initialize_weather_service
+    initialize_weather_service()
@@ -0,0 +1,259 @@
+"""
+后台任务队列
+=====================================
+
+数百个航班的多航班调度需要数十秒甚至更久。同步接口在整个运行期间占用一个HTTP连接
+和服务线程，客户端在结束前也得不到任何反馈。本模块把这类请求放到有界的后台线程池中执行：
+
+- 提交后立即返回任务ID，任务在 max_workers 个后台线程中排队执行，
+  不占用处理交互式请求（单次路径查询等）的服务线程
+- 排队任务数超过 max_pending 时拒绝提交（QueueFullError），避免积压无限增长
+- 任务执行过程中通过 Job.emit 发布进度事件，事件带递增序号，
+  客户端可轮询状态或按序号续传事件流（SSE）
+- 取消为协作式：排队中的任务直接取消，运行中的任务在下一次发布事件时终止
+- 结束的任务保留 retention_seconds 秒后清理：查询时顺带清理，后台清理线程另行定期清理，
+  服务空闲时结果也不会一直占用内存
+
+任务保存在进程内存中，多进程部署时查询请求必须落到提交任务的同一进程。
+"""
+
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+# 任务状态
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (SUCCEEDED, FAILED, CANCELLED)
+
+# 每个任务保留的最近事件数（超出后丢弃最早的事件，状态中的进度不受影响）
+MAX_EVENTS = 5000
+
+
+class QueueFullError(Exception):
+    """排队任务数已达上限"""
+
+
+class JobCancelled(Exception):
+    """任务已被取消（在任务线程内发布事件时抛出）"""
+
+
+@dataclass
+class JobEvent:
+    """任务进度事件"""
+    seq: int
+    event: str
+    data: Dict[str, Any]
+    time: float
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'seq': self.seq, 'event': self.event, 'data': self.data, 'time': self.time}
+
+
+@dataclass
+class Job:
+    """后台任务"""
+    job_id: str
+    kind: str
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    progress: Dict[str, Any] = field(default_factory=dict)
+    result: Any = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    events: Deque[JobEvent] = field(default_factory=lambda: deque(maxlen=MAX_EVENTS))
+    _next_seq: int = 1
+    _condition: threading.Condition = field(default_factory=threading.Condition, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def emit(self, event: str, data: Optional[Dict[str, Any]] = None,
+             progress: Optional[Dict[str, Any]] = None) -> None:
+        """
+        发布进度事件（在任务线程内调用）
+
+        参数:
+            event: 事件类型
+            data: 事件数据
+            progress: 需要合并到任务进度中的字段
+
+        异常:
+            JobCancelled: 任务已被请求取消
+        """
+        if self.cancel_requested:
+            raise JobCancelled()
+        self._publish(event, data or {}, progress)
+
+    def _publish(self, event: str, data: Dict[str, Any],
+                 progress: Optional[Dict[str, Any]] = None) -> None:
+        with self._condition:
+            if progress:
+                self.progress.update(progress)
+            self.events.append(JobEvent(self._next_seq, event, data, time.time()))
+            self._next_seq += 1
+            self._condition.notify_all()
+
+    def _set_status(self, status: str, event_data: Optional[Dict[str, Any]] = None) -> None:
+        with self._condition:
+            self.status = status
+            if status == RUNNING:
+                self.started_at = time.time()
+            elif status in FINISHED_STATES:
+                self.finished_at = time.time()
+        self._publish(status, event_data or {})
+
+    def events_after(self, seq: int, timeout: Optional[float] = None) -> Tuple[List[JobEvent], bool]:
+        """
+        获取序号大于seq的事件；没有新事件且任务未结束时最多等待timeout秒
+
+        返回:
+            (事件列表, 任务是否已结束)
+        """
+        with self._condition:
+            if timeout and not self.finished and (not self.events or self.events[-1].seq <= seq):
+                self._condition.wait(timeout)
+            events = [event for event in self.events if event.seq > seq]
+            return events, self.finished
+
+    def summary(self) -> Dict[str, Any]:
+        """任务状态（不含结果）"""
+        with self._condition:
+            return {
+                'job_id': self.job_id,
+                'kind': self.kind,
+                'status': self.status,
+                'created_at': self.created_at,
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                'elapsed': ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0,
+                'progress': dict(self.progress),
+                'last_event_seq': self._next_seq - 1,
+                'error': self.error
+            }
+
+
+class JobQueue:
+    """有界后台任务队列"""
+
+    def __init__(self, max_workers: int = 2, max_pending: int = 16,
+                 retention_seconds: float = 3600.0):
+        """
+        参数:
+            max_workers: 同时执行的任务数
+            max_pending: 允许排队（未开始执行）的任务数
+            retention_seconds: 结束任务的保留时间（秒）
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs: Dict[str, Job] = {}
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._purger: Optional[threading.Thread] = None
+
+    def submit(self, kind: str, func: Callable[[Job], Any]) -> Job:
+        """
+        提交任务
+
+        参数:
+            kind: 任务类型
+            func: 任务函数，接收Job（用于发布进度），返回值作为任务结果
+
+        异常:
+            QueueFullError: 排队任务数已达上限
+        """
+        self._purge_expired()
+        self._start_purger()
+        with self._lock:
+            pending = sum(1 for job in self._jobs.values() if job.status == QUEUED)
+            if pending >= self.max_pending:
+                raise QueueFullError(f'排队任务数已达上限 ({self.max_pending})')
+            job = Job(job_id=uuid.uuid4().hex, kind=kind)
+            self._jobs[job.job_id] = job
+            self._futures[job.job_id] = self._executor.submit(self._run, job, func)
+        job._publish(QUEUED, {'position': pending + 1})
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """请求取消任务；排队中的任务立即取消，运行中的任务在下一次发布事件时终止"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            future = self._futures.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_requested = True
+        if future is not None and future.cancel():
+            job._set_status(CANCELLED)
+        return job
+
+    def stats(self) -> Dict[str, int]:
+        """各状态任务数"""
+        self._purge_expired()
+        with self._lock:
+            counts = {status: 0 for status in (QUEUED, RUNNING) + FINISHED_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        counts['max_workers'] = self.max_workers
+        counts['max_pending'] = self.max_pending
+        return counts
+
+    def _run(self, job: Job, func: Callable[[Job], Any]) -> None:
+        if job.cancel_requested:
+            job._set_status(CANCELLED)
+            return
+        job._set_status(RUNNING)
+        try:
+            job.result = func(job)
+        except JobCancelled:
+            print(f"[Job] 任务 {job.job_id} 已取消")
+            job._set_status(CANCELLED)
+        except Exception as e:
+            import traceback
+            print(f"[Job] 任务 {job.job_id} 失败: {e}")
+            traceback.print_exc()
+            job.error = str(e)
+            job._set_status(FAILED, {'error': str(e), 'error_type': type(e).__name__})
+        else:
+            job._set_status(SUCCEEDED)
+        finally:
+            with self._lock:
+                self._futures.pop(job.job_id, None)
+
+    def _purge_expired(self) -> None:
+        """清理超过保留时间的结束任务"""
+        deadline = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished and job.finished_at is not None and job.finished_at < deadline]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def _purge_periodically(self) -> None:
+        while True:
+            time.sleep(min(self.retention_seconds, 60.0))
+            self._purge_expired()
+
+    def _start_purger(self) -> None:
+        """启动清理线程（在首次提交任务时按需启动，后台线程不能跨fork继承）"""
+        with self._lock:
+            if self._purger is None or not self._purger.is_alive():
+                self._purger = threading.Thread(target=self._purge_periodically,
+                                                name='job-purger', daemon=True)
+                self._purger.start()
@@ -0,0 +1,266 @@
+"""
+API响应序列化
+=====================================
+
+路径、调度结果（AircraftSchedule）与冲突（Conflict）转换为接口字典的统一实现，
+以及基于 orjson 的JSON编码：
+
+- 途经点到达时刻直接由 CompactWaypoints 的epoch数组批量格式化，不再逐点生成datetime再strftime
+- 时间可输出为字符串（默认，'%Y-%m-%d %H:%M:%S'）或epoch秒（epoch=True），
+  epoch模式下数组直接转为浮点数列表，省去格式化开销
+- JSON编码优先使用可选依赖 orjson（比标准库json快数倍），未安装时回退到标准库；
+  两者输出等价：键排序、紧凑分隔符，datetime等类型交给Flask的默认转换
+- FastJSONProvider 作为 Flask 的 app.json，使所有 jsonify 响应都走同一编码
+
+epoch秒与 TimeUtils 一致：以朴素的1970-01-01为零点的本地时间秒数，
+前端按UTC格式化即得到本地时刻字符串。
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from flask.json.provider import DefaultJSONProvider
+
+from Algorithm.Astar import Node
+from Algorithm.CompactSchedule import CompactWaypoints
+from Algorithm.MultiAircraftScheduler import AircraftSchedule, Conflict
+from Algorithm.TimeUtils import to_epoch_seconds
+
+try:
+    import orjson
+except ImportError:  # orjson为可选依赖，缺失时使用标准库json
+    orjson = None
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+if orjson is not None:
+    _ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS |
+                       orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME)
+
+
+# ==================== JSON编码 ====================
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """
+    编码为紧凑、键排序的UTF-8 JSON
+
+    参数:
+        obj: 待编码对象
+        default: 无法直接编码的对象的转换函数（datetime也交由它处理）
+    """
+    if orjson is not None:
+        return orjson.dumps(obj, default=default, option=_ORJSON_OPTIONS)
+    return json.dumps(obj, default=default, sort_keys=True,
+                      separators=(',', ':')).encode('utf-8')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """使用 dumps 编码的Flask JSON provider（jsonify / app.json.dumps 均经过此处）"""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps(obj, default=self.default).decode('utf-8')
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps(obj, default=self.default) + b'\n',
+                                        mimetype=self.mimetype)
+
+
+# ==================== 时间 ====================
+
+def format_time(value: datetime) -> str:
+    """datetime -> '%Y-%m-%d %H:%M:%S'"""
+    return value.strftime(TIME_FORMAT)
+
+
+def format_times(epoch_seconds: Sequence[float]) -> List[str]:
+    """将epoch秒数组批量格式化为'%Y-%m-%d %H:%M:%S'字符串列表（与 from_epoch_seconds + strftime 一致）"""
+    # 先按datetime的精度舍入到微秒，再截断到秒
+    micros = np.round(np.asarray(epoch_seconds, dtype=np.float64) * 1e6).astype('datetime64[us]')
+    strings = np.datetime_as_string(micros.astype('datetime64[s]'), unit='s')
+    return np.char.replace(strings, 'T', ' ').tolist()
+
+
+def serialize_time(value: Optional[datetime], epoch: bool = False):
+    """单个时刻：字符串或epoch秒"""
+    if value is None:
+        return None
+    return to_epoch_seconds(value) if epoch else format_time(value)
+
+
+# ==================== 路径 ====================
+
+def serialize_node(node: Node, geo: bool = False) -> Dict[str, Any]:
+    """
+    节点字典
+
+    参数:
+        node: 节点
+        geo: 是否附带经纬度（lon/lat）
+    """
+    data = {
+        'id': node.id,
+        'type': node.node_type,
+        'x': node.x,
+        'y': node.y
+    }
+    if geo:
+        data['lon'] = node.properties.get('lon')
+        data['lat'] = node.properties.get('lat')
+    return data
+
+
+def serialize_path(path: Sequence[Node], geo: bool = False) -> List[Dict[str, Any]]:
+    """路径节点列表"""
+    return [serialize_node(node, geo) for node in path]
+
+
+def serialize_waypoints(waypoints: CompactWaypoints, epoch: bool = False) -> List[Dict[str, Any]]:
+    """途经点及到达时刻"""
+    times = waypoints.times.tolist() if epoch else format_times(waypoints.times)
+    return [
+        {'node_id': node.id, 'x': node.x, 'y': node.y, 'time': time}
+        for node, time in zip(waypoints.nodes, times)
+    ]
+
+
+# ==================== 调度 ====================
+
+def serialize_conflict(conflict: Conflict, epoch: bool = False) -> Dict[str, Any]:
+    """冲突字典"""
+    return {
+        'conflict_id': conflict.conflict_id,
+        'conflict_type': conflict.conflict_type,
+        'flight_ids': conflict.flight_ids,
+        'node_id': conflict.node_id,
+        'time': serialize_time(conflict.time, epoch),
+        'severity': conflict.severity
+    }
+
+
+def serialize_schedule(flight_id: str, schedule: AircraftSchedule, epoch: bool = False) -> Dict[str, Any]:
+    """
+    调度结果字典
+
+    参数:
+        flight_id: 航班ID
+        schedule: 调度结果
+        epoch: 时间是否输出为epoch秒
+    """
+    conflicts_data = [serialize_conflict(conflict, epoch) for conflict in schedule.conflicts]
+    flight = schedule.flight
+    return {
+        'flight_id': flight_id,
+        'aircraft_type': flight.aircraft_type,
+        'operation': flight.operation.value,
+        'start_node_id': flight.start_node.id,
+        'end_node_id': flight.end_node.id,
+        'scheduled_time': serialize_time(flight.scheduled_time, epoch),
+        'start_time': serialize_time(schedule.start_time, epoch),
+        'end_time': serialize_time(schedule.end_time, epoch),
+        'path': serialize_path(schedule.path),
+        'waypoints': serialize_waypoints(schedule.waypoints, epoch),
+        'total_distance': schedule.total_distance,
+        'total_time': schedule.total_time,
+        'delay': schedule.delay.total_seconds(),
+        'conflicts': conflicts_data,
+        'conflict_count': len(conflicts_data),
+        'weights': schedule.weights  # 动态权重配置
+    }
+
+
+# ==================== 基准测试 ====================
+
+def benchmark_serialization(num_flights: int = 300, path_length: int = 120, repeat: int = 5) -> Dict[str, float]:
+    """
+    对比调度结果的序列化耗时（python serialization.py）
+
+    使用合成的航班调度，比较逐点strftime + 标准库json（原实现）、
+    批量格式化 + 标准库json、批量格式化 + orjson 以及 epoch模式 + orjson。
+
+    返回:
+        {方案: 平均耗时（毫秒）}
+    """
+    import time
+    from datetime import timedelta
+
+    from Algorithm.MultiAircraftScheduler import Flight, OperationType
+
+    nodes = [Node(i, 'NetworkPoint', 35.5 * i, 12.25 * (i % 7)) for i in range(path_length)]
+    base = datetime(2024, 1, 20, 8, 0, 0)
+    schedules = {}
+    for k in range(num_flights):
+        path = nodes[k % 10:] + nodes[:k % 10]
+        start = base + timedelta(seconds=37 * k)
+        flight = Flight(f'FL{k:04d}', 'A320', OperationType.DEPARTURE, path[0], path[-1], start)
+        waypoints = CompactWaypoints.from_path(path, start, 14.7)
+        conflicts = [Conflict(f'c{k}_{j}', 'node', [flight.flight_id, f'FL{k + 1:04d}'],
+                              path[j].id, waypoints.time_at(j)) for j in range(0, 9, 3)]
+        schedules[flight.flight_id] = AircraftSchedule(
+            flight=flight, path=path, start_time=start, end_time=waypoints.end_time(),
+            waypoints=waypoints, conflicts=conflicts, total_distance=waypoints.total_distance,
+            total_time=waypoints.total_distance / 14.7, weights={'distance': 1.0, 'time': 1.0, 'fuel': 0.5})
+
+    def legacy_schedule(flight_id, schedule):
+        # 原实现：逐个途经点生成datetime并strftime
+        return {
+            'flight_id': flight_id,
+            'aircraft_type': schedule.flight.aircraft_type,
+            'operation': schedule.flight.operation.value,
+            'start_node_id': schedule.flight.start_node.id,
+            'end_node_id': schedule.flight.end_node.id,
+            'scheduled_time': schedule.flight.scheduled_time.strftime(TIME_FORMAT),
+            'start_time': schedule.start_time.strftime(TIME_FORMAT),
+            'end_time': schedule.end_time.strftime(TIME_FORMAT),
+            'path': [{'id': node.id, 'type': node.node_type, 'x': node.x, 'y': node.y} for node in schedule.path],
+            'waypoints': [{'node_id': node.id, 'x': node.x, 'y': node.y, 'time': time.strftime(TIME_FORMAT)}
+                          for node, time in schedule.waypoints],
+            'conflicts': [{'conflict_id': c.conflict_id, 'conflict_type': c.conflict_type,
+                           'flight_ids': c.flight_ids, 'node_id': c.node_id,
+                           'time': c.time.strftime(TIME_FORMAT), 'severity': c.severity}
+                          for c in schedule.conflicts],
+            'conflict_count': len(schedule.conflicts),
+            'total_distance': schedule.total_distance,
+            'total_time': schedule.total_time,
+            'delay': schedule.delay.total_seconds(),
+            'weights': schedule.weights
+        }
+
+    def stdlib_dumps(obj):
+        # Flask默认JSON provider的等价设置
+        return json.dumps(obj, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+    cases = {
+        'strftime + json': lambda: stdlib_dumps(
+            [legacy_schedule(fid, s) for fid, s in schedules.items()]),
+        'format_times + json': lambda: stdlib_dumps(
+            [serialize_schedule(fid, s) for fid, s in schedules.items()]),
+        'format_times + dumps': lambda: dumps(
+            [serialize_schedule(fid, s) for fid, s in schedules.items()]),
+        'epoch + dumps': lambda: dumps(
+            [serialize_schedule(fid, s, epoch=True) for fid, s in schedules.items()])
+    }
+
+    print("=" * 70)
+    print(f"序列化基准: {num_flights} 个航班 × {path_length} 个途经点，重复 {repeat} 次")
+    print(f"JSON后端: {'orjson' if orjson is not None else '标准库json（未安装orjson）'}")
+    print("=" * 70)
+
+    results = {}
+    for name, case in cases.items():
+        size = len(case())  # 预热
+        start = time.perf_counter()
+        for _ in range(repeat):
+            case()
+        results[name] = (time.perf_counter() - start) / repeat * 1000
+        speedup = results['strftime + json'] / results[name]
+        print(f"  {name:<22} {results[name]:8.1f} ms  {size / 1024:8.0f} KB  {speedup:5.1f}x")
+    return results
+
+
+if __name__ == "__main__":
+    benchmark_serialization()
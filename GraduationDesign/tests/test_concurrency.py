@@ -0,0 +1,127 @@
+"""
+并发路径查询回归测试
+
+在合成网格路网上，经Flask测试客户端并发发送 /api/path 与 /api/path/alternatives 请求
+（含相同键的重复请求，覆盖单飞合并与共享路径缓存），结果应与串行执行完全一致。
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from shapely.geometry import LineString, Point
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import api
+from Algorithm.Astar import AirportGraph, AStarOptimizer, Edge, Node
+
+GRID_SIZE = 8
+SPACING = 100.0
+
+
+def build_grid_graph(n=GRID_SIZE, spacing=SPACING):
+    """
+    构建 n×n 网格路网：底边挂接机位点，顶边挂接跑道点
+
+    节点ID由图内计数器按固定顺序生成，多次调用得到完全相同的路网
+    """
+    graph = AirportGraph('/nonexistent')
+    grid = {}
+
+    def add_node(node_type, x, y):
+        node_id = graph._generate_node_id()
+        node = Node(node_id, node_type, x, y, Point(x, y),
+                    {'lon': 108.9 + x * 1e-5, 'lat': 34.4 + y * 1e-5})
+        graph.nodes[node_id] = node
+        return node
+
+    def link(a, b, edge_type='NetworkRoad'):
+        length = ((a.x - b.x) ** 2 + (a.y - b.y) ** 2) ** 0.5
+        geometry = LineString([(a.x, a.y), (b.x, b.y)])
+        graph.edges.setdefault(a.id, []).append(Edge(a, b, edge_type, length, geometry))
+        graph.edges.setdefault(b.id, []).append(Edge(b, a, edge_type, length, geometry))
+
+    for i in range(n):
+        for j in range(n):
+            grid[(i, j)] = add_node('NetworkRoad_Node', i * spacing, j * spacing)
+    for i in range(n):
+        for j in range(n):
+            if i + 1 < n:
+                link(grid[(i, j)], grid[(i + 1, j)])
+            if j + 1 < n:
+                link(grid[(i, j)], grid[(i, j + 1)])
+
+    for i in range(0, n, 2):
+        stand = add_node('StandPoint', i * spacing, -40.0)
+        link(stand, grid[(i, 0)], 'PROXIMITY')
+    for i in range(1, n, 3):
+        runway = add_node('RunwayPoint', i * spacing, (n - 1) * spacing + 50.0)
+        link(runway, grid[(i, n - 1)], 'PROXIMITY')
+    return graph
+
+
+def install_graph(monkeypatch):
+    """安装新建的路网与优化器（冷缓存），参数与 api.initialize_graph 一致"""
+    graph = build_grid_graph()
+    monkeypatch.setattr(api, 'graph', graph)
+    monkeypatch.setattr(api, 'optimizer', AStarOptimizer(
+        graph=graph, weight_distance=1.0, weight_time=1.0, weight_fuel=0.5, aircraft_speed=15.0))
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """不加载真实数据、不访问天气API（请求均显式给出weather_factor或不需要天气）"""
+    install_graph(monkeypatch)
+    monkeypatch.setattr(api, 'weather_service', None)
+    api._ready.set()
+    yield api.app.test_client()
+    api._ready.clear()
+
+
+def make_requests():
+    """机位到跑道、跑道到机位的混合请求，每个请求重复出现以触发并发合并"""
+    graph = build_grid_graph()
+    stands = graph.find_nodes_by_type('StandPoint')
+    runways = graph.find_nodes_by_type('RunwayPoint')
+    weights = [None, {'distance': 0.2, 'time': 1.5, 'fuel': 0.3}]
+
+    requests = []
+    for index, stand in enumerate(stands):
+        for runway in runways:
+            body = {
+                'start_node_id': stand.id,
+                'goal_node_id': runway.id,
+                'weather_factor': 0.8,
+                'speed': 12.0 + index
+            }
+            if weights[index % 2]:
+                body['weights'] = weights[index % 2]
+            requests.append(('/api/path', body))
+            requests.append(('/api/path/alternatives', {
+                'start_node_id': runway.id,
+                'goal_node_id': stand.id,
+                'k': 3,
+                **({'weights': weights[index % 2]} if weights[index % 2] else {})
+            }))
+    return requests * 3
+
+
+def post(client, url, body):
+    response = client.post(url, json=body)
+    return response.status_code, response.get_json()
+
+
+def test_concurrent_path_queries_match_serial(client, monkeypatch):
+    requests = make_requests()
+    serial = [post(client, url, body) for url, body in requests]
+    assert all(status == 200 for status, _ in serial)
+
+    # 换用冷缓存的新路网与优化器，并发结果不依赖串行阶段留下的缓存
+    install_graph(monkeypatch)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        concurrent = list(pool.map(lambda item: post(client, *item), requests))
+
+    assert concurrent == serial
@@ -0,0 +1,14 @@
+"""
+WSGI入口（gunicorn等多进程服务器）
+
+导入时预热（加载路网并预构建各项只读缓存）：配合 gunicorn.conf.py 中的 preload_app，
+只在主进程执行一次，各工作进程fork后共享同一份内存（写时复制），启动即就绪。
+天气服务在各工作进程启动后初始化（post_worker_init），因为后台刷新线程与HTTP连接
+不能跨fork继承。
+
+    gunicorn -c gunicorn.conf.py
+"""
+
+from api import app, warm_up
+
+warm_up(include_weather=False)